@@ -0,0 +1,140 @@
+"""
+Пакетная оценка эмоций архива с возобновлением после сбоев
+
+Каталог задания можно разместить на общей файловой системе и запустить
+run на нескольких машинах: каждая захватывает свободные шарды
+
+Запуск:
+    python batch.py init jobs/archive --inputs /data/calls --shard-size 200
+    python batch.py run jobs/archive
+    python batch.py status jobs/archive
+    python batch.py export jobs/archive --output results.csv
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+
+from core.settings import load_settings
+from core.thread_budget import apply_thread_environment, apply_thread_budget
+
+# Потоки OpenMP/BLAS ограничиваются до загрузки numpy и torch
+settings = load_settings()
+apply_thread_environment(settings['threads'])
+
+from core.batch_runner import BatchRunner, create_job, iter_results, job_status, list_inputs
+
+
+def command_init(args):
+    manifest = create_job(args.job, list_inputs(args.inputs), args.shard_size)
+    print(f"Задание {args.job}: {manifest['items']} файлов, {manifest['shards']} шардов")
+
+
+def command_run(args):
+    from core import emotion_pipeline
+    from core.model_registry import load_registered_model, load_registry
+
+    apply_thread_budget(settings['threads'])
+    # Пакетная обработка не ограничена реальным временем: модель вкладки файлов
+    registry = load_registry(settings['models']['registry_path'])
+    model, feature_extractor, num2emotion = load_registered_model(
+        registry[args.model or settings['models']['file']], settings['model_cache'])
+
+    def process_item(path):
+        audio, sample_rate = emotion_pipeline.load_and_preprocess_audio(path)
+        emotion, confidence, probs = emotion_pipeline.analyze_audio(model, feature_extractor, audio, num2emotion)
+        return {
+            'emotion': emotion,
+            'confidence': confidence,
+            'probs': probs,
+            'duration': len(audio) / sample_rate,
+        }
+
+    started = time.perf_counter()
+    last_report = [started]
+
+    def on_item(shard, path):
+        now = time.perf_counter()
+        if now - last_report[0] >= 10:
+            last_report[0] = now
+            done = runner.stats['processed'] + runner.stats['failed']
+            print(f"{done} файлов, {done / (now - started):.2f} файл/с (шард {shard})")
+
+    runner = BatchRunner(args.job, process_item, node=args.node, lease_seconds=args.lease,
+                         checkpoint_every=args.checkpoint_every, retry_failed=args.retry_failed,
+                         on_item=on_item)
+    stats = runner.run(args.max_shards)
+    elapsed = time.perf_counter() - started
+    print(f"Узел {runner.node}: шардов {stats['shards']}, обработано {stats['processed']}, "
+          f"в карантине {stats['failed']}, пропущено готовых {stats['skipped']}, {elapsed:.0f} с")
+
+
+def command_status(args):
+    status = job_status(args.job, args.lease)
+    if args.json:
+        print(json.dumps(status, ensure_ascii=False, indent=2))
+        return
+    print(f"Шардов: {status['shards_done']}/{status['shards']}")
+    print(f"Файлов: обработано {status['processed']}, в карантине {status['failed']}, "
+          f"осталось {status['remaining']} из {status['items']}")
+    for lock in status['locks']:
+        print(f"  {lock['shard']}: {lock['node']}{' (устарел)' if lock['stale'] else ''}")
+
+
+def command_export(args):
+    records = list(iter_results(args.job, quarantined=args.quarantine))
+    if args.quarantine:
+        for record in records:
+            print(f"{record['path']}: {record['error']}")
+        return
+    with open(args.output, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        emotions = list(records[0]['probs']) if records else []
+        writer.writerow(["path", "emotion", "confidence", "duration"] + emotions)
+        for record in records:
+            writer.writerow([record['path'], record['emotion'], f"{record['confidence']:.2f}",
+                             f"{record['duration']:.2f}"] + [f"{record['probs'][e]:.2f}" for e in emotions])
+    print(f"{len(records)} результатов записано в {args.output}")
+
+
+def main():
+    batch_settings = settings['batch']
+    parser = argparse.ArgumentParser(description="Пакетная оценка эмоций с возобновлением")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    init = commands.add_parser("init", help="Создать задание из каталога или списка файлов")
+    init.add_argument("job", help="Каталог задания")
+    init.add_argument("--inputs", required=True, help="Каталог с аудио или текстовый файл со списком путей")
+    init.add_argument("--shard-size", type=int, default=batch_settings['shard_size'])
+    init.set_defaults(func=command_init)
+
+    run = commands.add_parser("run", help="Обрабатывать свободные шарды задания")
+    run.add_argument("job")
+    run.add_argument("--node", help="Имя узла (по умолчанию хост-pid)")
+    run.add_argument("--lease", type=float, default=batch_settings['lease_seconds'],
+                     help="Через сколько секунд без пульса захват шарда считается устаревшим")
+    run.add_argument("--checkpoint-every", type=int, default=batch_settings['checkpoint_every'])
+    run.add_argument("--retry-failed", action="store_true", help="Повторить файлы из карантина")
+    run.add_argument("--max-shards", type=int, help="Остановиться после N шардов")
+    run.add_argument("--model", help="Модель из реестра (по умолчанию models.file настроек)")
+    run.set_defaults(func=command_run)
+
+    status = commands.add_parser("status", help="Прогресс задания")
+    status.add_argument("job")
+    status.add_argument("--lease", type=float, default=batch_settings['lease_seconds'])
+    status.add_argument("--json", action="store_true")
+    status.set_defaults(func=command_status)
+
+    export = commands.add_parser("export", help="Выгрузить результаты в CSV или список карантина")
+    export.add_argument("job")
+    export.add_argument("--output", default="results.csv")
+    export.add_argument("--quarantine", action="store_true", help="Вывести файлы с ошибками")
+    export.set_defaults(func=command_export)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""
+Бенчмарк ИИ советника на поддельном сервере Ollama (без реальной модели)
+Измеряет время до первого токена, скорость генерации, эффект прогрева и кеша
+
+Запуск:
+    python benchmarks/bench_advisor.py --requests 20 --repeat-ratio 0.5 --output advisor.json
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "tools"))
+
+from core.llm_cache import LLMResponseCache
+from core.llm_client import OllamaAdvisorClient, generate_advice
+from fake_ollama_server import FakeOllamaConfig, start_fake_ollama
+
+
+def make_messages(i):
+    """Синтетический контекст разговора номер i"""
+    return [
+        {'role': 'system', 'content': 'Ты - эксперт по коммуникациям и психологии.\n\nЦель разговора: продать продукт'},
+        {'role': 'user', 'content': f"Последние фразы:\n[😐 НЕЙТРАЛЬНАЯ] реплика номер {i}\n\n"
+                                    f"Доминирующая эмоция собеседника: нейтральная"},
+    ]
+
+
+def run_requests(client, contexts, cache=None):
+    """Последовательная генерация советов, возвращает метрики по каждому запросу"""
+    results = []
+    for i in contexts:
+        metrics = generate_advice(client, make_messages(i), lambda content: None, cache=cache)
+        results.append(metrics)
+    return results
+
+
+def summarize(results, wall_time):
+    ttfts = [m['ttft'] for m in results if m['ttft'] is not None]
+    rates = [m['tokens_per_sec'] for m in results if m.get('tokens_per_sec')]
+    return {
+        'requests': len(results),
+        'wall_time_s': wall_time,
+        'requests_per_s': len(results) / wall_time if wall_time > 0 else None,
+        'ttft_p50_s': statistics.median(ttfts) if ttfts else None,
+        'ttft_max_s': max(ttfts) if ttfts else None,
+        'tokens_per_s_mean': statistics.mean(rates) if rates else None,
+        'cached': sum(1 for m in results if m.get('cached')),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк ИИ советника")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--repeat-ratio", type=float, default=0.5, help="Доля повторяющихся контекстов")
+    parser.add_argument("--load-latency", type=float, default=1.0)
+    parser.add_argument("--first-token-latency", type=float, default=0.1)
+    parser.add_argument("--token-rate", type=float, default=200.0)
+    parser.add_argument("--tokens", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Файл для результатов в JSON")
+    args = parser.parse_args()
+
+    config = FakeOllamaConfig(
+        load_latency=args.load_latency,
+        first_token_latency=args.first_token_latency,
+        token_rate=args.token_rate,
+        tokens=args.tokens
+    )
+
+    # Контексты с заданной долей повторов (как при повторном прогоне сессий)
+    rng = random.Random(args.seed)
+    contexts = []
+    for i in range(args.requests):
+        if contexts and rng.random() < args.repeat_ratio:
+            contexts.append(rng.choice(contexts))
+        else:
+            contexts.append(i)
+
+    report = {'config': vars(args)}
+
+    # 1. Холодный старт против прогрева
+    server, url = start_fake_ollama(config)
+    client = OllamaAdvisorClient(host=url, model='bench')
+    report['cold_first_request'] = run_requests(client, [0])[0]
+    server.shutdown()
+
+    server, url = start_fake_ollama(config)
+    client = OllamaAdvisorClient(host=url, model='bench')
+    client.warm_up('Ты - эксперт по коммуникациям и психологии.')
+    client.wait_warm_up()
+    report['warm_first_request'] = run_requests(client, [0])[0]
+
+    # 2. Пропускная способность без кеша и с кешем
+    start = time.perf_counter()
+    report['no_cache'] = summarize(run_requests(client, contexts), time.perf_counter() - start)
+
+    cache = LLMResponseCache(max_entries=256, ttl=3600)
+    start = time.perf_counter()
+    report['with_cache'] = summarize(run_requests(client, contexts, cache=cache), time.perf_counter() - start)
+    report['with_cache']['hits'] = cache.hits
+    report['with_cache']['misses'] = cache.misses
+    report['server_requests'] = server.requests
+    server.shutdown()
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    print(text)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Бенчмарк архива сессий: пакетная вставка и запросы по тысячам сессий
+
+Запуск:
+    python benchmarks/bench_archive.py --sessions 5000 --phrases 40 --output archive.json
+"""
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from common import NUM2EMOTION, environment_info, time_call, write_report
+
+from core.session_archive import SessionArchive
+
+
+WORDS = ("возврат деньги заказ доставка оплата менеджер скидка договор срок проблема "
+         "спасибо хорошо плохо вопрос ответ карта счет товар качество жалоба").split()
+
+
+def fill_archive(archive, sessions, phrases, seed=0):
+    """Синтетические сессии; фразы каждой сессии вставляются одной транзакцией"""
+    rng = random.Random(seed)
+    emotions = list(NUM2EMOTION.values())
+    start = time.time() - sessions * 3600
+    for i in range(sessions):
+        started = start + i * 3600
+        session_id = archive.start_session('realtime', title=f"Звонок {i}", started_at=started)
+        rows = []
+        for j in range(phrases):
+            text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 12)))
+            rows.append((session_id, started + j * 5, text, rng.choice(emotions), rng.uniform(30, 100)))
+        archive.add_phrases(rows)
+        archive.end_session(session_id, started + phrases * 5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк архива сессий")
+    parser.add_argument("--sessions", type=int, default=5000)
+    parser.add_argument("--phrases", type=int, default=40, help="Фраз в сессии")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--output", help="Файл для результатов в JSON")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = SessionArchive(Path(tmp) / "bench.db")
+        insert_start = time.perf_counter()
+        fill_archive(archive, args.sessions, args.phrases)
+        insert_time = time.perf_counter() - insert_start
+        results['insert'] = {
+            'seconds': insert_time,
+            'phrases_per_second': args.sessions * args.phrases / insert_time,
+        }
+
+        queries = {
+            'fts': lambda: archive.search_phrases("возврат*"),
+            'fts_emotion': lambda: archive.search_phrases("возврат*", emotion="гнев"),
+            'fts_and_emotion_confidence': lambda: archive.search_phrases(
+                "возврат* AND деньги", emotion="гнев", min_confidence=80),
+            'emotion_range': lambda: archive.search_phrases(emotion="грусть", min_confidence=90),
+            'sessions_fts_emotion': lambda: archive.search_sessions("возврат*", emotion="гнев"),
+            'session_phrases': lambda: archive.session_phrases(args.sessions // 2),
+        }
+        for name, query in queries.items():
+            stats, rows = time_call(query, args.repeats)
+            stats['rows'] = len(rows)
+            results[f"query/{name}"] = stats
+        archive.close()
+
+    write_report({
+        'environment': environment_info(),
+        'config': vars(args),
+        'results': results,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Бенчмарк масштабирования пакетной обработки по числу узлов
+
+Узлы - отдельные процессы над одним каталогом задания (как машины на общей
+файловой системе). Обработка файла эмулируется фиксированной паузой, поэтому
+измеряются только накладные расходы захвата шардов и контрольных точек:
+при линейном масштабировании пропускная способность растет пропорционально узлам
+
+Запуск:
+    python benchmarks/bench_batch_runner.py --nodes 1,2,4,8 --items 2000 --item-ms 20 --output batch.json
+"""
+import argparse
+import multiprocessing
+import tempfile
+import time
+
+from common import environment_info, write_report
+
+from core.batch_runner import BatchRunner, create_job, job_status
+
+
+def run_node(job_dir, name, item_seconds, checkpoint_every):
+    def process_item(path):
+        time.sleep(item_seconds)
+        return {'emotion': 'нейтральная'}
+
+    return BatchRunner(job_dir, process_item, node=name, checkpoint_every=checkpoint_every).run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк масштабирования пакетной обработки")
+    parser.add_argument("--nodes", default="1,2,4,8")
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--shard-size", type=int, default=50)
+    parser.add_argument("--item-ms", type=float, default=20.0, help="Время обработки одного файла")
+    parser.add_argument("--checkpoint-every", type=int, default=20)
+    parser.add_argument("--output", help="Файл для результатов в JSON")
+    args = parser.parse_args()
+
+    results = {}
+    base = None
+    for nodes in [int(n) for n in args.nodes.split(",")]:
+        with tempfile.TemporaryDirectory() as job_dir:
+            create_job(job_dir, [f"file-{i:06d}.wav" for i in range(args.items)], args.shard_size)
+            start = time.perf_counter()
+            with multiprocessing.Pool(nodes) as pool:
+                stats = pool.starmap(run_node, [(job_dir, f"node{i}", args.item_ms / 1000, args.checkpoint_every)
+                                                for i in range(nodes)])
+            elapsed = time.perf_counter() - start
+            status = job_status(job_dir)
+
+        throughput = args.items / elapsed
+        base = base or throughput / nodes
+        results[f"nodes{nodes}"] = {
+            'elapsed': elapsed,
+            'items_per_second': throughput,
+            'scaling_efficiency': throughput / (base * nodes),
+            'processed': status['processed'],
+            'shards_per_node': [s['shards'] for s in stats],
+        }
+        print(f"узлов {nodes:2d}: {throughput:8.1f} файл/с, эффективность "
+              f"{results[f'nodes{nodes}']['scaling_efficiency']:.2f}, обработано {status['processed']}")
+
+    write_report({
+        'environment': environment_info(),
+        'parameters': vars(args),
+        'results': results,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
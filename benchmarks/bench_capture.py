@@ -0,0 +1,163 @@
+"""
+Бенчмарк захвата: преобразование блоков PyAudio с выделением памяти и в кольцо
+
+Сравниваются:
+- copy: np.frombuffer(...).astype(np.float32) / 32768 на каждый блок и
+  np.concatenate накопленных блоков в окно (как в батчевом захвате)
+- ring: запись блока сразу в заранее выделенное кольцо float32 и копия
+  окна в заранее выделенный буфер
+Для каждого размера блока - время колбэка (перцентили) и память,
+выделяемая на блок в установившемся режиме (tracemalloc)
+
+Запуск:
+    python benchmarks/bench_capture.py --chunks 128,256,512,1024 --seconds 60 --output capture.json
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from common import environment_info, summarize_samples, write_report
+
+from core.capture_ring import SampleRing, WindowReader
+
+
+SAMPLE_RATE = 16000
+
+
+class _FakeCapture:
+    """Источник для WindowReader без PyAudio: блоки подаются вручную"""
+
+    def __init__(self, ring):
+        self.ring = ring
+        self.sample_rate = SAMPLE_RATE
+        self.captured = None
+        from core.perf_counters import PerfCounters
+        self.counters = PerfCounters()
+
+    def wait(self, position, timeout=1.0):
+        return self.ring.position > position
+
+    def capture_time(self, position):
+        return None
+
+
+def make_blocks(chunk, seconds, seed=0):
+    rng = np.random.default_rng(seed)
+    pcm = (rng.standard_normal(chunk * 64) * 3000).clip(-32768, 32767).astype(np.int16)
+    blocks = [pcm[i * chunk:(i + 1) * chunk].tobytes() for i in range(64)]
+    count = int(seconds * SAMPLE_RATE / chunk)
+    return [blocks[i % 64] for i in range(count)]
+
+
+class CopyCapture:
+    """Захват с преобразованием каждого блока в новый массив и склейкой окна"""
+
+    def __init__(self, window, hop):
+        self.window = window
+        self.hop = hop
+        self.batch = []
+        self.buffered = 0
+        self.windows = 0
+
+    def callback(self, data):
+        self.batch.append(np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0)
+        self.buffered += len(self.batch[-1])
+
+    def consume(self):
+        if self.buffered < self.window:
+            return
+        audio = np.concatenate(self.batch)
+        self.windows += len(audio[-self.window:]) == self.window
+        keep = audio[-(self.window - self.hop):] if self.hop < self.window else audio[:0]
+        self.batch = [keep]
+        self.buffered = len(keep)
+
+
+class RingCapture:
+    """Захват в заранее выделенное кольцо и чтение окон в заранее выделенный буфер"""
+
+    def __init__(self, window, hop):
+        self.ring = SampleRing(window * 4)
+        self.reader = WindowReader(_FakeCapture(self.ring), window / SAMPLE_RATE, hop / SAMPLE_RATE)
+        self.windows = 0
+
+    def callback(self, data):
+        self.ring.write_int16(data)
+
+    def consume(self):
+        if self.ring.position >= self.reader.next_end:
+            self.windows += self.reader.next_window() is not None
+
+
+def run_timing(capture_class, blocks, window, hop):
+    """Время колбэка на блок (без tracemalloc)"""
+    capture = capture_class(window, hop)
+    times = []
+    for data in blocks:
+        start = time.perf_counter()
+        capture.callback(data)
+        times.append(time.perf_counter() - start)
+        capture.consume()
+    return times, capture.windows
+
+
+def run_allocations(capture_class, blocks, window, hop):
+    """Байты, выделенные на блок в установившемся режиме (колбэк и чтение окон)"""
+    capture = capture_class(window, hop)
+    for data in blocks[:64]:
+        capture.callback(data)
+        capture.consume()
+    allocated = 0
+    tracemalloc.start()
+    for data in blocks:
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        capture.callback(data)
+        capture.consume()
+        _, peak = tracemalloc.get_traced_memory()
+        allocated += peak - before
+    tracemalloc.stop()
+    return allocated / len(blocks)
+
+
+def measure(capture_class, blocks, window, hop):
+    run_timing(capture_class, blocks[:64], window, hop)
+    times, windows = run_timing(capture_class, blocks, window, hop)
+    stats = summarize_samples(times)
+    stats['windows'] = windows
+    stats['allocated_bytes_per_block'] = run_allocations(capture_class, blocks, window, hop)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк захвата в кольцевой буфер")
+    parser.add_argument("--chunks", default="128,256,512,1024", help="Размеры блока PyAudio в семплах")
+    parser.add_argument("--seconds", type=float, default=60.0, help="Длительность потока")
+    parser.add_argument("--window", type=float, default=3.0)
+    parser.add_argument("--hop", type=float, default=1.0)
+    parser.add_argument("--output", help="Файл для результатов в JSON")
+    args = parser.parse_args()
+
+    window = int(args.window * SAMPLE_RATE)
+    hop = int(args.hop * SAMPLE_RATE)
+    results = {}
+    for chunk in [int(c) for c in args.chunks.split(",")]:
+        blocks = make_blocks(chunk, args.seconds)
+        for name, capture_class in (('copy', CopyCapture), ('ring', RingCapture)):
+            stats = measure(capture_class, blocks, window, hop)
+            results[f"{name}_chunk{chunk}"] = stats
+            print(f"{name:5s} блок {chunk:5d}: колбэк медиана {stats['median'] * 1e6:6.2f} мкс, "
+                  f"p90 {stats['p90'] * 1e6:6.2f} мкс, выделено {stats['allocated_bytes_per_block']:9.0f} Б/блок, "
+                  f"окон {stats['windows']}")
+
+    write_report({
+        'environment': environment_info(),
+        'parameters': vars(args),
+        'results': results,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Бенчмарк поиска ближайших эмбеддингов: индекс IVF против полного перебора numpy
+
+Синтетические векторы с кластерной структурой (как эмбеддинги окон разных
+дикторов и эмоций) пишутся в хранилище; для каждого nprobe измеряются
+задержка запроса и recall@k относительно точного перебора
+
+Запуск:
+    python benchmarks/bench_embeddings.py --vectors 1000000 --dim 256 --nprobe 4,8,16,32,64 --output embeddings.json
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from common import environment_info, summarize_samples, write_report
+
+from core.embedding_store import EmbeddingStore, brute_force_search
+
+
+def synth_embeddings(store, count, dim, clusters, noise=1.5, seed=0, block=100000):
+    """Кластеры разного размера с шумом; пишутся в хранилище блоками"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    weights = rng.pareto(1.5, clusters) + 1
+    weights /= weights.sum()
+    for start in range(0, count, block):
+        n = min(block, count - start)
+        labels = rng.choice(clusters, n, p=weights)
+        vectors = centers[labels] + rng.standard_normal((n, dim)).astype(np.float32) * noise
+        store.add(vectors, session_id=0, timestamp=1.0)
+    store.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк поиска ближайших эмбеддингов")
+    parser.add_argument("--vectors", type=int, default=1000000)
+    parser.add_argument("--dim", type=int, default=256, help="Размер эмбеддинга (проектор классификатора)")
+    parser.add_argument("--clusters", type=int, default=2000)
+    parser.add_argument("--noise", type=float, default=1.5, help="Разброс внутри кластера относительно центров")
+    parser.add_argument("--nlist", type=int, default=None, help="Списков IVF (по умолчанию sqrt(N))")
+    parser.add_argument("--nprobe", default="4,8,16,32,64")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--output", help="Файл для результатов в JSON")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        store = EmbeddingStore(tmp, dim=args.dim, flush_every=1 << 30)
+        start = time.perf_counter()
+        synth_embeddings(store, args.vectors, args.dim, args.clusters, args.noise)
+        results['write_seconds'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index = store.build_index(args.nlist)
+        results['build_seconds'] = time.perf_counter() - start
+        results['nlist'] = len(index.centroids)
+
+        vectors = store.vectors()
+        # Прогрев страниц memmap, чтобы перебор не измерял чтение с диска
+        np.asarray(vectors).sum()
+        rng = np.random.default_rng(1)
+        queries = rng.choice(len(vectors), args.queries, replace=False)
+
+        times = []
+        exact = []
+        for row in queries:
+            start = time.perf_counter()
+            ids, _ = brute_force_search(vectors, vectors[row], args.k)
+            times.append(time.perf_counter() - start)
+            exact.append(set(ids.tolist()))
+        results['brute_force'] = summarize_samples(times)
+        print(f"перебор: медиана {results['brute_force']['median'] * 1000:.1f} мс")
+
+        for nprobe in [int(n) for n in args.nprobe.split(",")]:
+            times = []
+            recall = []
+            for row, truth in zip(queries, exact):
+                start = time.perf_counter()
+                found = store.search(vectors[row], args.k, nprobe)
+                times.append(time.perf_counter() - start)
+                recall.append(len(truth & {i for i, _ in found}) / len(truth))
+            stats = summarize_samples(times)
+            stats['recall'] = float(np.mean(recall))
+            stats['speedup'] = results['brute_force']['median'] / stats['median']
+            results[f"ivf_nprobe{nprobe}"] = stats
+            print(f"IVF nprobe={nprobe:3d}: медиана {stats['median'] * 1000:.2f} мс, "
+                  f"recall@{args.k} {stats['recall']:.3f}, ускорение x{stats['speedup']:.0f}")
+
+    write_report({
+        'environment': environment_info(),
+        'parameters': vars(args),
+        'results': results,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
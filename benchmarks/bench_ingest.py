@@ -0,0 +1,87 @@
+"""
+Бенчмарк фоновой очереди анализа файлов (вкладка файлов)
+
+Папка синтетических WAV разной длины и частоты проходит через IngestQueue
+при разном числе потоков чтения. Параллельно таймер Qt каждые 10 мс
+отмечает цикл событий: максимальная пауза между срабатываниями показывает,
+насколько окно осталось отзывчивым во время обработки
+
+Запуск:
+    python benchmarks/bench_ingest.py --files 200 --workers 1,2,4 --output ingest.json
+    python benchmarks/bench_ingest.py --model real --files 50
+"""
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from common import NUM2EMOTION, environment_info, load_bench_model, write_report
+from synthetic_audio import write_fixture
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+from PyQt5.QtCore import QCoreApplication, QEventLoop, QTimer
+
+from core.ingest_queue import IngestQueue
+
+
+def run_queue(app, model, feature_extractor, paths, workers, inference_slots):
+    queue = IngestQueue(model, feature_extractor, NUM2EMOTION, workers=workers, inference_slots=inference_slots)
+    loop = QEventLoop()
+    result = {}
+    ticks = []
+
+    def on_drained(stats):
+        result.update(stats)
+        loop.quit()
+
+    timer = QTimer()
+    timer.setInterval(10)
+    timer.timeout.connect(lambda: ticks.append(time.perf_counter()))
+    queue.drained.connect(on_drained)
+
+    timer.start()
+    queue.submit(paths)
+    loop.exec_()
+    timer.stop()
+    queue.shutdown()
+
+    gaps = [b - a for a, b in zip(ticks, ticks[1:])]
+    result['files_per_second'] = result['done'] / result['elapsed']
+    result['max_event_gap_ms'] = max(gaps) * 1000 if gaps else None
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк очереди анализа файлов")
+    parser.add_argument("--model", default="tiny", choices=["tiny", "real"])
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--inference-slots", type=int, default=1)
+    parser.add_argument("--output", help="Файл для результатов в JSON")
+    args = parser.parse_args()
+
+    app = QCoreApplication.instance() or QCoreApplication([])
+    model, feature_extractor = load_bench_model(args.model)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        # Длины 1-12 с, частоты 16/44.1/48 кГц: чтение и передискретизация заметны
+        rates = (16000, 44100, 48000)
+        paths = [write_fixture(Path(tmp) / f"file_{i:04d}.wav", 1 + i % 12, rates[i % 3], seed=i)
+                 for i in range(args.files)]
+        for workers in [int(w) for w in args.workers.split(",")]:
+            stats = run_queue(app, model, feature_extractor, paths, workers, args.inference_slots)
+            results[f"workers{workers}"] = stats
+            print(f"потоков {workers}: {stats['files_per_second']:.1f} файл/с, "
+                  f"{stats['audio_seconds'] / stats['elapsed']:.0f}x реального времени, "
+                  f"макс. пауза цикла событий {stats['max_event_gap_ms']:.0f} мс")
+
+    write_report({
+        'environment': environment_info(),
+        'parameters': vars(args),
+        'results': results,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
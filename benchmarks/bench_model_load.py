@@ -0,0 +1,170 @@
+"""
+Бенчмарк запуска: from_pretrained против кеша safetensors с mmap
+
+Каждый вариант загружается в отдельных процессах (время загрузки и RSS
+одного процесса), затем --processes процессов держат модель одновременно
+и измеряется суммарная PSS: при mmap физические страницы весов общие
+
+Источник - реальная модель (--source real, нужна сеть или кеш Hugging Face)
+или синтетическая HuBERT размера base/large, сохраненная локально
+
+Запуск:
+    python benchmarks/bench_model_load.py --source base --processes 4 --output model_load.json
+    python benchmarks/bench_model_load.py --source real
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from common import ROOT, environment_info, write_report
+
+
+SIZES = {
+    'base': dict(hidden_size=768, num_hidden_layers=12, num_attention_heads=12, intermediate_size=3072),
+    'large': dict(hidden_size=1024, num_hidden_layers=24, num_attention_heads=16, intermediate_size=4096,
+                  feat_extract_norm="layer", do_stable_layer_norm=True),
+}
+
+
+def make_source(directory, size, fmt):
+    """Синтетическая контрольная точка HuBERT в формате pytorch_model.bin или safetensors"""
+    import torch
+    from transformers import HubertConfig, HubertForSequenceClassification, Wav2Vec2FeatureExtractor
+
+    from core.emotion_pipeline import NUM2EMOTION
+
+    torch.manual_seed(0)
+    model = HubertForSequenceClassification(HubertConfig(num_labels=len(NUM2EMOTION), **SIZES[size]))
+    if fmt == "bin":
+        model.config.save_pretrained(directory)
+        torch.save(model.state_dict(), Path(directory) / "pytorch_model.bin")
+    else:
+        model.save_pretrained(directory)
+    Wav2Vec2FeatureExtractor(feature_size=1, sampling_rate=16000, padding_value=0.0, do_normalize=True,
+                             return_attention_mask=True).save_pretrained(directory)
+
+
+def child(variant, classifier, feature_extractor, cache_dir):
+    """Загрузка в дочернем процессе: время, RSS; затем ожидание команды родителя"""
+    started = time.perf_counter()
+    import numpy as np
+
+    # Импорт transformers считается отдельно от загрузки весов
+    from transformers import HubertForSequenceClassification, Wav2Vec2FeatureExtractor
+
+    from core import emotion_pipeline
+    from core.model_cache import cache_path, load_cached_model
+    imported = time.perf_counter()
+
+    if variant == "pretrained":
+        model, extractor = emotion_pipeline.load_emotion_model(feature_extractor, classifier)
+    else:
+        dtype = "float16" if variant == "cache_fp16" else "float32"
+        model, extractor = load_cached_model(cache_path(cache_dir, classifier, dtype))
+    loaded = time.perf_counter()
+    # Первый прямой проход обращается ко всем весам
+    emotion_pipeline.analyze_audio(model, extractor, np.zeros(16000, dtype=np.float32), emotion_pipeline.NUM2EMOTION)
+    first = time.perf_counter()
+
+    print(json.dumps({
+        'import_seconds': imported - started,
+        'load_seconds': loaded - imported,
+        'first_forward_seconds': first - loaded,
+        'rss_mb': memory_mb()['rss'],
+    }), flush=True)
+    sys.stdin.readline()
+
+
+def memory_mb(pid="self"):
+    """RSS и PSS процесса в МБ (Linux)"""
+    values = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in ("Rss", "Pss"):
+                    values[key.lower()] = int(rest.split()[0]) / 1024
+    except OSError:
+        pass
+    return values
+
+
+def run_processes(variant, count, args, cache_dir):
+    """count процессов одновременно: их отчеты и суммарная PSS"""
+    command = [sys.executable, __file__, "--child", variant, "--classifier", args.classifier,
+               "--feature-extractor", args.feature_extractor, "--cache-dir", cache_dir]
+    processes = [subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, cwd=ROOT)
+                 for _ in range(count)]
+    reports = []
+    for process in processes:
+        line = process.stdout.readline()
+        while line and not line.startswith("{"):
+            line = process.stdout.readline()
+        reports.append(json.loads(line))
+    pss = sum(memory_mb(process.pid).get('pss', 0) for process in processes)
+    for process in processes:
+        process.stdin.write("\n")
+        process.stdin.flush()
+        process.wait()
+    return reports, pss
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк загрузки модели")
+    parser.add_argument("--source", default="base", choices=["base", "large", "real"])
+    parser.add_argument("--source-format", default="bin", choices=["bin", "safetensors"],
+                        help="Формат синтетической контрольной точки")
+    parser.add_argument("--processes", type=int, default=4, help="Процессов для замера общей памяти")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", help="Файл для результатов в JSON")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--classifier", help=argparse.SUPPRESS)
+    parser.add_argument("--feature-extractor", help=argparse.SUPPRESS)
+    parser.add_argument("--cache-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.classifier, args.feature_extractor, args.cache_dir)
+        return
+
+    from core.emotion_pipeline import CLASSIFIER_NAME, FEATURE_EXTRACTOR_NAME
+    from core.model_cache import prepare_cache
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.source == "real":
+            args.classifier, args.feature_extractor = CLASSIFIER_NAME, FEATURE_EXTRACTOR_NAME
+        else:
+            source = Path(tmp) / "source"
+            make_source(source, args.source, args.source_format)
+            args.classifier = args.feature_extractor = str(source)
+        cache_dir = str(Path(tmp) / "cache")
+        for dtype in ("float32", "float16"):
+            started = time.perf_counter()
+            prepare_cache(cache_dir, args.classifier, args.feature_extractor, dtype)
+            results[f"convert_{dtype}_seconds"] = time.perf_counter() - started
+
+        for variant in ("pretrained", "cache", "cache_fp16"):
+            # Первый прогон прогревает кеш страниц ОС, в отчет идут следующие
+            runs = [run_processes(variant, 1, args, cache_dir)[0][0] for _ in range(args.repeats + 1)][1:]
+            best = min(runs, key=lambda r: r['import_seconds'] + r['load_seconds'])
+            _, pss = run_processes(variant, args.processes, args, cache_dir)
+            results[variant] = {**best, 'launch_seconds': best['import_seconds'] + best['load_seconds'],
+                                f'pss_total_mb_{args.processes}_processes': pss}
+            print(f"{variant:11s}: загрузка {best['load_seconds']:.2f} с (с импортом {results[variant]['launch_seconds']:.2f} с), "
+                  f"первый проход {best['first_forward_seconds']:.2f} с, RSS {best['rss_mb']:.0f} МБ, "
+                  f"PSS {args.processes} процессов {pss:.0f} МБ")
+
+    write_report({
+        'environment': environment_info(),
+        'parameters': {k: v for k, v in vars(args).items() if k not in ('child', 'cache_dir')},
+        'results': results,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
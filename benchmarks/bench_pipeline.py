@@ -0,0 +1,144 @@
+"""
+Сквозной бенчмарк конвейера распознавания эмоций (без Qt и микрофона)
+
+Стадии замеряются отдельно на синтетических файлах разной длины, частоты и
+числа каналов: чтение, нормализация, минимальная длина, передискретизация,
+экстрактор признаков, прямой проход модели и полный путь analyze_emotion.
+Отдельно эмулируется конвейер реального времени: блоки микрофона копятся в
+батч, батч предобрабатывается и классифицируется.
+
+Запуск:
+    python benchmarks/bench_pipeline.py --model tiny --output current.json
+    python benchmarks/bench_pipeline.py --model tiny --baseline base.json --tolerance 0.15
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from common import (NUM2EMOTION, compare_to_baseline, environment_info, load_bench_model,
+                    summarize_samples, time_call, write_report)
+from synthetic_audio import chunk_stream, synth_speech_like, write_fixture
+
+from core import emotion_pipeline
+
+
+def bench_file_stages(model, feature_extractor, fixtures, repeats):
+    """Замер каждой стадии файлового анализа"""
+    results = {}
+    for path, duration, sample_rate, channels in fixtures:
+        tag = f"{duration:g}s_{sample_rate}hz_{channels}ch"
+
+        stats, (raw, sr) = time_call(lambda: emotion_pipeline.read_audio(path), repeats)
+        results[f"read/{tag}"] = stats
+
+        stats, normalized = time_call(lambda: emotion_pipeline.normalize_audio(raw), repeats)
+        results[f"normalize/{tag}"] = stats
+
+        stats, padded = time_call(lambda: emotion_pipeline.ensure_minimum_length(normalized, sr), repeats)
+        results[f"min_length/{tag}"] = stats
+
+        stats, (audio, _) = time_call(lambda: emotion_pipeline.resample_audio(padded, sr), repeats)
+        results[f"resample/{tag}"] = stats
+
+        stats, input_values = time_call(
+            lambda: emotion_pipeline.extract_input_values(feature_extractor, audio), repeats)
+        results[f"features/{tag}"] = stats
+
+        stats, _ = time_call(
+            lambda: emotion_pipeline.predict_from_input_values(model, input_values, NUM2EMOTION), repeats)
+        results[f"forward/{tag}"] = stats
+
+        stats, _ = time_call(
+            lambda: emotion_pipeline.analyze_file(model, feature_extractor, path, NUM2EMOTION), repeats)
+        results[f"analyze_file/{tag}"] = stats
+    return results
+
+
+def bench_realtime(model, feature_extractor, batch_seconds, stream_seconds, chunk_size=1024,
+                   sample_rate=16000):
+    """
+    Эмуляция конвейера реального времени
+    Возвращает задержки обработки батчей и фактор реального времени
+    """
+    audio = synth_speech_like(stream_seconds, sample_rate, seed=1)
+    batch_samples = int(batch_seconds * sample_rate)
+    batch = np.empty(batch_samples, dtype=np.float32)
+    filled = 0
+    latencies = []
+
+    for chunk in chunk_stream(audio, chunk_size):
+        take = min(len(chunk), batch_samples - filled)
+        batch[filled:filled + take] = chunk[:take]
+        filled += take
+        if filled < batch_samples:
+            continue
+
+        start = time.perf_counter()
+        processed = emotion_pipeline.normalize_audio(batch)
+        emotion_pipeline.analyze_audio(model, feature_extractor, processed, NUM2EMOTION)
+        latencies.append(time.perf_counter() - start)
+
+        # Остаток блока начинает следующий батч
+        rest = chunk[take:]
+        batch[:len(rest)] = rest
+        filled = len(rest)
+
+    stats = summarize_samples(latencies)
+    stats['realtime_factor'] = stats['median'] / batch_seconds
+    stats['batches'] = len(latencies)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк конвейера распознавания эмоций")
+    parser.add_argument("--model", choices=["tiny", "real"], default="tiny")
+    parser.add_argument("--durations", default="1,3,10,30", help="Длительности файлов, с")
+    parser.add_argument("--sample-rates", default="16000,44100", help="Частоты дискретизации")
+    parser.add_argument("--channels", default="1,2", help="Число каналов")
+    parser.add_argument("--batch-lengths", default="1,3,5", help="Длины батчей реального времени, с")
+    parser.add_argument("--stream-seconds", type=float, default=30.0)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", help="Файл для результатов в JSON")
+    parser.add_argument("--baseline", help="JSON предыдущего запуска для сравнения")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Допустимое замедление (доля)")
+    args = parser.parse_args()
+
+    model, feature_extractor = load_bench_model(args.model)
+    results = {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fixtures = []
+        seed = 0
+        for duration in [float(x) for x in args.durations.split(",")]:
+            for sample_rate in [int(x) for x in args.sample_rates.split(",")]:
+                for channels in [int(x) for x in args.channels.split(",")]:
+                    path = Path(tmp) / f"synth_{duration:g}_{sample_rate}_{channels}.wav"
+                    write_fixture(path, duration, sample_rate, channels, seed=seed)
+                    fixtures.append((str(path), duration, sample_rate, channels))
+                    seed += 1
+        results.update(bench_file_stages(model, feature_extractor, fixtures, args.repeats))
+
+    for batch_seconds in [float(x) for x in args.batch_lengths.split(",")]:
+        results[f"realtime/batch_{batch_seconds:g}s"] = bench_realtime(
+            model, feature_extractor, batch_seconds, args.stream_seconds)
+
+    report = {
+        'environment': environment_info(),
+        'config': vars(args),
+        'results': results,
+    }
+    write_report(report, args.output)
+
+    if args.baseline:
+        regressions = compare_to_baseline(results, args.baseline, args.tolerance)
+        if regressions:
+            print(f"Найдено регрессий: {len(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Проверка потокового режима HuBERT с кешем кадров сверточного энкодера
+
+Для каждого окна сравнивается потоковая классификация и полный пересчет:
+совпадение эмоции, расхождение вероятностей, время на окно и доля кадров
+энкодера, которые не пришлось пересчитывать.
+
+Запуск:
+    python benchmarks/bench_streaming_hubert.py --model real --window 3 --hop 1 --output streaming.json
+"""
+import argparse
+
+from common import NUM2EMOTION, environment_info, load_bench_model, write_report
+from synthetic_audio import synth_speech_like
+
+from core.streaming_hubert import validate_streaming
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Потоковый режим HuBERT: точность и экономия")
+    parser.add_argument("--model", choices=["tiny", "real"], default="tiny")
+    parser.add_argument("--window", type=float, default=3.0, help="Окно, с")
+    parser.add_argument("--hops", default="0.5,1,2", help="Шаги окна, с")
+    parser.add_argument("--stream-seconds", type=float, default=30.0)
+    parser.add_argument("--output", help="Файл для результатов в JSON")
+    args = parser.parse_args()
+
+    model, feature_extractor = load_bench_model(args.model)
+    audio = synth_speech_like(args.stream_seconds, seed=7)
+
+    results = {}
+    for hop in [float(x) for x in args.hops.split(",")]:
+        results[f"window_{args.window:g}s_hop_{hop:g}s"] = validate_streaming(
+            model, feature_extractor, audio, NUM2EMOTION, args.window, hop)
+
+    write_report({
+        'environment': environment_info(),
+        'config': vars(args),
+        'results': results,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Бенчмарк бюджета потоков: пропуски блоков и задержки с закреплением и без
+
+Эмулируются четыре потока приложения:
+- захват: каждые chunk/16000 с кладет блок в ограниченный буфер (как PyAudio),
+  переполнение буфера считается пропущенным блоком
+- ASR: забирает блоки и выполняет работу, сравнимую с извлечением признаков Vosk
+- инференс: непрерывно классифицирует окна моделью HuBERT
+- GUI: тики по 16 мс, измеряется их запаздывание
+Каждый вариант запускается в отдельном процессе, так как потоки torch
+настраиваются один раз на процесс
+
+Запуск:
+    python benchmarks/bench_thread_budget.py --model tiny --seconds 20 --output threads.json
+"""
+import argparse
+import json
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+from common import NUM2EMOTION, load_bench_model, summarize_samples, write_report
+
+from core.thread_budget import apply_thread_budget, pin_current_thread, pin_model_threads
+
+
+VARIANTS = {
+    'default': {'mode': 'off'},
+    'budget': {'mode': 'auto', 'pinning': False},
+    'budget_pinned': {'mode': 'auto', 'pinning': True},
+}
+
+
+def run_variant(name, args):
+    """Прогон одного варианта в текущем процессе"""
+    import numpy as np
+    import torch
+
+    from core import emotion_pipeline
+    from synthetic_audio import synth_speech_like
+
+    budget = apply_thread_budget(VARIANTS[name])
+    model, feature_extractor = load_bench_model(args.model)
+    pin_model_threads(model)
+
+    sample_rate = 16000
+    period = args.chunk / sample_rate
+    audio = synth_speech_like(args.window, sample_rate, seed=3)
+    buffer = queue.Queue(maxsize=args.buffer_chunks)
+    stop = threading.Event()
+    stats = {'captured': 0, 'dropped': 0}
+    capture_jitter, asr_latency, inference_times, gui_jitter = [], [], [], []
+
+    def capture():
+        pin_current_thread('capture')
+        next_time = time.perf_counter()
+        while not stop.is_set():
+            next_time += period
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            now = time.perf_counter()
+            capture_jitter.append(max(0.0, now - next_time))
+            try:
+                buffer.put_nowait(now)
+                stats['captured'] += 1
+            except queue.Full:
+                stats['dropped'] += 1
+
+    def asr():
+        pin_current_thread('asr')
+        frame = np.random.default_rng(0).standard_normal(args.chunk).astype(np.float32)
+        while not stop.is_set():
+            try:
+                captured_at = buffer.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            # Работа порядка извлечения признаков Kaldi: спектр по кадрам
+            for _ in range(args.asr_work):
+                np.abs(np.fft.rfft(frame.reshape(-1, 256), axis=1))
+            asr_latency.append(time.perf_counter() - captured_at)
+
+    def inference():
+        input_values = emotion_pipeline.extract_input_values(feature_extractor, audio)
+        while not stop.is_set():
+            start = time.perf_counter()
+            emotion_pipeline.predict_from_input_values(model, input_values, NUM2EMOTION)
+            inference_times.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=target, daemon=True) for target in (capture, asr, inference)]
+    for thread in threads:
+        thread.start()
+
+    # Главный поток играет роль цикла событий GUI
+    end = time.perf_counter() + args.seconds
+    next_tick = time.perf_counter()
+    while time.perf_counter() < end:
+        next_tick += 0.016
+        delay = next_tick - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        gui_jitter.append(max(0.0, time.perf_counter() - next_tick))
+
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    total = stats['captured'] + stats['dropped']
+    return {
+        'budget': budget,
+        'torch_threads': torch.get_num_threads(),
+        'captured': stats['captured'],
+        'dropped': stats['dropped'],
+        'drop_rate': stats['dropped'] / total if total else 0.0,
+        'capture_jitter': summarize_samples(capture_jitter or [0.0]),
+        'asr_latency': summarize_samples(asr_latency or [0.0]),
+        'inference': summarize_samples(inference_times or [0.0]),
+        'gui_jitter': summarize_samples(gui_jitter or [0.0]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк бюджета потоков")
+    parser.add_argument("--model", choices=["tiny", "real"], default="tiny")
+    parser.add_argument("--seconds", type=float, default=20.0)
+    parser.add_argument("--chunk", type=int, default=256, help="Размер блока захвата в семплах")
+    parser.add_argument("--buffer-chunks", type=int, default=4, help="Емкость буфера захвата в блоках")
+    parser.add_argument("--window", type=float, default=3.0, help="Длина окна инференса, с")
+    parser.add_argument("--asr-work", type=int, default=20, help="Условная нагрузка ASR на блок")
+    parser.add_argument("--variants", default=",".join(VARIANTS))
+    parser.add_argument("--run-variant", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help="Файл для результатов в JSON")
+    args = parser.parse_args()
+
+    if args.run_variant:
+        print(json.dumps(run_variant(args.run_variant, args)))
+        return
+
+    results = {}
+    for name in args.variants.split(","):
+        command = [sys.executable, __file__, "--run-variant", name] + [
+            a for a in sys.argv[1:] if not a.startswith("--output") and a != args.output
+        ]
+        completed = subprocess.run(command, capture_output=True, text=True, check=True)
+        results[name] = json.loads(completed.stdout.strip().splitlines()[-1])
+        r = results[name]
+        print(f"{name:14s} пропуски {r['dropped']:5d} ({r['drop_rate'] * 100:5.2f}%)  "
+              f"ASR p90 {r['asr_latency']['p90'] * 1000:7.2f} мс  "
+              f"инференс {r['inference']['median'] * 1000:7.2f} мс  "
+              f"GUI p90 {r['gui_jitter']['p90'] * 1000:6.2f} мс", file=sys.stderr)
+
+    write_report({'config': vars(args), 'results': results}, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Бенчмарк временного ряда эмоций: пересчет по полной истории против колец с накопленными суммами
+
+Сессия из результатов окон (шаг --hop секунд) длиной --hours часов. После
+каждого часа замеряется время запроса доминирующей эмоции за 5 минут и за
+всю сессию и занятая память: у списка истории оба растут с длиной сессии,
+у EmotionTimeline остаются постоянными
+
+Запуск:
+    python benchmarks/bench_timeline.py --hours 8 --output timeline.json
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from common import NUM2EMOTION, environment_info, write_report
+
+from core.emotion_timeline import EmotionTimeline
+
+
+def naive_dominant(history, seconds=None):
+    """Пересчет по всей истории, как при хранении списка результатов"""
+    now = history[-1][0]
+    totals = {}
+    count = 0
+    for timestamp, probs in history:
+        if seconds is not None and timestamp <= now - seconds:
+            continue
+        for emotion, p in probs.items():
+            totals[emotion] = totals.get(emotion, 0.0) + p
+        count += 1
+    emotion = max(totals, key=totals.get)
+    return emotion, totals[emotion] / count
+
+
+def time_query(fn, repeats=20):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк временного ряда эмоций")
+    parser.add_argument("--hours", type=int, default=8)
+    parser.add_argument("--hop", type=float, default=1.0, help="Шаг окон эмоций, с")
+    parser.add_argument("--output", help="Файл для результатов в JSON")
+    args = parser.parse_args()
+
+    emotions = list(NUM2EMOTION.values())
+    rng = np.random.default_rng(0)
+    per_hour = int(3600 / args.hop)
+
+    tracemalloc.start()
+    history = []
+    history_bytes = 0
+    timeline = EmotionTimeline(emotions)
+    results = {}
+    t = 0.0
+    for hour in range(1, args.hours + 1):
+        for p in rng.dirichlet(np.ones(len(emotions)), size=per_hour) * 100:
+            t += args.hop
+            before = tracemalloc.get_traced_memory()[0]
+            probs = dict(zip(emotions, p.tolist()))
+            history.append((t, probs))
+            history_bytes += tracemalloc.get_traced_memory()[0] - before
+            timeline.add(probs, t)
+
+        results[f"hour{hour}"] = row = {
+            'naive_recent_ms': time_query(lambda: naive_dominant(history, 300)) * 1000,
+            'naive_session_ms': time_query(lambda: naive_dominant(history)) * 1000,
+            'timeline_recent_ms': time_query(lambda: timeline.dominant(300), 1000) * 1000,
+            'timeline_session_ms': time_query(lambda: timeline.dominant(), 1000) * 1000,
+            'naive_memory_mb': history_bytes / 2 ** 20,
+            'timeline_memory_mb': timeline.nbytes() / 2 ** 20,
+        }
+        print(f"{hour:2d} ч: 5 мин {row['naive_recent_ms']:7.2f} -> {row['timeline_recent_ms']:.4f} мс, "
+              f"сессия {row['naive_session_ms']:7.2f} -> {row['timeline_session_ms']:.4f} мс, "
+              f"память {row['naive_memory_mb']:6.1f} -> {row['timeline_memory_mb']:.2f} МБ")
+    tracemalloc.stop()
+
+    write_report({
+        'environment': environment_info(),
+        'parameters': vars(args),
+        'results': results,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Бенчмарк транскрипции файлов Vosk: масштабирование по числу процессов
+
+Запуск (нужна модель Vosk):
+    python benchmarks/bench_transcription.py --vosk-model vosk-model-ru-0.42 --duration 3600 --workers 1,2,4,8
+"""
+import argparse
+import sys
+
+from common import environment_info, write_report
+from synthetic_audio import synth_speech_like
+
+from core.file_transcription import find_silence_splits, transcribe_audio
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк параллельной транскрипции")
+    parser.add_argument("--vosk-model", required=True, help="Каталог модели Vosk")
+    parser.add_argument("--duration", type=float, default=600.0, help="Длительность аудио, с")
+    parser.add_argument("--workers", default="1,2,4", help="Числа процессов")
+    parser.add_argument("--chunk-seconds", type=float, default=60.0)
+    parser.add_argument("--output", help="Файл для результатов в JSON")
+    args = parser.parse_args()
+
+    audio = synth_speech_like(args.duration, seed=3)
+    splits = find_silence_splits(audio, chunk_seconds=args.chunk_seconds)
+    print(f"{args.duration:g} с аудио, {len(splits)} фрагментов")
+
+    results = {}
+    baseline = None
+    for workers in [int(x) for x in args.workers.split(",")]:
+        try:
+            result = transcribe_audio(audio, args.vosk_model, workers=workers, chunk_seconds=args.chunk_seconds)
+        except FileNotFoundError as e:
+            print(e)
+            sys.exit(1)
+        baseline = baseline or result['elapsed']
+        results[f"workers_{workers}"] = {
+            'elapsed': result['elapsed'],
+            'decode_time': result['decode_time'],
+            'realtime_speed': args.duration / result['elapsed'],
+            'speedup': baseline / result['elapsed'],
+            'chunks': result['chunks'],
+            'words': len(result['words']),
+        }
+        print(f"{workers} процессов: {result['elapsed']:.1f} с, ускорение {baseline / result['elapsed']:.2f}x")
+
+    write_report({
+        'environment': environment_info(),
+        'config': vars(args),
+        'results': results,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
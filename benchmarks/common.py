@@ -0,0 +1,113 @@
+"""Общие функции бенчмарков: загрузка модели, замер времени, отчеты и сравнение с базой"""
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from core.emotion_pipeline import NUM2EMOTION, load_emotion_model
+
+
+def load_bench_model(kind="tiny"):
+    """
+    Модель для бенчмарков
+    - "real": модель приложения (требует загруженных весов)
+    - "tiny": маленькая HuBERT со случайными весами, без скачивания
+    """
+    if kind == "real":
+        return load_emotion_model()
+    else:
+        import torch
+        from transformers import HubertConfig, HubertForSequenceClassification, Wav2Vec2FeatureExtractor
+
+        torch.manual_seed(0)
+        config = HubertConfig(
+            hidden_size=64, num_hidden_layers=2, num_attention_heads=2, intermediate_size=128,
+            conv_dim=(32,) * 7, feat_extract_norm="layer", do_stable_layer_norm=True,
+            num_labels=len(NUM2EMOTION)
+        )
+        model = HubertForSequenceClassification(config)
+        feature_extractor = Wav2Vec2FeatureExtractor(
+            feature_size=1, sampling_rate=16000, padding_value=0.0,
+            do_normalize=True, return_attention_mask=True
+        )
+    model.eval()
+    return model, feature_extractor
+
+
+def time_call(fn, repeats=5, warmup=1):
+    """Многократный замер функции, возвращает (статистика в секундах, последний результат)"""
+    result = None
+    for _ in range(warmup):
+        result = fn()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return summarize_samples(samples), result
+
+
+def summarize_samples(samples):
+    """Медиана, p90, минимум и максимум выборки времени"""
+    ordered = sorted(samples)
+    p90_index = min(len(ordered) - 1, int(round(0.9 * (len(ordered) - 1))))
+    return {
+        'median': statistics.median(ordered),
+        'p90': ordered[p90_index],
+        'min': ordered[0],
+        'max': ordered[-1],
+        'n': len(ordered),
+    }
+
+
+def environment_info():
+    """Описание окружения для отчета"""
+    info = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+    try:
+        import torch
+        info['torch'] = torch.__version__
+        info['torch_threads'] = torch.get_num_threads()
+    except ImportError:
+        pass
+    return info
+
+
+def write_report(report, output):
+    """Печать отчета и запись в JSON"""
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    print(text)
+    if output:
+        Path(output).write_text(text, encoding="utf-8")
+
+
+def compare_to_baseline(results, baseline_path, tolerance=0.15, metric='median', min_delta=1e-4):
+    """
+    Сравнение результатов с базовым отчетом
+    results и baseline: словари {имя замера: статистика}
+    Возвращает список регрессий: замедление больше tolerance и больше
+    min_delta секунд (микросекундные стадии слишком шумные)
+    """
+    baseline = json.loads(Path(baseline_path).read_text(encoding="utf-8"))['results']
+    regressions = []
+    for name, stats in results.items():
+        base = baseline.get(name)
+        if not base or metric not in stats or not base.get(metric):
+            continue
+        ratio = stats[metric] / base[metric]
+        regressed = ratio > 1 + tolerance and stats[metric] - base[metric] > min_delta
+        marker = "РЕГРЕССИЯ" if regressed else "ок"
+        print(f"{name:55s} {base[metric] * 1000:10.2f} мс -> {stats[metric] * 1000:10.2f} мс  x{ratio:.2f}  {marker}")
+        if regressed:
+            regressions.append({'name': name, 'baseline': base[metric], 'current': stats[metric], 'ratio': ratio})
+    return regressions
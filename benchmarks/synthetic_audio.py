@@ -0,0 +1,57 @@
+"""
+Детерминированные синтетические аудиофикстуры для бенчмарков
+Сигнал похож на речь: основной тон с вибрато и гармониками, слоговая
+амплитудная огибающая, паузы и шум. Одинаковый seed дает одинаковый сигнал
+"""
+import numpy as np
+
+
+def synth_speech_like(duration, sample_rate=16000, channels=1, seed=0, f0=160.0):
+    """
+    Генерация речеподобного сигнала
+    Возвращает float32 массив формы [семплы] или [семплы, каналы]
+    """
+    rng = np.random.default_rng(seed)
+    n = int(duration * sample_rate)
+    t = np.arange(n, dtype=np.float64) / sample_rate
+
+    # Основной тон с медленным дрейфом и вибрато
+    drift = 1.0 + 0.15 * np.sin(2 * np.pi * 0.3 * t + rng.uniform(0, 2 * np.pi))
+    vibrato = 1.0 + 0.02 * np.sin(2 * np.pi * 5.5 * t)
+    phase = 2 * np.pi * np.cumsum(f0 * drift * vibrato) / sample_rate
+
+    signal = np.zeros(n, dtype=np.float64)
+    for harmonic in range(1, 6):
+        signal += np.sin(harmonic * phase) / harmonic
+
+    # Слоговая огибающая ~4 Гц и паузы между фразами
+    syllables = np.clip(np.sin(2 * np.pi * 4.0 * t + rng.uniform(0, 2 * np.pi)), 0, None)
+    phrases = (np.sin(2 * np.pi * 0.25 * t + rng.uniform(0, 2 * np.pi)) > -0.5).astype(np.float64)
+    signal *= syllables * phrases
+
+    signal += 0.02 * rng.standard_normal(n)
+    signal = (0.5 * signal / (np.max(np.abs(signal)) + 1e-9)).astype(np.float32)
+
+    if channels == 1:
+        return signal
+
+    # Каналы отличаются задержкой и уровнем, как у стереомикрофона
+    out = np.empty((n, channels), dtype=np.float32)
+    for c in range(channels):
+        out[:, c] = np.roll(signal, c * 7) * (1.0 - 0.1 * c)
+    return out
+
+
+def write_fixture(path, duration, sample_rate=16000, channels=1, seed=0):
+    """Запись синтетического сигнала в WAV (16 бит)"""
+    import soundfile as sf
+
+    audio = synth_speech_like(duration, sample_rate, channels, seed)
+    sf.write(str(path), audio, sample_rate, subtype='PCM_16')
+    return path
+
+
+def chunk_stream(audio, chunk_size=1024):
+    """Разбиение сигнала на блоки, как их отдает микрофон"""
+    for start in range(0, len(audio) - chunk_size + 1, chunk_size):
+        yield audio[start:start + chunk_size]
@@ -0,0 +1,120 @@
+import threading
+
+from core.perf_counters import TimedModel
+
+
+class AdaptiveWindowController:
+    """
+    Адаптивное окно анализа в реальном времени
+    По измеренному времени инференса подбирает длину окна и шаг так, чтобы
+    коэффициент реального времени (время инференса окна / шаг) не превышал target_rtf
+    - Отстает: сначала убирается перекрытие окон, затем окно удлиняется
+      (фиксированные накладные расходы делятся на больший отрезок аудио)
+    - Запас большой: окно возвращается к предпочтительной длине, затем
+      уменьшается шаг, чтобы результаты приходили чаще
+    Окно всегда остается в пределах [min_window, max_window], шаг - в [min_hop, окно]
+    """
+
+    def __init__(self, min_window=1.0, max_window=10.0, preferred_window=3.0, target_rtf=0.6,
+                 min_hop=0.5, step=0.5, smoothing=0.3, cooldown=3):
+        self.min_window = min_window
+        self.max_window = max_window
+        self.target_rtf = target_rtf
+        self.min_hop = min_hop
+        self.step = step
+        self.smoothing = smoothing
+        self.cooldown = cooldown
+        self.active = False
+        self._lock = threading.Lock()
+        self.reset(preferred_window)
+
+    def reset(self, preferred_window=None):
+        """Сброс измерений; окно и шаг возвращаются к предпочтительной длине"""
+        with self._lock:
+            if preferred_window is not None:
+                self.preferred_window = self._clamp(preferred_window, self.min_window, self.max_window)
+            self.window = self.preferred_window
+            self.hop = self.preferred_window
+            self.rtf = None
+            self.inference_time = None
+            self._since_change = 0
+            self._changed = False
+
+    def set_bounds(self, min_window, max_window):
+        with self._lock:
+            self.min_window = min(min_window, max_window)
+            self.max_window = max(min_window, max_window)
+            self.preferred_window = self._clamp(self.preferred_window, self.min_window, self.max_window)
+            self.window = self._clamp(self.window, self.min_window, self.max_window)
+            self.hop = self._clamp(self.hop, min(self.min_hop, self.window), self.window)
+            self._changed = True
+
+    def observe(self, audio_seconds, inference_seconds):
+        """Учет одного прямого прохода; возвращает True, если окно или шаг изменились"""
+        if not self.active or audio_seconds <= 0:
+            return False
+
+        with self._lock:
+            # Окно могло прийти еще со старыми настройками - приводим время к текущей длине
+            sample_time = inference_seconds * self.window / audio_seconds
+            if self.inference_time is None:
+                self.inference_time = sample_time
+            else:
+                self.inference_time += self.smoothing * (sample_time - self.inference_time)
+            self.rtf = self.inference_time / self.hop
+
+            self._since_change += 1
+            if self._since_change < self.cooldown:
+                return False
+
+            window, hop = self.window, self.hop
+            min_hop = min(self.min_hop, window)
+            if self.rtf > self.target_rtf:
+                if hop < window:
+                    hop = min(window, hop + self.step)
+                else:
+                    window = min(self.max_window, window + self.step)
+                    hop = window
+            elif self.rtf < self.target_rtf * 0.5:
+                if window > self.preferred_window:
+                    window = max(self.preferred_window, window - self.step)
+                    hop = min(hop, window)
+                elif hop > min_hop:
+                    hop = max(min_hop, hop - self.step)
+
+            if (window, hop) == (self.window, self.hop):
+                return False
+            # Время инференса пропорционально длине окна
+            self.inference_time *= window / self.window
+            self.window, self.hop = window, hop
+            self._since_change = 0
+            self._changed = True
+            return True
+
+    def take_change(self):
+        """(окно, шаг), если настройки изменились с прошлого вызова, иначе None"""
+        with self._lock:
+            if not self._changed:
+                return None
+            self._changed = False
+            return self.window, self.hop
+
+    def describe(self):
+        """Текущие настройки для строки состояния"""
+        rtf = f"{self.rtf:.2f}" if self.rtf is not None else "--"
+        return f"окно {self.window:.1f}с, шаг {self.hop:.1f}с, RTF {rtf} (цель {self.target_rtf:.2f})"
+
+    def wrap(self, model, sample_rate=16000):
+        """
+        Модель с замером прямых проходов только для потребителя реального времени
+        (длина аудио берется из input_values); общая модель не меняется
+        """
+        def on_forward(input_values, seconds):
+            # В батче несколько окон: учитывается суммарная длина аудио
+            self.observe(input_values.numel() / sample_rate, seconds)
+
+        return TimedModel(model, on_forward)
+
+    @staticmethod
+    def _clamp(value, low, high):
+        return max(low, min(high, value))
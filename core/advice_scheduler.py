@@ -0,0 +1,79 @@
+import hashlib
+import json
+import time
+
+
+class AdviceTriggerScheduler:
+    """
+    Планировщик автоматических запросов совета от ИИ
+    Запрос отправляется, только если выполнены все условия:
+    - есть что-то новое: накоплено N новых слов или сменилась доминирующая эмоция
+    - с прошлого совета прошло не меньше min_interval секунд
+    - число выполняемых запросов меньше max_in_flight
+    - контекст отличается от последнего отправленного (одинаковые промпты не повторяются)
+    """
+
+    def __init__(self, words_threshold=50, min_interval=15.0, max_in_flight=1,
+                 trigger_on_emotion_change=True):
+        self.words_threshold = words_threshold
+        self.min_interval = min_interval
+        self.max_in_flight = max_in_flight
+        self.trigger_on_emotion_change = trigger_on_emotion_change
+        # Выполняемые запросы переживают сброс: они завершатся через mark_done
+        self.in_flight = set()
+        self.reset()
+
+    def reset(self):
+        """Сброс состояния (например, при смене цели разговора)"""
+        self.new_words = 0
+        self.last_advice_time = None
+        self.last_emotion = None
+        self.last_context_key = None
+
+    def add_words(self, count):
+        """Учет новых распознанных слов"""
+        self.new_words += count
+
+    def check_trigger(self, dominant_emotion, now=None):
+        """
+        Проверка автоматических условий
+        Возвращает причину запроса или None
+        """
+        now = time.monotonic() if now is None else now
+        # Первая наблюдаемая эмоция - точка отсчета для смены эмоции до первого совета
+        if self.last_emotion is None:
+            self.last_emotion = dominant_emotion
+
+        if len(self.in_flight) >= self.max_in_flight:
+            return None
+        if self.last_advice_time is not None and now - self.last_advice_time < self.min_interval:
+            return None
+
+        if self.new_words >= self.words_threshold:
+            return 'words'
+        if (self.trigger_on_emotion_change and self.last_emotion is not None
+                and dominant_emotion != self.last_emotion and self.new_words > 0):
+            return 'emotion'
+        return None
+
+    @staticmethod
+    def context_key(messages):
+        """Хеш контекста запроса для отсечения повторов"""
+        payload = json.dumps(messages, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def is_duplicate(self, key):
+        """Совпадает ли контекст с последним отправленным"""
+        return key == self.last_context_key
+
+    def mark_sent(self, job_id, key, dominant_emotion, now=None):
+        """Фиксация отправленного запроса"""
+        self.last_advice_time = time.monotonic() if now is None else now
+        self.last_context_key = key
+        self.last_emotion = dominant_emotion
+        self.new_words = 0
+        self.in_flight.add(job_id)
+
+    def mark_done(self, job_id):
+        """Запрос завершен, отменен или вытеснен"""
+        self.in_flight.discard(job_id)
@@ -0,0 +1,142 @@
+import threading
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from core.llm_client import generate_advice
+from core.profiling import profile_scope
+
+
+class AIAdviceWorker(QThread):
+    """
+    Постоянный поток ИИ советника
+    - Принимает задания в очередь из одного ожидающего слота
+    - Более новое задание вытесняет ожидающее (контекст всегда самый свежий)
+    - Поддерживает отмену текущего задания между токенами
+    - Запрос идет в этом же потоке: stop() срабатывает на следующем фрагменте
+      ответа (до первого фрагмента ожидание ограничено ollama.timeout)
+    - Отдает результат через сигналы, без опроса таймером
+    - Повторные запросы с тем же контекстом обслуживаются из кеша
+    """
+
+    job_started = pyqtSignal(int)
+    chunk_received = pyqtSignal(int, str)
+    job_finished = pyqtSignal(int, dict)
+    job_cancelled = pyqtSignal(int)
+
+    def __init__(self, client, cache=None, parent=None):
+        super().__init__(parent)
+        self.client = client
+        self.cache = cache
+        self._condition = threading.Condition()
+        self._pending = None
+        self._current_id = None
+        self._cancel_current = False
+        self._running = True
+        self._next_id = 1
+
+    def submit(self, messages):
+        """Постановка задания в очередь, возвращает идентификатор задания"""
+        with self._condition:
+            job_id = self._next_id
+            self._next_id += 1
+
+            # Ожидающее задание с устаревшим контекстом заменяется новым
+            replaced = self._pending
+            self._pending = {'id': job_id, 'messages': messages}
+            self._condition.notify()
+
+        if replaced is not None:
+            self.job_cancelled.emit(replaced['id'])
+        return job_id
+
+    def is_busy(self):
+        """Есть ли выполняемое или ожидающее задание"""
+        with self._condition:
+            return self._current_id is not None or self._pending is not None
+
+    def queue_depth(self):
+        """Число заданий в работе: выполняемое и ожидающее (для панели производительности)"""
+        with self._condition:
+            return (self._current_id is not None) + (self._pending is not None)
+
+    def cancel(self):
+        """Отмена текущего и ожидающего заданий"""
+        with self._condition:
+            dropped = self._pending
+            self._pending = None
+            if self._current_id is not None:
+                self._cancel_current = True
+
+        if dropped is not None:
+            self.job_cancelled.emit(dropped['id'])
+
+    def stop(self):
+        """Остановка потока (ожидающие задания отбрасываются)"""
+        with self._condition:
+            self._running = False
+            self._pending = None
+            self._cancel_current = True
+            self._condition.notify_all()
+
+    def run(self):
+        """Основной цикл: ожидание задания и потоковая генерация"""
+        while True:
+            with self._condition:
+                while self._running and self._pending is None:
+                    self._condition.wait()
+                if not self._running:
+                    return
+                job = self._pending
+                self._pending = None
+                self._current_id = job['id']
+                self._cancel_current = False
+
+            self.job_started.emit(job['id'])
+            try:
+                metrics = self._generate(job)
+            finally:
+                with self._condition:
+                    cancelled = self._cancel_current
+                    self._current_id = None
+                    self._cancel_current = False
+
+            if cancelled:
+                self.job_cancelled.emit(job['id'])
+            else:
+                self.job_finished.emit(job['id'], metrics)
+
+    def _is_cancelled(self):
+        with self._condition:
+            return self._cancel_current
+
+    def _emit_chunk(self, job_id, content):
+        # После stop() окно может быть уже уничтожено: сигналы не испускаются
+        with self._condition:
+            if self._running:
+                self.chunk_received.emit(job_id, content)
+
+    def _generate(self, job):
+        """Потоковый запрос к Ollama с расчетом метрик"""
+        try:
+            with profile_scope('advisor', torch_trace=False):
+                return generate_advice(
+                    self.client,
+                    job['messages'],
+                    lambda content: self._emit_chunk(job['id'], content),
+                    cache=self.cache,
+                    is_cancelled=self._is_cancelled
+                )
+
+        except Exception as e:
+            print(f"Ошибка получения совета от ИИ: {e}")
+            # Создаем демонстрационный совет при ошибке
+            demo_advice = (
+                "Демонстрационный совет от ИИ:\n\n"
+                "1. Собеседник проявляет интерес к теме - задайте уточняющие вопросы.\n"
+                "2. Поддерживайте позитивный настрой разговора.\n"
+                "3. Используйте открытые вопросы для получения больше информации.\n"
+                "4. Проявляйте эмпатию и понимание.\n"
+                "5. Следите за эмоциональным состоянием собеседника."
+            )
+            self._emit_chunk(job['id'], demo_advice)
+            return {'error': str(e)}
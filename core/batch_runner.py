@@ -0,0 +1,367 @@
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+from pathlib import Path
+
+
+# Возобновляемая пакетная обработка по манифесту
+# Каталог задания (может лежать на общей файловой системе):
+#   manifest.json                  - параметры и число шардов
+#   shards/shard-00000.txt         - пути файлов шарда, по одному в строке
+#   locks/shard-00000.lock         - захват шарда узлом (O_EXCL), mtime - пульс
+#   checkpoints/shard-00000.jsonl  - результаты готовых файлов (дозапись)
+#   quarantine/shard-00000.jsonl   - файлы с ошибкой и текст ошибки
+#   done/shard-00000.done          - шард полностью обработан
+# Узлы не общаются между собой: каждый захватывает свободный шард lock-файлом,
+# поэтому пропускная способность растет с числом узлов. Захват узла, переставшего
+# обновлять пульс дольше lease_seconds, перехватывается другим узлом
+
+MANIFEST_NAME = "manifest.json"
+
+
+def shard_name(index):
+    return f"shard-{index:05d}"
+
+
+def node_name():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def create_job(job_dir, inputs, shard_size=200, options=None):
+    """
+    Создание задания: пути делятся на шарды по shard_size
+    Повторный вызов для существующего задания возвращает его манифест без изменений
+    """
+    job_dir = Path(job_dir)
+    manifest_path = job_dir / MANIFEST_NAME
+    if manifest_path.exists():
+        return json.loads(manifest_path.read_text(encoding="utf-8"))
+
+    inputs = [str(path) for path in inputs]
+    if not inputs:
+        raise ValueError("Нет входных файлов")
+    for sub in ("shards", "locks", "checkpoints", "quarantine", "done"):
+        (job_dir / sub).mkdir(parents=True, exist_ok=True)
+
+    shards = 0
+    for start in range(0, len(inputs), shard_size):
+        _write_atomic(job_dir / "shards" / f"{shard_name(shards)}.txt",
+                      "\n".join(inputs[start:start + shard_size]) + "\n")
+        shards += 1
+
+    manifest = {
+        'created_at': time.time(),
+        'items': len(inputs),
+        'shard_size': shard_size,
+        'shards': shards,
+        'options': options or {},
+    }
+    # Манифест пишется последним: задание без манифеста считается недосозданным
+    _write_atomic(manifest_path, json.dumps(manifest, ensure_ascii=False, indent=2))
+    return manifest
+
+
+def list_inputs(source, extensions=(".wav", ".mp3", ".flac", ".ogg", ".m4a", ".opus")):
+    """Файлы из каталога (рекурсивно, в порядке имен) или из списка путей в текстовом файле"""
+    source = Path(source)
+    if source.is_dir():
+        return sorted(str(p) for p in source.rglob("*") if p.suffix.lower() in extensions)
+    return [line.strip() for line in source.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+
+class ShardLock:
+    """
+    Захват шарда lock-файлом с периодическим обновлением mtime
+    Lock-файл появляется целиком через os.link заранее записанного временного
+    файла (link не заменяет существующий файл). Пульс проверяет, что файл
+    по-прежнему называет этот узел; иначе выставляется lost и обработка шарда
+    прекращается
+    """
+
+    def __init__(self, path, node, lease_seconds):
+        self.path = Path(path)
+        self.node = node
+        self.lease_seconds = lease_seconds
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def acquire(self):
+        if not self._create():
+            if not self._remove_stale():
+                return False
+            if not self._create():
+                return False
+        # Повторное чтение: файл должен называть этот узел
+        if not self.owned():
+            return False
+        self._thread = threading.Thread(target=self._heartbeat, daemon=True)
+        self._thread.start()
+        return True
+
+    def _remove_stale(self):
+        """
+        Удаление устаревшего захвата другого узла
+        Файл переименовывается под уникальным именем (переименовать его сможет
+        только один узел) и сверяется с тем, что был признан устаревшим. Если за
+        это время другой узел уже перехватил шард и создал свежий захват, тот
+        возвращается на место
+        """
+        try:
+            seen = self.path.stat()
+        except FileNotFoundError:
+            return True
+        if time.time() - seen.st_mtime < self.lease_seconds:
+            return False
+        stale = self.path.with_name(f"{self.path.name}.stale-{self.node}-{threading.get_ident()}")
+        try:
+            os.rename(self.path, stale)
+        except OSError:
+            return False
+        taken = stale.stat()
+        if (taken.st_ino, taken.st_mtime) != (seen.st_ino, seen.st_mtime):
+            # Переименован чужой свежий захват - возвращаем его
+            try:
+                os.link(stale, self.path)
+            except OSError:
+                pass
+            stale.unlink(missing_ok=True)
+            return False
+        stale.unlink(missing_ok=True)
+        return True
+
+    def _create(self):
+        tmp = self.path.with_name(f".{self.path.name}.{self.node}-{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps({'node': self.node, 'claimed_at': time.time()}), encoding="utf-8")
+        try:
+            os.link(tmp, self.path)
+        except FileExistsError:
+            return False
+        finally:
+            tmp.unlink(missing_ok=True)
+        return True
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.lease_seconds / 4):
+            if not self.owned():
+                self.lost.set()
+                return
+            try:
+                os.utime(self.path)
+            except OSError:
+                self.lost.set()
+                return
+
+    def owned(self):
+        """Захват все еще наш (его не перехватили после паузы узла)"""
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8")).get('node') == self.node
+        except (OSError, ValueError):
+            return False
+
+    def release(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self.owned():
+            self.path.unlink(missing_ok=True)
+
+
+class BatchRunner:
+    """
+    Обработка шардов задания на одном узле
+    process_item(path) возвращает словарь результата; исключение отправляет
+    файл в карантин с текстом ошибки, обработка шарда продолжается
+    """
+
+    def __init__(self, job_dir, process_item, node=None, lease_seconds=300, checkpoint_every=20,
+                 retry_failed=False, on_item=None):
+        self.job_dir = Path(job_dir)
+        self.manifest = json.loads((self.job_dir / MANIFEST_NAME).read_text(encoding="utf-8"))
+        self.process_item = process_item
+        self.node = node or node_name()
+        self.lease_seconds = lease_seconds
+        self.checkpoint_every = max(1, checkpoint_every)
+        self.retry_failed = retry_failed
+        self.on_item = on_item
+        self.stats = {'shards': 0, 'processed': 0, 'failed': 0, 'skipped': 0}
+
+    def run(self, max_shards=None):
+        """Обработка свободных шардов, пока они есть; возвращает статистику узла"""
+        shards = self.manifest['shards']
+        # Узлы начинают с разных шардов, чтобы реже сталкиваться на захвате
+        offset = hash(self.node) % shards
+        for i in range(shards):
+            if max_shards is not None and self.stats['shards'] >= max_shards:
+                break
+            index = (offset + i) % shards
+            if self._path("done", index, ".done").exists():
+                continue
+            lock = ShardLock(self._path("locks", index, ".lock"), self.node, self.lease_seconds)
+            if not lock.acquire():
+                continue
+            try:
+                # Повторная проверка: шард мог завершиться между проверкой и захватом
+                if not self._path("done", index, ".done").exists():
+                    self.process_shard(index, lock)
+            finally:
+                lock.release()
+        return self.stats
+
+    def process_shard(self, index, lock=None):
+        items = self._path("shards", index, ".txt").read_text(encoding="utf-8").splitlines()
+        # Сбой посреди записи оставляет оборванную строку: без обрезки первая
+        # дозаписанная запись склеилась бы с ней и тоже не читалась
+        _repair_tail(self._path("checkpoints", index, ".jsonl"))
+        _repair_tail(self._path("quarantine", index, ".jsonl"))
+        finished = set(read_records(self._path("checkpoints", index, ".jsonl")))
+        failed = read_records(self._path("quarantine", index, ".jsonl"))
+        if not self.retry_failed:
+            finished |= set(failed)
+
+        pending = [item for item in items if item and item not in finished]
+        self.stats['skipped'] += len(items) - len(pending)
+        with open(self._path("checkpoints", index, ".jsonl"), "a", encoding="utf-8") as checkpoint, \
+                open(self._path("quarantine", index, ".jsonl"), "a", encoding="utf-8") as quarantine:
+            for n, item in enumerate(pending, 1):
+                started = time.perf_counter()
+                try:
+                    record = {'path': item, **self.process_item(item)}
+                    record['elapsed'] = time.perf_counter() - started
+                    _append(checkpoint, record)
+                    self.stats['processed'] += 1
+                except Exception as e:
+                    _append(quarantine, {
+                        'path': item,
+                        'error': f"{type(e).__name__}: {e}",
+                        'traceback': traceback.format_exc(limit=5),
+                        'node': self.node,
+                        'at': time.time(),
+                    })
+                    quarantine.flush()
+                    self.stats['failed'] += 1
+                if self.on_item:
+                    self.on_item(index, item)
+                if lock is not None and lock.lost.is_set():
+                    _sync(checkpoint)
+                    print(f"{shard_name(index)}: захват потерян, шард оставлен другому узлу")
+                    return False
+                if n % self.checkpoint_every == 0:
+                    _sync(checkpoint)
+                    if lock is not None and not lock.owned():
+                        # Шард перехвачен (узел надолго останавливался) - отдаем его
+                        print(f"{shard_name(index)}: захват потерян, шард оставлен другому узлу")
+                        return False
+            _sync(checkpoint)
+            _sync(quarantine)
+        # Шард завершен, только если каждый файл читается из контрольной точки или карантина
+        recorded = set(read_records(self._path("checkpoints", index, ".jsonl")))
+        recorded |= set(read_records(self._path("quarantine", index, ".jsonl")))
+        missing = {item for item in items if item} - recorded
+        if missing:
+            print(f"{shard_name(index)}: нет записей для {len(missing)} файлов, шард не завершен")
+            return False
+        _write_atomic(self._path("done", index, ".done"), json.dumps({'node': self.node, 'at': time.time()}))
+        self.stats['shards'] += 1
+        return True
+
+    def _path(self, sub, index, suffix):
+        return self.job_dir / sub / f"{shard_name(index)}{suffix}"
+
+
+def read_records(path):
+    """Записи JSONL по пути файла; оборванная последняя строка (сбой при записи) пропускается"""
+    records = {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                records[record['path']] = record
+    except FileNotFoundError:
+        pass
+    return records
+
+
+def job_status(job_dir, lease_seconds=300):
+    """Сводка задания: шарды, файлы, активные захваты"""
+    job_dir = Path(job_dir)
+    manifest = json.loads((job_dir / MANIFEST_NAME).read_text(encoding="utf-8"))
+    done = processed = failed = 0
+    active = []
+    now = time.time()
+    for index in range(manifest['shards']):
+        name = shard_name(index)
+        done += (job_dir / "done" / f"{name}.done").exists()
+        processed += len(read_records(job_dir / "checkpoints" / f"{name}.jsonl"))
+        failed += len(read_records(job_dir / "quarantine" / f"{name}.jsonl"))
+        lock = job_dir / "locks" / f"{name}.lock"
+        try:
+            age = now - lock.stat().st_mtime
+            node = json.loads(lock.read_text(encoding="utf-8")).get('node')
+            active.append({'shard': name, 'node': node, 'stale': age > lease_seconds})
+        except (OSError, ValueError):
+            pass
+    return {
+        'items': manifest['items'],
+        'shards': manifest['shards'],
+        'shards_done': done,
+        'processed': processed,
+        'failed': failed,
+        'remaining': manifest['items'] - processed - failed,
+        'locks': active,
+    }
+
+
+def iter_results(job_dir, quarantined=False):
+    """Результаты (или записи карантина) всех шардов по порядку"""
+    job_dir = Path(job_dir)
+    manifest = json.loads((job_dir / MANIFEST_NAME).read_text(encoding="utf-8"))
+    sub = "quarantine" if quarantined else "checkpoints"
+    for index in range(manifest['shards']):
+        yield from read_records(job_dir / sub / f"{shard_name(index)}.jsonl").values()
+
+
+def _append(f, record):
+    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def _repair_tail(path, block=65536):
+    """Обрезка JSONL после последнего перевода строки (оборванная запись при сбое)"""
+    try:
+        f = open(path, "rb+")
+    except FileNotFoundError:
+        return
+    with f:
+        end = f.seek(0, os.SEEK_END)
+        if end == 0:
+            return
+        f.seek(end - 1)
+        if f.read(1) == b"\n":
+            return
+        position = end
+        while position > 0:
+            start = max(0, position - block)
+            f.seek(start)
+            newline = f.read(position - start).rfind(b"\n")
+            if newline >= 0:
+                f.truncate(start + newline + 1)
+                return
+            position = start
+        f.truncate(0)
+
+
+def _sync(f):
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def _write_atomic(path, text):
+    tmp = Path(path).with_name(f".{Path(path).name}.{os.getpid()}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
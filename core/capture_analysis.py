@@ -0,0 +1,235 @@
+import json
+import threading
+import time
+
+import numpy as np
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from core import emotion_pipeline
+from core.capture_ring import WindowReader
+from core.thread_budget import pin_current_thread
+
+
+# Потребители кольца захвата для вкладки реального времени
+# Колбэк PyAudio только пишет блоки в кольцо (core.capture_ring), а окна HuBERT
+# и поток для Vosk читаются отсюда в своих потоках по абсолютной позиции.
+# Каждый результат окна несет позицию его конца в потоке: предварительная
+# оценка по просодии и эмбеддинги сопоставляются с тем аудио, из которого
+# получен результат, а не с моментом его вывода
+
+# Окно, которое сейчас анализирует поток окон (только в этом потоке)
+_analysis = threading.local()
+
+
+def current_window_time():
+    """
+    Время начала анализируемого окна (time.time()) для вызова из прямого прохода
+    в потоке окон; в других потоках (анализ файлов, транскрипция) - None
+    """
+    return getattr(_analysis, 'window_time', None)
+
+
+class WindowAnalysisWorker(QThread):
+    """
+    Анализ эмоций по окнам кольца захвата
+    window_analyzed(вероятности, номер окна, конец окна в секундах потока,
+    время захвата конца окна по time.perf_counter или -1)
+    Время анализа окна пишется в счетчики захвата (hubert, windows). Новые окно и шаг (set_window) применяются перед следующим окном;
+    on_timing(секунды аудио, секунды анализа) - замер каждого окна
+    (адаптивное окно), только для вызовов этого потока
+    """
+
+    window_analyzed = pyqtSignal(dict, int, float, float)
+
+    def __init__(self, capture, model, feature_extractor, num2emotion, window_seconds=3.0, hop_seconds=None,
+                 on_timing=None, parent=None):
+        super().__init__(parent)
+        self.capture = capture
+        self.on_timing = on_timing
+        self.model = model
+        self.feature_extractor = feature_extractor
+        self.num2emotion = num2emotion
+        self.latest = None
+        self.reader = None
+        self._lock = threading.Lock()
+        self._settings = (window_seconds, hop_seconds)
+        self._changed = False
+        self._running = True
+
+    def set_window(self, window_seconds, hop_seconds=None):
+        with self._lock:
+            self._settings = (window_seconds, hop_seconds)
+            self._changed = True
+
+    def stop(self):
+        self._running = False
+
+    def backlog(self):
+        """Секунды записанного, но еще не проанализированного аудио"""
+        return self.reader.backlog() if self.reader is not None else 0.0
+
+    def run(self):
+        pin_current_thread('inference')
+        reader = self.reader = WindowReader(self.capture, *self._settings)
+        counter = 0
+        while self._running:
+            with self._lock:
+                if self._changed:
+                    reader.set_window(*self._settings)
+                    self._changed = False
+            window = reader.next_window(timeout=0.5)
+            if window is None:
+                if not self.capture.active:
+                    return
+                continue
+            end_time = reader.last_end / self.capture.sample_rate
+            captured_at = reader.last_captured_at
+            start = time.perf_counter()
+            # Время захвата конца окна переводится в time.time() и сдвигается на длину окна
+            ended = time.time() - (start - captured_at) if captured_at is not None else time.time()
+            _analysis.window_time = ended - len(window) / self.capture.sample_rate
+            try:
+                emotion, confidence, probs = emotion_pipeline.analyze_audio(
+                    self.model, self.feature_extractor, window, self.num2emotion)
+            except Exception as e:
+                print(f"Ошибка анализа окна: {e}")
+                continue
+            finally:
+                _analysis.window_time = None
+            elapsed = time.perf_counter() - start
+            self.capture.counters.record('hubert', elapsed)
+            self.capture.counters.increment('windows')
+            if self.on_timing is not None:
+                self.on_timing(len(window) / self.capture.sample_rate, elapsed)
+            counter += 1
+            self.latest = {'emotion': emotion, 'confidence': confidence}
+            self.window_analyzed.emit(probs, counter, end_time, captured_at if captured_at is not None else -1.0)
+
+
+class SpeechRecognitionWorker(QThread):
+    """
+    Распознавание речи Vosk по кольцу захвата
+    Блоки читаются с позиции, на которой остановился распознаватель; фраза
+    выдается с эмоцией последнего окна (emotion_source())
+    """
+
+    speech_recognized = pyqtSignal(str, dict)
+
+    def __init__(self, capture, recognizer, emotion_source=None, block_seconds=0.2, counters=None, parent=None):
+        super().__init__(parent)
+        self.capture = capture
+        self.recognizer = recognizer
+        self.emotion_source = emotion_source
+        self.counters = counters if counters is not None else capture.counters
+        self.block = np.zeros(int(block_seconds * capture.sample_rate), dtype=np.float32)
+        self.pcm = np.zeros(len(self.block), dtype=np.int16)
+        # Байтовое представление того же буфера: блок передается в Vosk без копии
+        self.pcm_bytes = memoryview(self.pcm).cast('B')
+        self._accepts_buffer = True
+        self.position = None
+        self._running = True
+
+    def stop(self):
+        self._running = False
+
+    def backlog(self):
+        """Секунды записанного, но еще не переданного распознавателю аудио"""
+        if self.position is None:
+            return 0.0
+        return max(0, self.capture.ring.position - self.position) / self.capture.sample_rate
+
+    def run(self):
+        pin_current_thread('asr')
+        ring = self.capture.ring
+        self.position = ring.position
+        while self._running:
+            if not self.capture.wait(self.position + len(self.block) - 1, timeout=0.5):
+                if not self.capture.active:
+                    break
+                continue
+            n, self.position, lost = ring.read_since(self.position, self.block)
+            if lost:
+                self.counters.increment('dropped_chunks.asr')
+            # float32 -> int16 в заранее выделенный буфер
+            np.clip(self.block[:n], -1.0, 32767 / 32768, out=self.block[:n])
+            np.multiply(self.block[:n], 32768, out=self.pcm[:n], casting='unsafe')
+            start = time.perf_counter()
+            final = self._accept(n)
+            self.counters.record('vosk', time.perf_counter() - start)
+            if final:
+                self._emit(self.recognizer.Result())
+        self._emit(self.recognizer.FinalResult())
+
+    def _accept(self, n):
+        view = self.pcm_bytes[:n * self.pcm.itemsize]
+        if self._accepts_buffer:
+            try:
+                return self.recognizer.AcceptWaveform(view)
+            except TypeError:
+                # Привязка принимает только bytes: копия на каждый блок
+                self._accepts_buffer = False
+        return self.recognizer.AcceptWaveform(bytes(view))
+
+    def _emit(self, result):
+        text = json.loads(result).get('text', '')
+        if text:
+            info = (self.emotion_source() if self.emotion_source else None) or {'emotion': 'нейтральная'}
+            self.speech_recognized.emit(text, dict(info))
+
+
+class ProsodyWorker(QThread):
+    """
+    Предварительная оценка эмоции по просодии на блоках кольца захвата
+    Оценка и дообучение идут в этом потоке, состояние оценщика не делится:
+    результаты HuBERT для дообучения (learn) ставятся в очередь и применяются
+    перед следующим блоком
+    estimated((эмоция, уверенность, вероятности), конец блока в секундах потока)
+    """
+
+    estimated = pyqtSignal(tuple, float)
+
+    def __init__(self, capture, estimator, chunk_seconds=0.2, parent=None):
+        super().__init__(parent)
+        self.capture = capture
+        self.estimator = estimator
+        self.chunk = np.zeros(int(chunk_seconds * capture.sample_rate), dtype=np.float32)
+        self.position = None
+        self._targets = []
+        self._running = True
+
+    def learn(self, probs, window_seconds, audio_time):
+        """Результат HuBERT для дообучения (из любого потока)"""
+        self._targets.append((probs, window_seconds, audio_time))
+
+    def stop(self):
+        self._running = False
+
+    def run(self):
+        # Легкая обработка сигнала рядом с распознаванием, как в сервере потоковой оценки
+        pin_current_thread('asr')
+        ring = self.capture.ring
+        self.position = ring.position
+        # Время оценщика - в секундах потока захвата, как концы окон HuBERT
+        self.estimator.audio_time = self.position / self.capture.sample_rate
+        while self._running:
+            if not self.capture.wait(self.position + len(self.chunk) - 1, timeout=0.5):
+                if not self.capture.active:
+                    return
+                continue
+            n, self.position, lost = ring.read_since(self.position, self.chunk)
+            if lost:
+                # Блоки, перезаписанные в кольце, учитываются только во времени
+                self.estimator.audio_time += lost / self.capture.sample_rate
+            targets, self._targets = self._targets, []
+            for probs, window_seconds, audio_time in targets:
+                self.estimator.learn(probs, window_seconds, audio_time)
+            result = self.estimator.push(self.chunk)
+            if result is not None:
+                self.estimated.emit(tuple(result), self.position / self.capture.sample_rate)
+
+
+def create_recognizer(model, sample_rate=emotion_pipeline.TARGET_SAMPLE_RATE):
+    """Распознаватель Vosk для потока по уже загруженной модели (vosk.Model)"""
+    from vosk import KaldiRecognizer
+
+    return KaldiRecognizer(model, sample_rate)
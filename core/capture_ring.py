@@ -0,0 +1,255 @@
+import threading
+import time
+
+import numpy as np
+
+from core.perf_counters import counters as perf_counters
+from core.thread_budget import pin_current_thread
+
+
+# Захват микрофона без выделения памяти на каждый блок
+# Колбэк PyAudio получает байты int16; np.frombuffer дает представление без
+# копии, и преобразование в float32 пишется сразу в заранее выделенное кольцо.
+# Потребители (окна HuBERT, Vosk) читают по абсолютной позиции в потоке
+# в свои заранее выделенные буферы
+
+INT16_SCALE = np.float32(1.0 / 32768.0)
+
+
+class SampleRing:
+    """
+    Кольцевой буфер float32 с одним писателем
+    position - число семплов, записанных с начала потока; читатель, отставший
+    больше чем на емкость кольца, получает только последние capacity семплов
+    """
+
+    def __init__(self, capacity):
+        self.capacity = int(capacity)
+        self.buffer = np.zeros(self.capacity, dtype=np.float32)
+        self.position = 0
+
+    def reset(self):
+        self.position = 0
+
+    def write_int16(self, data):
+        """Запись блока PCM int16 (bytes или массив) с преобразованием в float32 на месте"""
+        samples = np.frombuffer(data, dtype=np.int16)
+        n = len(samples)
+        if n > self.capacity:
+            samples = samples[-self.capacity:]
+            self.position += n - self.capacity
+            n = self.capacity
+        start = self.position % self.capacity
+        first = min(n, self.capacity - start)
+        # Присваивание приводит int16 к float32 без временного массива, затем масштаб на месте
+        head = self.buffer[start:start + first]
+        head[...] = samples[:first]
+        head *= INT16_SCALE
+        if first < n:
+            tail = self.buffer[:n - first]
+            tail[...] = samples[first:]
+            tail *= INT16_SCALE
+        # Позиция публикуется после записи данных: читатель не увидит незаписанные семплы
+        self.position += n
+        return n
+
+    def write(self, samples):
+        """Запись блока float32"""
+        samples = np.asarray(samples, dtype=np.float32)
+        n = len(samples)
+        if n > self.capacity:
+            samples = samples[-self.capacity:]
+            self.position += n - self.capacity
+            n = self.capacity
+        start = self.position % self.capacity
+        first = min(n, self.capacity - start)
+        self.buffer[start:start + first] = samples[:first]
+        if first < n:
+            self.buffer[:n - first] = samples[first:]
+        self.position += n
+        return n
+
+    def read_latest(self, out):
+        """Последние len(out) семплов в out; возвращает позицию конца или None, если данных мало"""
+        end = self.position
+        n = len(out)
+        if end < n:
+            return None
+        self.read_at(end - n, out)
+        return end
+
+    def read_since(self, position, out):
+        """
+        Семплы после position (не больше len(out)) в начало out
+        Возвращает (число семплов, новая позиция, потеряно семплов)
+        """
+        end = self.position
+        lost = 0
+        if end - position > self.capacity:
+            lost = end - position - self.capacity
+            position = end - self.capacity
+        n = min(len(out), end - position)
+        if n > 0:
+            self.read_at(position, out[:n])
+        return n, position + n, lost
+
+    def read_at(self, start_position, out):
+        """Копия семплов с абсолютной позиции start_position в out"""
+        n = len(out)
+        start = start_position % self.capacity
+        first = min(n, self.capacity - start)
+        out[:first] = self.buffer[start:start + first]
+        if first < n:
+            out[first:] = self.buffer[:n - first]
+
+
+class CallbackCapture:
+    """
+    Захват с микрофона в режиме колбэка PyAudio
+    Колбэк только пишет блок в кольцо и считает переполнения входа
+    (флаг paInputOverflow); чтение и анализ идут в потоках потребителей
+    """
+
+    def __init__(self, device_index=None, sample_rate=16000, frames_per_buffer=512, ring_seconds=30.0,
+                 counters=perf_counters):
+        self.device_index = device_index
+        self.sample_rate = sample_rate
+        self.frames_per_buffer = frames_per_buffer
+        self.ring = SampleRing(int(ring_seconds * sample_rate))
+        self.counters = counters
+        self.overflows = 0
+        self.callbacks = 0
+        # (позиция записи, time.perf_counter) после последнего блока - одним
+        # присваиванием, чтобы читатель не увидел позицию одного блока и время другого
+        self.captured = None
+        self.data_ready = threading.Event()
+        self._pyaudio = None
+        self._stream = None
+        self._overflow_flag = 0
+        self._continue = 0
+
+    def start(self):
+        import pyaudio
+
+        self._overflow_flag = pyaudio.paInputOverflow
+        self._continue = pyaudio.paContinue
+        self.ring.reset()
+        self.overflows = 0
+        self.callbacks = 0
+        self.captured = None
+        self._pyaudio = pyaudio.PyAudio()
+        self._stream = self._pyaudio.open(
+            format=pyaudio.paInt16,
+            channels=1,
+            rate=self.sample_rate,
+            input=True,
+            input_device_index=self.device_index,
+            frames_per_buffer=self.frames_per_buffer,
+            stream_callback=self._callback,
+        )
+        self._stream.start_stream()
+
+    def stop(self):
+        if self._stream is not None:
+            try:
+                self._stream.stop_stream()
+                self._stream.close()
+            finally:
+                self._stream = None
+        if self._pyaudio is not None:
+            self._pyaudio.terminate()
+            self._pyaudio = None
+        self.data_ready.set()
+
+    @property
+    def active(self):
+        return self._stream is not None and self._stream.is_active()
+
+    def _callback(self, in_data, frame_count, time_info, status_flags):
+        # Поток PortAudio закрепляется за ядром захвата при первом блоке
+        pin_current_thread('capture')
+        self.ring.write_int16(in_data)
+        self.callbacks += 1
+        self.captured = (self.ring.position, time.perf_counter())
+        if status_flags & self._overflow_flag:
+            self.overflows += 1
+            self.counters.increment('input_overflows')
+            self.counters.increment('dropped_chunks.capture')
+        self.data_ready.set()
+        return None, self._continue
+
+    def wait(self, position, timeout=1.0):
+        """Ожидание, пока позиция записи не станет больше position; False по таймауту"""
+        deadline = time.perf_counter() + timeout
+        while self.ring.position <= position:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0 or self._stream is None:
+                return False
+            self.data_ready.clear()
+            # Повторная проверка после сброса: колбэк мог успеть между ними
+            if self.ring.position > position:
+                break
+            self.data_ready.wait(remaining)
+        return True
+
+    def capture_time(self, position):
+        """Оценка времени захвата семпла position (time.perf_counter) по последнему блоку"""
+        captured = self.captured
+        if captured is None:
+            return None
+        end, captured_at = captured
+        return captured_at - (end - position) / self.sample_rate
+
+    def stats(self):
+        return {
+            'callbacks': self.callbacks,
+            'overflows': self.overflows,
+            'samples': self.ring.position,
+            'seconds': self.ring.position / self.sample_rate,
+        }
+
+
+class WindowReader:
+    """
+    Окна анализа из кольца захвата: окно window_seconds каждые hop_seconds
+    Окно копируется в один и тот же заранее выделенный буфер - потребитель
+    должен обработать его (или скопировать) до следующего вызова next_window
+    """
+
+    def __init__(self, capture, window_seconds=3.0, hop_seconds=None):
+        self.capture = capture
+        self.window = np.zeros(0, dtype=np.float32)
+        # Позиция конца последнего выданного окна (семплы с начала потока)
+        # и время его захвата (для задержки захват -> экран)
+        self.last_end = 0
+        self.last_captured_at = None
+        self.set_window(window_seconds, hop_seconds)
+
+    def set_window(self, window_seconds, hop_seconds=None):
+        sample_rate = self.capture.sample_rate
+        window = min(int(window_seconds * sample_rate), self.capture.ring.capacity)
+        if window != len(self.window):
+            self.window = np.zeros(window, dtype=np.float32)
+        self.hop = max(1, int((hop_seconds or window_seconds) * sample_rate))
+        self.next_end = max(window, self.capture.ring.position + self.hop)
+
+    def next_window(self, timeout=1.0):
+        """Следующее окно (представление буфера) или None, если захват остановлен или таймаут"""
+        if not self.capture.wait(self.next_end - 1, timeout):
+            return None
+        ring = self.capture.ring
+        end = ring.position
+        if end - self.next_end >= self.hop:
+            # Потребитель отстает: пропускаем устаревшие окна и берем самое свежее
+            skipped = (end - self.next_end) // self.hop
+            self.capture.counters.increment('skipped_windows', skipped)
+            self.next_end += skipped * self.hop
+        ring.read_at(self.next_end - len(self.window), self.window)
+        self.last_end = self.next_end
+        self.last_captured_at = self.capture.capture_time(self.last_end)
+        self.next_end += self.hop
+        return self.window
+
+    def backlog(self):
+        """Секунды аудио, записанные после конца последнего выданного окна"""
+        return max(0, self.capture.ring.position - self.last_end) / self.capture.sample_rate
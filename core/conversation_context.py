@@ -0,0 +1,189 @@
+import threading
+import time
+
+
+ADVISOR_SYSTEM_PROMPT = 'Ты - эксперт по коммуникациям и психологии. Анализируй разговор и давай конкретные советы очень кратко и лаконично. Отвечай только на русском языке.'
+ADVICE_INSTRUCTIONS = (
+    "Проанализируй разговор и дай 3-5 конкретных советов:\n"
+    "1. Что делать дальше для достижения цели?\n"
+    "2. Как реагировать на текущие эмоции собеседника?\n"
+    "3. Какие вопросы задать?\n"
+    "4. Чего избегать в разговоре?\n"
+    "5. Как улучшить коммуникацию?\n\n"
+    "Ответ дай на русском языке, структурированно и конкретно. Будь краток!"
+)
+
+EMOTION_EMOJI = {
+    'радость': '😊',
+    'грусть': '😢',
+    'гнев': '😠',
+    'нейтральная': '😐'
+}
+
+SUMMARY_SYSTEM_PROMPT = (
+    'Ты ведешь краткое резюме разговора. Тебе дают предыдущее резюме и новые фразы. '
+    'Верни обновленное резюме на русском языке: ключевые темы, договоренности, '
+    'возражения и эмоциональный фон собеседника. Без вступлений, не более {max_words} слов.'
+)
+
+
+def count_words(entries):
+    """Количество слов в записях истории разговора"""
+    return sum(len(entry['text'].split()) for entry in entries)
+
+
+def recent_window_start(history, window_words):
+    """Индекс первой записи, входящей в последние window_words слов"""
+    total_words = 0
+    start = len(history)
+    for i in range(len(history) - 1, -1, -1):
+        words = len(history[i]['text'].split())
+        if total_words + words > window_words:
+            break
+        total_words += words
+        start = i
+    return start
+
+
+def build_advice_system_prompt(goal):
+    """
+    Системный промпт с целью разговора
+    Не меняется от запроса к запросу, поэтому Ollama переиспользует
+    закешированный префикс промпта
+    """
+    return f"{ADVISOR_SYSTEM_PROMPT}\n\n{ADVICE_INSTRUCTIONS}\n\nЦель разговора: {goal}"
+
+
+def format_conversation(entries):
+    """Форматирование фраз разговора для отправки в ИИ"""
+    formatted_conversation = []
+    for entry in entries:
+        emotion = entry['emotion']
+        color_code = EMOTION_EMOJI.get(emotion, '😐')
+        formatted_conversation.append(f"[{color_code} {emotion.upper()}] {entry['text']}")
+    return "\n".join(formatted_conversation)
+
+
+def build_advice_messages(goal, history, summary, summarized_count, window_words, max_words,
+                          dominant_emotion, emotion_trend=""):
+    """
+    Формирование сообщений для ИИ советника
+    max_words - предел дословной части: последние window_words слов и фразы,
+    еще не свернутые в резюме
+    emotion_trend - сводка по временному ряду эмоций (core.emotion_timeline)
+    """
+    # Дословно передаются последние N слов, а если резюме отстает (обновление
+    # идет или не удалось) - и все несвернутые фразы перед ними, в пределах
+    # max_words. Не поместившиеся фразы не исчезают молча: промпт сообщает о пропуске
+    start = max(summarized_count, recent_window_start(history, max(window_words, max_words)))
+    conversation_text = format_conversation(history[start:])
+    omitted = start - summarized_count
+    if omitted > 0:
+        conversation_text = f"(еще {omitted} более ранних фраз не вошли в резюме и опущены)\n{conversation_text}"
+
+    return [
+        {
+            'role': 'system',
+            'content': build_advice_system_prompt(goal)
+        },
+        {
+            'role': 'user',
+            'content': (
+                f"Резюме предыдущей части разговора:\n{summary or '(разговор только начался)'}\n\n"
+                f"Последние фразы:\n{conversation_text}\n\n"
+                f"Доминирующая эмоция собеседника: {dominant_emotion}"
+                + (f"\nЭмоции по времени: {emotion_trend}" if emotion_trend else "")
+            )
+        }
+    ]
+
+
+class RollingConversationSummary:
+    """
+    Иерархический контекст для ИИ советника
+    - Старая часть разговора сворачивается в резюме фоновым запросом к модели
+    - Последние N слов передаются дословно
+    - Резюме обновляется инкрементально: предыдущее резюме + новые фразы
+    Размер промпта не растет с длиной разговора
+    """
+
+    def __init__(self, client, fold_words=120, max_summary_words=100):
+        self.client = client
+        self.fold_words = fold_words
+        self.max_summary_words = max_summary_words
+        self._lock = threading.Lock()
+        self._thread = None
+        self.reset()
+
+    def reset(self):
+        """Сброс резюме (новая цель или новый разговор)"""
+        with self._lock:
+            self._summary = ""
+            self._summarized_count = 0
+            # Результаты запущенных до сброса обновлений отбрасываются
+            self._generation = getattr(self, '_generation', 0) + 1
+
+    def snapshot(self):
+        """Текущее резюме и число записей истории, вошедших в него"""
+        with self._lock:
+            return self._summary, self._summarized_count
+
+    def maybe_refresh(self, history, window_words):
+        """
+        Запуск фонового обновления резюме, если вне дословного окна
+        накопилось не меньше fold_words несвернутых слов
+        """
+        if self._thread and self._thread.is_alive():
+            return
+
+        with self._lock:
+            summary = self._summary
+            summarized_count = self._summarized_count
+            generation = self._generation
+
+        upto = recent_window_start(history, window_words)
+        pending = history[summarized_count:upto]
+        if count_words(pending) < self.fold_words:
+            return
+
+        self._thread = threading.Thread(
+            target=self._refresh,
+            args=(summary, list(pending), upto, generation),
+            daemon=True
+        )
+        self._thread.start()
+
+    def _refresh(self, previous_summary, entries, upto, generation):
+        start = time.perf_counter()
+        phrases = "\n".join(f"[{entry['emotion']}] {entry['text']}" for entry in entries)
+        try:
+            response = self.client.chat(
+                [
+                    {
+                        'role': 'system',
+                        'content': SUMMARY_SYSTEM_PROMPT.format(max_words=self.max_summary_words)
+                    },
+                    {
+                        'role': 'user',
+                        'content': f"Предыдущее резюме:\n{previous_summary or '(пусто)'}\n\nНовые фразы:\n{phrases}"
+                    }
+                ],
+                num_predict=self.max_summary_words * 3
+            )
+            summary = response['message']['content'].strip()
+        except Exception as e:
+            print(f"Ошибка обновления резюме разговора: {e}")
+            return
+
+        # Жесткое ограничение длины на случай, если модель не уложилась
+        words = summary.split()
+        if len(words) > self.max_summary_words:
+            summary = " ".join(words[:self.max_summary_words])
+
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._summary = summary
+            self._summarized_count = upto
+        print(f"Резюме разговора обновлено за {time.perf_counter() - start:.2f}с "
+              f"({len(entries)} фраз свернуто)")
@@ -0,0 +1,299 @@
+import json
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+# Хранилище эмбеддингов окон HuBERT и поиск ближайших соседей
+# - vectors.f32: матрица float32 (строка на окно), только дозапись
+# - items.bin: записи метаданных той же длины (сессия, время, эмоция, уверенность)
+# - meta.json: размерность; ivf.npz: индекс IVF
+# Номер строки - идентификатор эмбеддинга. Векторы нормализуются при записи,
+# поэтому близость - косинусная (скалярное произведение)
+
+ITEM_DTYPE = np.dtype([
+    ('session_id', '<i8'),
+    ('timestamp', '<f8'),
+    ('emotion', '<i2'),
+    ('confidence', '<f4'),
+])
+
+
+class EmbeddingStore:
+    """
+    Дозаписываемое хранилище эмбеддингов
+    Векторы копятся в буфере и дописываются в файлы пачками по flush_every
+    """
+
+    def __init__(self, path="embeddings", dim=None, flush_every=256):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.flush_every = flush_every
+        self._lock = threading.Lock()
+        self._pending_vectors = []
+        self._pending_items = []
+        self._vectors = None
+        self.index = None
+
+        meta_path = self.path / "meta.json"
+        if meta_path.exists():
+            self.dim = json.loads(meta_path.read_text(encoding="utf-8"))['dim']
+            if dim is not None and dim != self.dim:
+                raise ValueError(f"Размерность хранилища {self.dim}, а не {dim}")
+        else:
+            self.dim = dim
+        self.count = self._repair() if self.dim else 0
+        if (self.path / "ivf.npz").exists():
+            self.index = IVFIndex.load(self.path / "ivf.npz")
+
+    @property
+    def vectors_path(self):
+        return self.path / "vectors.f32"
+
+    @property
+    def items_path(self):
+        return self.path / "items.bin"
+
+    def _repair(self):
+        """Число целых строк; хвост после прерванной записи отрезается"""
+        row_bytes = self.dim * 4
+        vectors = self.vectors_path.stat().st_size // row_bytes if self.vectors_path.exists() else 0
+        items = self.items_path.stat().st_size // ITEM_DTYPE.itemsize if self.items_path.exists() else 0
+        count = min(vectors, items)
+        for path, size in ((self.vectors_path, count * row_bytes), (self.items_path, count * ITEM_DTYPE.itemsize)):
+            if path.exists() and path.stat().st_size != size:
+                with open(path, "r+b") as f:
+                    f.truncate(size)
+        return count
+
+    def add(self, vectors, session_id=-1, timestamp=None, emotions=None, confidences=None):
+        """Добавление векторов (n, dim); возвращает идентификатор первого"""
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        n = len(vectors)
+        items = np.zeros(n, dtype=ITEM_DTYPE)
+        items['session_id'] = -1 if session_id is None else session_id
+        items['timestamp'] = timestamp or time.time()
+        items['emotion'] = -1 if emotions is None else emotions
+        items['confidence'] = np.nan if confidences is None else confidences
+
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                (self.path / "meta.json").write_text(json.dumps({'dim': self.dim}), encoding="utf-8")
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Размерность вектора {vectors.shape[1]}, ожидается {self.dim}")
+            first = self.count + sum(len(v) for v in self._pending_vectors)
+            self._pending_vectors.append(normalize_rows(vectors))
+            self._pending_items.append(items)
+            if sum(len(v) for v in self._pending_vectors) >= self.flush_every:
+                self._flush_locked()
+        return first
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._pending_vectors:
+            return
+        vectors = np.concatenate(self._pending_vectors)
+        items = np.concatenate(self._pending_items)
+        # Сначала векторы, затем метаданные: при сбое лишний хвост векторов отрежет _repair
+        with open(self.vectors_path, "ab") as f:
+            f.write(vectors.tobytes())
+        with open(self.items_path, "ab") as f:
+            f.write(items.tobytes())
+        self.count += len(vectors)
+        self._pending_vectors = []
+        self._pending_items = []
+        self._vectors = None
+
+    def vectors(self):
+        """Матрица всех векторов (memmap, только чтение)"""
+        self.flush()
+        if self.count == 0:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        if self._vectors is None or len(self._vectors) != self.count:
+            self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(self.count, self.dim))
+        return self._vectors
+
+    def items(self, ids=None):
+        """Метаданные всех строк или строк ids"""
+        self.flush()
+        items = np.memmap(self.items_path, dtype=ITEM_DTYPE, mode="r", shape=(self.count,)) \
+            if self.count else np.zeros(0, dtype=ITEM_DTYPE)
+        return items if ids is None else items[np.asarray(ids)]
+
+    def build_index(self, nlist=None, nprobe=8, train_size=65536, seed=0):
+        """Построение и сохранение индекса IVF по всем векторам"""
+        vectors = self.vectors()
+        self.index = IVFIndex.build(vectors, nlist, nprobe, train_size, seed)
+        self.index.save(self.path / "ivf.npz")
+        return self.index
+
+    def search(self, query, k=10, nprobe=None, exclude=None):
+        """
+        k ближайших по косинусу: [(id, сходство), ...]
+        Строки, добавленные после построения индекса, просматриваются полным перебором
+        """
+        vectors = self.vectors()
+        query = normalize_rows(np.atleast_2d(np.asarray(query, dtype=np.float32)))[0]
+        if self.index is not None:
+            ids, scores = self.index.search(vectors, query, k + 1, nprobe)
+            tail = np.arange(self.index.size, len(vectors))
+            if len(tail):
+                tail_scores = vectors[self.index.size:] @ query
+                ids = np.concatenate([ids, tail])
+                scores = np.concatenate([scores, tail_scores])
+        else:
+            ids, scores = brute_force_search(vectors, query, k + 1)
+        order = np.argsort(-scores)
+        result = [(int(ids[i]), float(scores[i])) for i in order if ids[i] != exclude]
+        return result[:k]
+
+    def similar_to(self, row, k=10, nprobe=None):
+        """Окна, похожие на строку row (сама строка исключается)"""
+        return self.search(self.vectors()[row], k, nprobe, exclude=row)
+
+
+class IVFIndex:
+    """
+    Инвертированный индекс по центроидам k-means (IVF-Flat)
+    Поиск считает точное сходство только для векторов nprobe ближайших списков
+    """
+
+    def __init__(self, centroids, offsets, order, nprobe=8):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.order = order
+        self.nprobe = nprobe
+        self.size = len(order)
+
+    @classmethod
+    def build(cls, vectors, nlist=None, nprobe=8, train_size=65536, seed=0, iterations=10):
+        n = len(vectors)
+        if n == 0:
+            raise ValueError("Нет векторов для построения индекса")
+        nlist = min(n, nlist or max(1, int(np.sqrt(n))))
+        rng = np.random.default_rng(seed)
+        sample = np.asarray(vectors[np.sort(rng.choice(n, min(n, max(train_size, nlist)), replace=False))])
+        centroids = kmeans(sample, nlist, iterations, rng)
+
+        assignments = np.empty(n, dtype=np.int32)
+        for start in range(0, n, 65536):
+            assignments[start:start + 65536] = np.argmax(np.asarray(vectors[start:start + 65536]) @ centroids.T,
+                                                         axis=1)
+        order = np.argsort(assignments, kind="stable").astype(np.int64)
+        counts = np.bincount(assignments, minlength=nlist)
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        return cls(centroids, offsets, order, nprobe)
+
+    def search(self, vectors, query, k=10, nprobe=None):
+        """(ids, сходства) кандидатов из nprobe ближайших списков, лучшие k"""
+        nprobe = min(len(self.centroids), nprobe or self.nprobe)
+        lists = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        ids = np.concatenate([self.order[self.offsets[i]:self.offsets[i + 1]] for i in lists])
+        if len(ids) == 0:
+            return ids, np.zeros(0, dtype=np.float32)
+        # Чтение строк по возрастанию адреса - последовательнее для memmap
+        ids.sort()
+        scores = vectors[ids] @ query
+        if len(ids) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            ids, scores = ids[top], scores[top]
+        return ids, scores
+
+    def save(self, path):
+        tmp = Path(path).with_suffix(".tmp.npz")
+        np.savez(tmp, centroids=self.centroids, offsets=self.offsets, order=self.order,
+                 nprobe=np.array(self.nprobe))
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(data['centroids'], data['offsets'], data['order'], int(data['nprobe']))
+
+
+def normalize_rows(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def kmeans(sample, nlist, iterations=10, rng=None):
+    """Сферический k-means: центроиды единичной длины"""
+    rng = rng or np.random.default_rng(0)
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        counts = np.bincount(assignments, minlength=nlist)
+        empty = counts == 0
+        # Пустые кластеры получают случайные точки выборки
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+def brute_force_search(vectors, query, k=10, block=262144):
+    """Точный поиск k ближайших по скалярному произведению блоками"""
+    best_ids = np.zeros(0, dtype=np.int64)
+    best_scores = np.zeros(0, dtype=np.float32)
+    for start in range(0, len(vectors), block):
+        scores = np.asarray(vectors[start:start + block]) @ query
+        ids = np.arange(start, start + len(scores))
+        if len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            ids, scores = ids[top], scores[top]
+        best_ids = np.concatenate([best_ids, ids])
+        best_scores = np.concatenate([best_scores, scores])
+        if len(best_scores) > k:
+            top = np.argpartition(-best_scores, k - 1)[:k]
+            best_ids, best_scores = best_ids[top], best_scores[top]
+    return best_ids, best_scores
+
+
+class EmbeddingRecorder:
+    """
+    Сохранение эмбеддингов окон из прямых проходов модели
+    Хук на классификаторе HubertForSequenceClassification получает усредненный
+    выход проектора (эмбеддинг окна) и логиты, поэтому HuBERT не пересчитывается
+    context() вызывается в потоке прямого прохода и возвращает (id сессии, время
+    окна по time.time()) или None - окно не сохраняется; без context окна
+    пишутся вне сессии со временем вызова
+    """
+
+    def __init__(self, store, context=None):
+        self.store = store
+        self.context = context
+        self.enabled = True
+        self._handle = None
+
+    def attach(self, model):
+        classifier = getattr(model, 'classifier', None)
+        if classifier is None:
+            raise ValueError("Модель без слоя classifier: эмбеддинги окон недоступны")
+        self._handle = classifier.register_forward_hook(self._hook)
+        return model
+
+    def detach(self):
+        if self._handle is not None:
+            self._handle.remove()
+            self._handle = None
+
+    def _hook(self, module, args, output):
+        if not self.enabled:
+            return
+        if self.context is None:
+            session_id, timestamp = -1, time.time()
+        else:
+            context = self.context()
+            if context is None:
+                return
+            session_id, timestamp = context
+        pooled = args[0].detach().float().cpu().numpy()
+        probs = output.detach().float().softmax(dim=-1).cpu().numpy()
+        self.store.add(pooled, session_id, timestamp, probs.argmax(axis=1), probs.max(axis=1) * 100)
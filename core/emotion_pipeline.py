@@ -0,0 +1,224 @@
+import numpy as np
+import soundfile as sf
+import torch
+import torchaudio
+
+
+# Функции конвейера распознавания эмоций без зависимости от Qt:
+# используются окном приложения, бенчмарками и пакетной обработкой
+
+TARGET_SAMPLE_RATE = 16000
+MAX_INPUT_SECONDS = 10
+
+FEATURE_EXTRACTOR_NAME = "facebook/hubert-large-ls960-ft"
+CLASSIFIER_NAME = "xbgoose/hubert-speech-emotion-recognition-russian-dusha-finetuned"
+# Убрали эмоцию "другая"
+NUM2EMOTION = {0: 'нейтральная', 1: 'гнев', 2: 'радость', 3: 'грусть'}
+
+
+def load_emotion_model(feature_extractor_name=FEATURE_EXTRACTOR_NAME, classifier_name=CLASSIFIER_NAME,
+                       cache=None):
+    """
+    Загрузка экстрактора признаков и классификатора эмоций
+    cache - секция "model_cache" настроек: веса читаются из локального кеша
+    safetensors через mmap (при первом запуске кеш создается)
+    """
+    from transformers import HubertForSequenceClassification, Wav2Vec2FeatureExtractor
+
+    if cache and cache.get('enabled'):
+        from core.model_cache import load_model
+        try:
+            return load_model(classifier_name, feature_extractor_name, cache['path'], cache['dtype'])
+        except Exception as e:
+            print(f"Кеш модели недоступен, загрузка через from_pretrained: {e}")
+
+    feature_extractor = Wav2Vec2FeatureExtractor.from_pretrained(feature_extractor_name)
+    model = HubertForSequenceClassification.from_pretrained(classifier_name)
+    model.eval()
+    return model, feature_extractor
+
+
+def normalize_audio(audio_data, target_sample_rate=16000, min_duration=1.0):
+    """
+    Комплексная функция нормализации аудио
+    - Конвертирует стерео в моно
+    - Нормализует амплитуду до [-1, 1]
+    """
+    # Конвертация в numpy array, если это torch tensor
+    if isinstance(audio_data, torch.Tensor):
+        audio_data = audio_data.numpy()
+
+    # Обработка стерео аудио
+    if audio_data.ndim > 1:
+        # Усреднение по каналам (axis=1 для формы [семплы, каналы])
+        if audio_data.shape[0] < audio_data.shape[1]:
+            # Форма [каналы, семплы]
+            audio_data = np.mean(audio_data, axis=0)
+        else:
+            # Форма [семплы, каналы]
+            audio_data = np.mean(audio_data, axis=1)
+
+    # Нормализация амплитуды до [-1, 1]
+    max_val = np.max(np.abs(audio_data))
+    if max_val > 0:
+        audio_data = audio_data / max_val
+
+    return audio_data
+
+
+def ensure_minimum_length(audio_data, sample_rate, min_seconds=1.0):
+    """
+    Обеспечение минимальной длины аудио путем повторения при необходимости
+    Возвращает аудио с минимальной длительностью min_seconds
+    """
+    min_samples = int(min_seconds * sample_rate)
+    current_samples = len(audio_data)
+
+    if current_samples < min_samples:
+        # Расчет необходимого количества повторений
+        repeats_needed = int(np.ceil(min_samples / current_samples))
+
+        # Повторение аудио
+        audio_data = np.tile(audio_data, repeats_needed)
+
+        # Обрезка до точной минимальной длины при необходимости
+        if len(audio_data) > min_samples:
+            audio_data = audio_data[:min_samples]
+
+    return audio_data
+
+
+def read_audio(filepath):
+    """Чтение аудиофайла: soundfile, затем torchaudio, затем librosa"""
+    # Метод 1: Попытка soundfile
+    try:
+        return sf.read(filepath)
+    except:
+        # Метод 2: Попытка torchaudio
+        try:
+            waveform, sample_rate = torchaudio.load(filepath, normalize=True)
+            audio_data = waveform.numpy()
+            if audio_data.ndim > 1:
+                audio_data = np.mean(audio_data, axis=0)
+            return audio_data, sample_rate
+        except:
+            # Метод 3: Попытка librosa
+            try:
+                import librosa
+                return librosa.load(filepath, sr=None, mono=True)
+            except Exception as e:
+                raise Exception(f"Все методы загрузки аудио не удались: {e}")
+
+
+def resample_audio(audio_data, sample_rate, target_sample_rate=TARGET_SAMPLE_RATE):
+    """Передискретизация до целевой частоты (librosa или torchaudio)"""
+    if sample_rate == target_sample_rate:
+        return audio_data, sample_rate
+
+    try:
+        import librosa
+        audio_data = librosa.resample(audio_data, orig_sr=sample_rate, target_sr=target_sample_rate)
+    except:
+        # Резервный вариант: передискретизация torchaudio
+        waveform = torch.FloatTensor(audio_data).unsqueeze(0)
+        transform = torchaudio.transforms.Resample(sample_rate, target_sample_rate)
+        audio_data = transform(waveform).squeeze(0).numpy()
+    return audio_data, target_sample_rate
+
+
+def preprocess_audio(audio_data, sample_rate):
+    """Нормализация, минимальная длина и передискретизация до 16кГц"""
+    audio_data = normalize_audio(audio_data)
+    audio_data = ensure_minimum_length(audio_data, sample_rate, min_seconds=1.0)
+    return resample_audio(audio_data, sample_rate)
+
+
+def load_and_preprocess_audio(filepath):
+    """
+    Загрузка аудиофайла и предобработка для модели HuBERT
+    Возвращает нормализованное аудио с частотой 16кГц и минимальной длительностью 1 секунда
+    """
+    try:
+        audio_data, sample_rate = read_audio(filepath)
+        return preprocess_audio(audio_data, sample_rate)
+    except Exception as e:
+        raise Exception(f"Не удалось загрузить и предобработать аудио: {str(e)}")
+
+
+def extract_input_values(feature_extractor, audio_data):
+    """Извлечение признаков: возвращает тензор input_values формы [1, семплы]"""
+    # Обеспечение достаточной длины аудио
+    if len(audio_data) < 10:
+        audio_data = np.pad(audio_data, (0, 10 - len(audio_data)), mode='constant')
+
+    inputs = feature_extractor(
+        audio_data,
+        sampling_rate=TARGET_SAMPLE_RATE,
+        return_tensors="pt",
+        padding=True,
+        max_length=TARGET_SAMPLE_RATE * MAX_INPUT_SECONDS,
+        truncation=True
+    )
+    input_values = inputs['input_values']
+
+    # Обработка различных размерностей ввода
+    if input_values.dim() == 4:
+        input_values = input_values.squeeze(1).squeeze(1)
+    elif input_values.dim() == 3:
+        input_values = input_values.squeeze(1)
+
+    # Двойная проверка длины ввода
+    if input_values.shape[1] < 10:
+        padding = 10 - input_values.shape[1]
+        input_values = torch.nn.functional.pad(input_values, (0, padding), mode='constant', value=0)
+
+    return input_values
+
+
+def predict_from_input_values(model, input_values, num2emotion):
+    """
+    Прямой проход модели
+    Возвращает (эмоция, уверенность в %, вероятности всех эмоций в %)
+    """
+    with torch.no_grad():
+        logits = model(input_values).logits
+    return interpret_logits(logits, num2emotion)
+
+
+def interpret_logits(logits, num2emotion):
+    """Перевод логитов модели в эмоцию, уверенность и вероятности"""
+    num_emotions = len(num2emotion)
+    predictions = torch.argmax(logits, dim=-1)
+    probabilities = torch.nn.functional.softmax(logits, dim=-1)
+
+    predicted_class = int(predictions.numpy()[0])
+
+    # Если модель возвращает больше классов, чем у нас эмоций, берем только первые
+    if probabilities.shape[1] > num_emotions:
+        probabilities = probabilities[:, :num_emotions]
+        # Нормализуем вероятности
+        probabilities = torch.nn.functional.softmax(probabilities, dim=-1)
+        if predicted_class >= num_emotions:
+            predicted_class = num_emotions - 1  # Переназначаем на последний доступный класс
+
+    confidence = probabilities[0][predicted_class].item() * 100
+    predicted_emotion = num2emotion[predicted_class]
+
+    # Получение вероятностей всех эмоций
+    all_probs = {}
+    for i, emotion in num2emotion.items():
+        all_probs[emotion] = probabilities[0][i].item() * 100
+
+    return predicted_emotion, confidence, all_probs
+
+
+def analyze_audio(model, feature_extractor, audio_data, num2emotion):
+    """Полный анализ уже предобработанного аудио"""
+    input_values = extract_input_values(feature_extractor, audio_data)
+    return predict_from_input_values(model, input_values, num2emotion)
+
+
+def analyze_file(model, feature_extractor, filepath, num2emotion):
+    """Полный анализ аудиофайла (аналог кнопки "Анализировать эмоции")"""
+    audio_data, _ = load_and_preprocess_audio(filepath)
+    return analyze_audio(model, feature_extractor, audio_data, num2emotion)
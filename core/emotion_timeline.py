@@ -0,0 +1,176 @@
+import math
+import time
+
+import numpy as np
+
+
+# Временной ряд вероятностей эмоций с ограниченной памятью
+# Уровни разрешения: сырые результаты окон и корзины по 10 с и 1 мин, каждый
+# в кольцевом буфере фиксированного размера. Вместе с корзиной хранится
+# накопленная сумма с начала сессии, поэтому среднее за любое окно в пределах
+# кольца - разность двух накопленных сумм (O(1) независимо от длины окна),
+# а итоги всей сессии - отдельная накопленная сумма. Память не растет
+# с длительностью сессии: старые корзины перезаписываются
+
+DEFAULT_LEVELS = ((10.0, 360), (60.0, 1440))  # (секунд в корзине, корзин): 1 час и 24 часа
+
+
+class _Level:
+    """Корзины одного разрешения с накопленными суммами в кольце"""
+
+    def __init__(self, resolution, capacity, width):
+        self.resolution = resolution
+        self.capacity = capacity
+        self.cum = np.zeros((capacity, width))
+        self.cum_count = np.zeros(capacity, dtype=np.int64)
+        self.first = None
+        self.index = None
+        self.total = np.zeros(width)
+        self.count = 0
+
+    def add(self, timestamp, values):
+        bucket = int(timestamp // self.resolution)
+        if self.index is None:
+            self.first = self.index = bucket
+        elif bucket > self.index:
+            # Пустые корзины (пауза в потоке) получают накопленную сумму без изменений;
+            # заполнять больше емкости кольца бессмысленно
+            for k in range(max(self.index + 1, bucket - self.capacity + 1), bucket):
+                self.cum[k % self.capacity] = self.total
+                self.cum_count[k % self.capacity] = self.count
+            self.index = bucket
+        self.total += values
+        self.count += 1
+        slot = self.index % self.capacity
+        self.cum[slot] = self.total
+        self.cum_count[slot] = self.count
+
+    def window(self, buckets):
+        """(сумма, число) за последние buckets корзин, включая текущую незакрытую"""
+        buckets = min(buckets, self.capacity - 1)
+        start = self.index - buckets
+        if start < self.first:
+            return self.total.copy(), self.count
+        slot = start % self.capacity
+        return self.total - self.cum[slot], self.count - int(self.cum_count[slot])
+
+    def series(self):
+        """(начала корзин в секундах, суммы, числа) по кольцу, от старых к новым"""
+        if self.index is None:
+            return np.empty(0), np.empty((0, self.cum.shape[1])), np.empty(0, dtype=np.int64)
+        first = max(self.first, self.index - self.capacity + 1)
+        indices = np.arange(first, self.index + 1)
+        slots = indices % self.capacity
+        cum = self.cum[slots]
+        cum_count = self.cum_count[slots]
+        if first > self.first:
+            # Сумма перед первой корзиной кольца из-за перезаписи недоступна:
+            # первая корзина служит только опорной точкой
+            indices, slots = indices[1:], slots[1:]
+            sums, counts = np.diff(cum, axis=0), np.diff(cum_count)
+        else:
+            sums = np.diff(cum, axis=0, prepend=np.zeros((1, cum.shape[1])))
+            counts = np.diff(cum_count, prepend=0)
+        return indices * self.resolution, sums, counts
+
+
+class EmotionTimeline:
+    """
+    Хранилище вероятностей эмоций сессии
+    add() - результат окна (вероятности в %); mean()/dominant() - среднее и
+    доминирующая эмоция за последние seconds секунд или за всю сессию;
+    recent()/series() - данные для графика и выгрузки
+    """
+
+    def __init__(self, emotions, raw_capacity=1024, levels=DEFAULT_LEVELS):
+        self.emotions = list(emotions)
+        width = len(self.emotions)
+        self.raw_capacity = raw_capacity
+        self.raw_times = np.zeros(raw_capacity)
+        self.raw_values = np.zeros((raw_capacity, width), dtype=np.float32)
+        self.raw_count = 0
+        self.levels = [_Level(resolution, capacity, width) for resolution, capacity in levels]
+        self.start_time = None
+
+    def reset(self):
+        self.__init__(self.emotions, self.raw_capacity,
+                      [(level.resolution, level.capacity) for level in self.levels])
+
+    def add(self, probs, timestamp=None):
+        """probs - словарь {эмоция: %}; timestamp - секунды (по умолчанию time.time())"""
+        timestamp = time.time() if timestamp is None else timestamp
+        if self.start_time is None:
+            self.start_time = timestamp
+        values = np.array([probs.get(e, 0.0) for e in self.emotions], dtype=np.float64)
+        slot = self.raw_count % self.raw_capacity
+        self.raw_times[slot] = timestamp
+        self.raw_values[slot] = values
+        self.raw_count += 1
+        elapsed = timestamp - self.start_time
+        for level in self.levels:
+            level.add(elapsed, values)
+
+    def mean(self, seconds=None):
+        """
+        Средние вероятности за последние seconds секунд (с точностью до корзины)
+        или за всю сессию; None, если данных нет
+        """
+        if not self.raw_count:
+            return None
+        level = self.levels[-1]
+        if seconds is not None:
+            # Самое мелкое разрешение, чье кольцо покрывает окно
+            level = next((lv for lv in self.levels if seconds <= lv.resolution * (lv.capacity - 1)), level)
+            total, count = level.window(math.ceil(seconds / level.resolution))
+        else:
+            total, count = level.total, level.count
+        if not count:
+            return None
+        return {emotion: float(value) for emotion, value in zip(self.emotions, total / count)}
+
+    def dominant(self, seconds=None):
+        """(эмоция, средняя вероятность %) за окно или None"""
+        means = self.mean(seconds)
+        if not means:
+            return None
+        emotion = max(means, key=means.get)
+        return emotion, means[emotion]
+
+    def recent(self, n=None):
+        """Последние n сырых результатов: (время, матрица вероятностей [n, эмоции])"""
+        available = min(self.raw_count, self.raw_capacity)
+        n = available if n is None else min(n, available)
+        slots = np.arange(self.raw_count - n, self.raw_count) % self.raw_capacity
+        return self.raw_times[slots], self.raw_values[slots]
+
+    def series(self, resolution=60.0):
+        """Корзины уровня: (начала в секундах от старта, средние [корзины, эмоции], числа окон)"""
+        level = next(lv for lv in self.levels if lv.resolution == resolution)
+        starts, sums, counts = level.series()
+        keep = counts > 0
+        means = sums[keep] / counts[keep, None]
+        return starts[keep], means, counts[keep]
+
+    def describe(self, recent_seconds=300, percent_step=10):
+        """
+        Краткая сводка для подсказки ИИ советнику
+        Доли округляются до percent_step процентов: иначе каждое новое окно
+        меняло бы текст подсказки, и повтор контекста (планировщик советов,
+        ключ кеша ответов) не распознавался бы
+        """
+        parts = []
+        recent = self.dominant(recent_seconds)
+        if recent:
+            parts.append(f"последние {recent_seconds / 60:g} мин - {recent[0]} (~{_coarse(recent[1], percent_step)}%)")
+        session = self.dominant()
+        if session:
+            parts.append(f"вся сессия - {session[0]} (~{_coarse(session[1], percent_step)}%)")
+        return ", ".join(parts)
+
+    def nbytes(self):
+        return (self.raw_times.nbytes + self.raw_values.nbytes
+                + sum(level.cum.nbytes + level.cum_count.nbytes for level in self.levels))
+
+
+def _coarse(percent, step):
+    return int(round(percent / step) * step)
@@ -0,0 +1,252 @@
+import json
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+from core import emotion_pipeline
+
+
+# Транскрипция файлов Vosk с параллельным декодированием фрагментов
+# - Длинное аудио режется по паузам на фрагменты ~chunk_seconds
+# - Фрагменты декодируются в пуле процессов; процессы запускаются через
+#   forkserver (spawn, где его нет), а не fork от процесса приложения с его
+#   потоками Qt, OpenMP и PyAudio, и каждый один раз загружает модель Vosk
+# - Слова с метками времени сшиваются по смещению фрагмента и объединяются
+#   с оконной шкалой эмоций HuBERT
+
+SAMPLE_RATE = emotion_pipeline.TARGET_SAMPLE_RATE
+
+# Модель Vosk в процессах пула (загружается инициализатором)
+_worker_model = None
+_loaded_models = {}
+
+# Период проверки отмены при ожидании фрагментов из пула, с
+CANCEL_POLL_SECONDS = 0.2
+
+
+class TranscriptionCancelled(Exception):
+    """Транскрипция прервана через cancel_event"""
+
+
+def _check_cancelled(cancel_event):
+    if cancel_event is not None and cancel_event.is_set():
+        raise TranscriptionCancelled()
+
+
+def load_vosk_model(path):
+    """Модель Vosk по пути (загружается один раз на процесс)"""
+    from vosk import Model, SetLogLevel
+
+    if path not in _loaded_models:
+        if not os.path.isdir(path):
+            raise FileNotFoundError(f"Модель Vosk не найдена: {path}")
+        SetLogLevel(-1)
+        _loaded_models[path] = Model(path)
+    return _loaded_models[path]
+
+
+def find_silence_splits(audio, sample_rate=SAMPLE_RATE, chunk_seconds=60.0, search_seconds=10.0,
+                        frame_seconds=0.03):
+    """
+    Границы фрагментов [(начало, конец), ...] в семплах
+    Каждый разрез ищется в пределах search_seconds от целевой границы в самом
+    тихом месте (минимум энергии, сглаженной по 0.3 с), чтобы не резать слова
+    """
+    n = len(audio)
+    chunk = int(chunk_seconds * sample_rate)
+    if n <= chunk * 1.5:
+        return [(0, n)]
+
+    frame = max(1, int(frame_seconds * sample_rate))
+    frames = n // frame
+    energy = np.sqrt(np.mean(audio[:frames * frame].astype(np.float64).reshape(frames, frame) ** 2, axis=1))
+    smooth = max(1, int(0.3 / frame_seconds))
+    energy = np.convolve(energy, np.ones(smooth) / smooth, mode='same')
+
+    splits = []
+    start = 0
+    search = int(search_seconds * sample_rate) // frame
+    while n - start > chunk * 1.5:
+        target = (start + chunk) // frame
+        low = max(start // frame + 1, target - search)
+        high = min(frames - 1, target + search)
+        cut = (low + int(np.argmin(energy[low:high + 1]))) * frame + frame // 2
+        splits.append((start, cut))
+        start = cut
+    splits.append((start, n))
+    return splits
+
+
+def _init_worker(model_path):
+    global _worker_model
+    _worker_model = load_vosk_model(model_path)
+
+
+def _decode_chunk(task, model=None):
+    """
+    Декодирование одного фрагмента: (индекс, смещение в секундах, PCM int16) -> слова
+    model - модель Vosk (по умолчанию модель процесса пула)
+    """
+    from vosk import KaldiRecognizer
+
+    index, offset, pcm = task
+    start = time.perf_counter()
+    recognizer = KaldiRecognizer(model or _worker_model, SAMPLE_RATE)
+    recognizer.SetWords(True)
+
+    results = []
+    step = SAMPLE_RATE // 2
+    for position in range(0, len(pcm), step):
+        if recognizer.AcceptWaveform(pcm[position:position + step].tobytes()):
+            results.append(json.loads(recognizer.Result()))
+    results.append(json.loads(recognizer.FinalResult()))
+
+    words = []
+    for result in results:
+        for word in result.get('result', []):
+            words.append({
+                'word': word['word'],
+                'start': word['start'] + offset,
+                'end': word['end'] + offset,
+                'conf': word.get('conf'),
+            })
+    return index, words, time.perf_counter() - start
+
+
+def transcribe_audio(audio, model_path, sample_rate=SAMPLE_RATE, workers=None, chunk_seconds=60.0,
+                     on_progress=None, cancel_event=None):
+    """
+    Транскрипция аудио (моно float, любая частота)
+    workers - число процессов (None - все ядра); on_progress(готово, всего)
+    cancel_event (threading.Event) - отмена: процессы пула завершаются,
+    поднимается TranscriptionCancelled
+    Возвращает {'words', 'duration', 'chunks', 'elapsed', 'decode_time'}
+    """
+    started = time.perf_counter()
+    audio, _ = emotion_pipeline.resample_audio(np.asarray(audio, dtype=np.float32), sample_rate)
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+    splits = find_silence_splits(audio, SAMPLE_RATE, chunk_seconds)
+    tasks = [(i, s / SAMPLE_RATE, pcm[s:e]) for i, (s, e) in enumerate(splits)]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(tasks)))
+
+    results = []
+    if workers == 1:
+        model = load_vosk_model(model_path)
+        for task in tasks:
+            _check_cancelled(cancel_event)
+            results.append(_decode_chunk(task, model))
+            if on_progress:
+                on_progress(len(results), len(tasks))
+    else:
+        # Как у пула инференса (core.worker_pool): fork от процесса с запущенными
+        # потоками может унаследовать захваченные блокировки и зависнуть
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+        pool = context.Pool(workers, initializer=_init_worker, initargs=(model_path,))
+        # Выход из with завершает процессы (terminate), в том числе при отмене
+        with pool:
+            iterator = pool.imap_unordered(_decode_chunk, tasks)
+            while len(results) < len(tasks):
+                _check_cancelled(cancel_event)
+                try:
+                    result = iterator.next(timeout=CANCEL_POLL_SECONDS)
+                except multiprocessing.TimeoutError:
+                    continue
+                results.append(result)
+                if on_progress:
+                    on_progress(len(results), len(tasks))
+
+    results.sort(key=lambda r: r[0])
+    words = [word for _, chunk_words, _ in results for word in chunk_words]
+    return {
+        'words': words,
+        'duration': len(audio) / SAMPLE_RATE,
+        'chunks': len(tasks),
+        'workers': workers,
+        'elapsed': time.perf_counter() - started,
+        'decode_time': sum(r[2] for r in results),
+    }
+
+
+def group_phrases(words, max_pause=0.7, max_words=30):
+    """Объединение слов во фразы по паузам"""
+    phrases = []
+    current = []
+    for word in words:
+        if current and (word['start'] - current[-1]['end'] > max_pause or len(current) >= max_words):
+            phrases.append(current)
+            current = []
+        current.append(word)
+    if current:
+        phrases.append(current)
+    return [{
+        'text': " ".join(w['word'] for w in phrase),
+        'start': phrase[0]['start'],
+        'end': phrase[-1]['end'],
+    } for phrase in phrases]
+
+
+def emotion_timeline(model, feature_extractor, audio, num2emotion, window_seconds=3.0,
+                     sample_rate=SAMPLE_RATE, cancel_event=None):
+    """Оконная шкала эмоций по аудио 16 кГц: [{'start', 'end', 'emotion', 'confidence', 'probs'}]"""
+    window = int(window_seconds * sample_rate)
+    timeline = []
+    for start in range(0, len(audio), window):
+        _check_cancelled(cancel_event)
+        segment = audio[start:start + window]
+        if len(segment) < sample_rate // 2:
+            break
+        segment = emotion_pipeline.ensure_minimum_length(emotion_pipeline.normalize_audio(segment), sample_rate)
+        emotion, confidence, probs = emotion_pipeline.analyze_audio(model, feature_extractor, segment, num2emotion)
+        timeline.append({
+            'start': start / sample_rate,
+            'end': min(len(audio), start + window) / sample_rate,
+            'emotion': emotion,
+            'confidence': confidence,
+            'probs': probs,
+        })
+    return timeline
+
+
+def merge_with_emotions(phrases, timeline):
+    """Эмоция фразы - вероятности окон, взвешенные по перекрытию с фразой"""
+    for phrase in phrases:
+        totals = {}
+        for window in timeline:
+            overlap = min(phrase['end'], window['end']) - max(phrase['start'], window['start'])
+            if overlap <= 0:
+                continue
+            for emotion, prob in window['probs'].items():
+                totals[emotion] = totals.get(emotion, 0.0) + prob * overlap
+        if totals:
+            weight = sum(totals.values())
+            emotion = max(totals, key=totals.get)
+            phrase['emotion'] = emotion
+            phrase['confidence'] = totals[emotion] / weight * 100 if weight else 0.0
+        else:
+            phrase['emotion'] = None
+            phrase['confidence'] = None
+    return phrases
+
+
+def transcribe_file(path, model_path, emotion_model=None, feature_extractor=None, num2emotion=None,
+                    workers=None, chunk_seconds=60.0, window_seconds=3.0, on_progress=None, cancel_event=None):
+    """
+    Полная обработка файла: транскрипция, фразы и, если передана модель эмоций,
+    эмоция каждой фразы по оконной шкале
+    """
+    audio, sample_rate = emotion_pipeline.read_audio(path)
+    audio = emotion_pipeline.normalize_audio(audio)
+    audio, _ = emotion_pipeline.resample_audio(np.asarray(audio, dtype=np.float32), sample_rate)
+
+    result = transcribe_audio(audio, model_path, SAMPLE_RATE, workers, chunk_seconds, on_progress, cancel_event)
+    result['path'] = str(path)
+    result['phrases'] = group_phrases(result['words'])
+    if emotion_model is not None:
+        result['timeline'] = emotion_timeline(emotion_model, feature_extractor, audio,
+                                              num2emotion or emotion_pipeline.NUM2EMOTION, window_seconds,
+                                              cancel_event=cancel_event)
+        merge_with_emotions(result['phrases'], result['timeline'])
+    return result
@@ -0,0 +1,158 @@
+import collections
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from core import emotion_pipeline
+from core.profiling import profile_scope
+from core.thread_budget import pin_current_thread
+
+
+class IngestQueue(QObject):
+    """
+    Фоновая очередь анализа файлов для вкладки файлов
+    - Чтение, передискретизация и извлечение признаков идут параллельно
+      в workers потоках (библиотеки декодирования и numpy отпускают GIL)
+    - Прямой проход модели ограничен inference_slots одновременными вызовами:
+      torch уже использует все потоки инференса внутри одного вызова
+    - В исполнителе не больше workers заданий, остальные ждут в очереди,
+      поэтому сотни файлов не занимают память заранее
+    - Отмена снимает ожидающие задания; выполняемые дочитываются, но их
+      результат не выдается
+    Сигналы испускаются из рабочих потоков и доставляются в GUI-поток очередью Qt
+    """
+
+    job_started = pyqtSignal(int)
+    job_finished = pyqtSignal(int, dict)
+    job_failed = pyqtSignal(int, str)
+    job_cancelled = pyqtSignal(int)
+    progress = pyqtSignal(int, int)
+    drained = pyqtSignal(dict)
+
+    def __init__(self, model, feature_extractor, num2emotion, workers=None, inference_slots=1, parent=None):
+        super().__init__(parent)
+        self.model = model
+        self.feature_extractor = feature_extractor
+        self.num2emotion = num2emotion
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        # Чтение и инференс файлов - на ядрах инференса, а не на ядре GUI-потока
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ingest",
+                                           initializer=pin_current_thread, initargs=('inference',))
+        self._inference = threading.BoundedSemaphore(max(1, inference_slots))
+        self._lock = threading.Lock()
+        self._pending = collections.deque()
+        self._in_flight = 0
+        self._generation = 0
+        self._next_id = 1
+        self._reset_stats()
+
+    def submit(self, paths):
+        """Постановка файлов в очередь; возвращает [(идентификатор, путь)]"""
+        jobs = []
+        with self._lock:
+            if not self._pending and not self._in_flight:
+                self._reset_stats()
+            for path in paths:
+                jobs.append((self._next_id, str(path)))
+                self._next_id += 1
+            self._pending.extend((job_id, path, self._generation) for job_id, path in jobs)
+            self.stats['total'] += len(jobs)
+        self._fill()
+        return jobs
+
+    def cancel(self):
+        """Отмена ожидающих и выполняемых заданий"""
+        with self._lock:
+            self._generation += 1
+            dropped = [job_id for job_id, _, _ in self._pending]
+            self._pending.clear()
+            self.stats['cancelled'] += len(dropped)
+            idle = not self._in_flight
+        for job_id in dropped:
+            self.job_cancelled.emit(job_id)
+        if idle and dropped:
+            self._emit_drained()
+
+    def is_busy(self):
+        with self._lock:
+            return bool(self._pending or self._in_flight)
+
+    def pending_count(self):
+        """Ожидающие и выполняемые задания (для панели производительности)"""
+        with self._lock:
+            return len(self._pending) + self._in_flight
+
+    def shutdown(self):
+        self.cancel()
+        self.executor.shutdown(wait=True)
+
+    def _reset_stats(self):
+        self.stats = {'total': 0, 'done': 0, 'failed': 0, 'cancelled': 0, 'audio_seconds': 0.0,
+                      'started_at': time.perf_counter()}
+
+    def _fill(self):
+        while True:
+            with self._lock:
+                if not self._pending or self._in_flight >= self.workers:
+                    return
+                job = self._pending.popleft()
+                self._in_flight += 1
+            future = self.executor.submit(self._run, *job)
+            future.add_done_callback(self._on_done)
+
+    def _run(self, job_id, path, generation):
+        if generation != self._generation:
+            return 'cancelled', job_id, None
+        self.job_started.emit(job_id)
+        started = time.perf_counter()
+        try:
+            with profile_scope('analyze_emotion'):
+                audio, sample_rate = emotion_pipeline.load_and_preprocess_audio(path)
+                input_values = emotion_pipeline.extract_input_values(self.feature_extractor, audio)
+                if generation != self._generation:
+                    return 'cancelled', job_id, None
+                with self._inference:
+                    emotion, confidence, probs = emotion_pipeline.predict_from_input_values(
+                        self.model, input_values, self.num2emotion)
+        except Exception as e:
+            return 'failed', job_id, str(e)
+        if generation != self._generation:
+            return 'cancelled', job_id, None
+        return 'done', job_id, {
+            'path': path,
+            'emotion': emotion,
+            'confidence': confidence,
+            'probs': probs,
+            'duration': len(audio) / sample_rate,
+            'elapsed': time.perf_counter() - started,
+        }
+
+    def _on_done(self, future):
+        status, job_id, payload = future.result()
+        with self._lock:
+            self._in_flight -= 1
+            self.stats[status] += 1
+            if status == 'done':
+                self.stats['audio_seconds'] += payload['duration']
+            finished = self.stats['done'] + self.stats['failed'] + self.stats['cancelled']
+            total = self.stats['total']
+            idle = not self._pending and not self._in_flight
+        if status == 'done':
+            self.job_finished.emit(job_id, payload)
+        elif status == 'failed':
+            self.job_failed.emit(job_id, payload)
+        else:
+            self.job_cancelled.emit(job_id)
+        self.progress.emit(finished, total)
+        if idle:
+            self._emit_drained()
+        else:
+            self._fill()
+
+    def _emit_drained(self):
+        stats = dict(self.stats)
+        stats['elapsed'] = time.perf_counter() - stats.pop('started_at')
+        self.drained.emit(stats)
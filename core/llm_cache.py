@@ -0,0 +1,95 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+
+class LLMResponseCache:
+    """
+    Кеш ответов ИИ
+    - Ключ: хеш модели, параметров генерации и сообщений
+    - Записи устаревают через ttl секунд
+    - При переполнении вытесняются давно не использованные записи (LRU)
+    - Опционально сохраняется на диск, чтобы переживать перезапуск
+    """
+
+    def __init__(self, max_entries=256, ttl=3600.0, path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = Path(path) if path else None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if self.path:
+            self._load()
+
+    @staticmethod
+    def make_key(model, options, messages):
+        """Хеш запроса к модели"""
+        payload = json.dumps(
+            {'model': model, 'options': options, 'messages': messages},
+            ensure_ascii=False, sort_keys=True
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Ответ из кеша или None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or now - entry['time'] > self.ttl:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry['content']
+
+    def put(self, key, content):
+        """Сохранение ответа в кеш"""
+        with self._lock:
+            self._entries[key] = {'content': content, 'time': time.time()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def save(self):
+        """Сохранение кеша на диск (если задан путь)"""
+        if not self.path:
+            return
+        with self._lock:
+            entries = [[key, entry] for key, entry in self._entries.items()]
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entries, f, ensure_ascii=False)
+            tmp_path.replace(self.path)
+        except Exception as e:
+            print(f"Не удалось сохранить кеш ответов ИИ: {e}")
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except Exception as e:
+            print(f"Не удалось загрузить кеш ответов ИИ: {e}")
+            return
+
+        now = time.time()
+        for key, entry in entries[-self.max_entries:]:
+            if now - entry['time'] <= self.ttl:
+                self._entries[key] = entry
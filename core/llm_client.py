@@ -0,0 +1,163 @@
+import threading
+import time
+
+import ollama
+
+from core.llm_cache import LLMResponseCache
+
+
+class OllamaAdvisorClient:
+    """
+    Постоянный клиент Ollama для ИИ советника
+    - Одно HTTP-соединение переиспользуется между запросами
+    - Модель, keep_alive и параметры генерации задаются настройками
+    - Прогрев загружает модель заранее, чтобы первый совет не ждал загрузки
+    """
+
+    def __init__(self, host=None, model='deepseek-llm:7b', keep_alive='30m',
+                 options=None, timeout=None):
+        self.client = ollama.Client(host=host, timeout=timeout)
+        self.model = model
+        self.keep_alive = keep_alive
+        # Пустые значения не передаем, чтобы Ollama использовала свои умолчания
+        self.options = {k: v for k, v in (options or {}).items() if v is not None}
+        self._warm_up_thread = None
+
+    @classmethod
+    def from_settings(cls, settings):
+        """Создание клиента из секции "ollama" настроек"""
+        return cls(
+            host=settings.get('host'),
+            model=settings.get('model', 'deepseek-llm:7b'),
+            keep_alive=settings.get('keep_alive', '30m'),
+            options=settings.get('options'),
+            timeout=settings.get('timeout')
+        )
+
+    def cache_key(self, messages):
+        """Ключ кеша ответа для данных сообщений"""
+        return LLMResponseCache.make_key(self.model, self.options, messages)
+
+    def chat_stream(self, messages):
+        """Потоковый запрос чата"""
+        return self.client.chat(
+            model=self.model,
+            messages=messages,
+            stream=True,
+            options=self.options,
+            keep_alive=self.keep_alive
+        )
+
+    def chat(self, messages, **options):
+        """Обычный (непотоковый) запрос чата, options дополняют настройки"""
+        return self.client.chat(
+            model=self.model,
+            messages=messages,
+            options=dict(self.options, **options),
+            keep_alive=self.keep_alive
+        )
+
+    def warm_up(self, system_prompt=None):
+        """
+        Фоновый прогрев модели
+        Запрос с системным промптом и генерацией одного токена загружает веса
+        и заодно кеширует префикс промпта в Ollama
+        """
+        if self._warm_up_thread and self._warm_up_thread.is_alive():
+            return
+
+        self._warm_up_thread = threading.Thread(
+            target=self._warm_up, args=(system_prompt,), daemon=True
+        )
+        self._warm_up_thread.start()
+
+    def wait_warm_up(self, timeout=None):
+        """Ожидание завершения фонового прогрева"""
+        if self._warm_up_thread:
+            self._warm_up_thread.join(timeout)
+
+    def _warm_up(self, system_prompt):
+        start = time.perf_counter()
+        try:
+            if system_prompt:
+                self.client.chat(
+                    model=self.model,
+                    messages=[{'role': 'system', 'content': system_prompt}],
+                    options=dict(self.options, num_predict=1),
+                    keep_alive=self.keep_alive
+                )
+            else:
+                # Пустой промпт только загружает модель в память
+                self.client.generate(model=self.model, prompt='', keep_alive=self.keep_alive)
+            print(f"Модель ИИ {self.model} прогрета за {time.perf_counter() - start:.2f}с")
+        except Exception as e:
+            print(f"Не удалось прогреть модель ИИ: {e}")
+
+
+def generate_advice(client, messages, on_chunk, cache=None, is_cancelled=None):
+    """
+    Потоковая генерация совета с кешем
+    on_chunk вызывается для каждого фрагмента текста, возвращает метрики запроса
+    """
+    request_start = time.perf_counter()
+    first_token_time = None
+    tokens = 0
+    final_chunk = {}
+    parts = []
+
+    cache_key = None
+    if cache is not None:
+        cache_key = client.cache_key(messages)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            on_chunk(cached)
+            metrics = compute_ai_metrics(request_start, time.perf_counter(), 0, {})
+            metrics['cached'] = True
+            return metrics
+
+    stream = client.chat_stream(messages)
+
+    for chunk in stream:
+        if is_cancelled is not None and is_cancelled():
+            # Закрытие генератора обрывает HTTP-поток, Ollama прекращает генерацию
+            if hasattr(stream, 'close'):
+                stream.close()
+            break
+
+        content = chunk['message']['content']
+        if content:
+            if first_token_time is None:
+                first_token_time = time.perf_counter()
+            tokens += 1
+            parts.append(content)
+            on_chunk(content)
+        if chunk.get('done'):
+            final_chunk = chunk
+
+    # В кеш попадают только полностью сгенерированные ответы
+    if cache_key is not None and final_chunk and parts:
+        cache.put(cache_key, "".join(parts))
+
+    return compute_ai_metrics(request_start, first_token_time, tokens, final_chunk)
+
+
+def compute_ai_metrics(request_start, first_token_time, tokens, final_chunk):
+    """Расчет времени до первого токена и скорости генерации"""
+    end_time = time.perf_counter()
+    metrics = {
+        'ttft': (first_token_time - request_start) if first_token_time else None,
+        'total': end_time - request_start,
+        'tokens': tokens,
+        'tokens_per_sec': None
+    }
+
+    # Ollama сообщает точные значения в последнем чанке (длительности в нс)
+    eval_count = final_chunk.get('eval_count') if final_chunk else None
+    eval_duration = final_chunk.get('eval_duration') if final_chunk else None
+    if eval_count and eval_duration:
+        metrics['tokens'] = eval_count
+        metrics['tokens_per_sec'] = eval_count / (eval_duration / 1e9)
+    elif first_token_time and tokens > 1 and end_time > first_token_time:
+        metrics['tokens_per_sec'] = (tokens - 1) / (end_time - first_token_time)
+
+    return metrics
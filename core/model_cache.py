@@ -0,0 +1,139 @@
+import json
+import mmap
+import os
+import time
+from pathlib import Path
+
+import torch
+
+
+# Локальный кеш моделей в safetensors с загрузкой через mmap
+# При первом запуске контрольные точки из from_pretrained один раз сохраняются
+# в каталог кеша (config.json, предобработчик, model.safetensors). Дальше модель
+# создается на устройстве meta (без инициализации весов), а параметры становятся
+# представлениями файла, отображенного в память: загрузка не копирует веса
+# в кучу, а процессы, открывшие один файл, делят физические страницы кеша ОС
+
+WEIGHTS_NAME = "model.safetensors"
+META_NAME = "cache_meta.json"
+
+_DTYPES = {
+    'F32': torch.float32,
+    'F16': torch.float16,
+    'BF16': torch.bfloat16,
+    'F64': torch.float64,
+    'I64': torch.int64,
+    'I32': torch.int32,
+    'I8': torch.int8,
+    'U8': torch.uint8,
+    'BOOL': torch.bool,
+}
+
+
+def cache_path(cache_dir, classifier_name, dtype="float32"):
+    """Каталог кеша для модели и формата весов"""
+    return Path(cache_dir) / (classifier_name.replace("/", "--") + ("" if dtype == "float32" else f"-{dtype}"))
+
+
+def prepare_cache(cache_dir, classifier_name, feature_extractor_name, dtype="float32"):
+    """
+    Конвертация модели в кеш (один раз)
+    dtype="float16" вдвое уменьшает файл, но при загрузке веса приводятся
+    к float32 копией - страницы между процессами не делятся
+    """
+    from safetensors.torch import save_file
+    from transformers import HubertForSequenceClassification, Wav2Vec2FeatureExtractor
+
+    target = cache_path(cache_dir, classifier_name, dtype)
+    tmp = target.with_name(target.name + f".tmp-{os.getpid()}")
+    tmp.mkdir(parents=True, exist_ok=True)
+
+    started = time.perf_counter()
+    model = HubertForSequenceClassification.from_pretrained(classifier_name)
+    model.config.save_pretrained(tmp)
+    Wav2Vec2FeatureExtractor.from_pretrained(feature_extractor_name).save_pretrained(tmp)
+
+    torch_dtype = getattr(torch, dtype)
+    state = {name: tensor.detach().to(torch_dtype if tensor.is_floating_point() else tensor.dtype).contiguous()
+             for name, tensor in model.state_dict().items()}
+    save_file(state, str(tmp / WEIGHTS_NAME), metadata={'format': 'pt'})
+    (tmp / META_NAME).write_text(json.dumps({
+        'classifier': classifier_name,
+        'feature_extractor': feature_extractor_name,
+        'dtype': dtype,
+        'created_at': time.time(),
+        'convert_seconds': time.perf_counter() - started,
+    }, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    # Каталог появляется целиком: параллельный запуск не увидит неполный кеш
+    try:
+        os.replace(tmp, target)
+    except OSError:
+        # Другой процесс успел раньше
+        import shutil
+        shutil.rmtree(tmp, ignore_errors=True)
+    return target
+
+
+def map_safetensors(path):
+    """
+    Тензоры файла safetensors как представления mmap (без копирования)
+    Отображение копируется при записи (ACCESS_COPY): до изменения весов
+    страницы общие для всех процессов
+    """
+    with open(path, "rb") as f:
+        header_size = int.from_bytes(f.read(8), "little")
+        header = json.loads(f.read(header_size))
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    data_start = 8 + header_size
+    tensors = {}
+    for name, info in header.items():
+        if name == "__metadata__":
+            continue
+        dtype = _DTYPES[info['dtype']]
+        begin, end = info['data_offsets']
+        count = (end - begin) // torch.empty(0, dtype=dtype).element_size()
+        if count == 0:
+            tensors[name] = torch.empty(info['shape'], dtype=dtype)
+            continue
+        tensors[name] = torch.frombuffer(mapped, dtype=dtype, count=count,
+                                         offset=data_start + begin).view(info['shape'])
+    return tensors
+
+
+def load_cached_model(path):
+    """(модель, экстрактор признаков) из каталога кеша"""
+    from transformers import HubertConfig, HubertForSequenceClassification, Wav2Vec2FeatureExtractor
+
+    path = Path(path)
+    config = HubertConfig.from_pretrained(path)
+    feature_extractor = Wav2Vec2FeatureExtractor.from_pretrained(path)
+
+    with torch.device("meta"):
+        model = HubertForSequenceClassification(config)
+    state = map_safetensors(path / WEIGHTS_NAME)
+    mapped = all(t.dtype == torch.float32 for t in state.values() if t.is_floating_point())
+    if not mapped:
+        # Веса хранятся в половинной точности: инференс на CPU идет в float32
+        state = {name: t.float() if t.is_floating_point() else t for name, t in state.items()}
+    model.load_state_dict(state, strict=True, assign=True)
+
+    leftovers = [name for name, t in list(model.named_parameters()) + list(model.named_buffers()) if t.is_meta]
+    if leftovers:
+        raise ValueError(f"В кеше нет тензоров: {', '.join(leftovers[:5])}")
+    model.eval()
+    model._mmap_weights = mapped
+    return model, feature_extractor
+
+
+def load_model(classifier_name, feature_extractor_name, cache_dir="model_cache", dtype="float32"):
+    """
+    Модель из кеша; при отсутствии кеша - конвертация из from_pretrained
+    Возвращает (модель, экстрактор признаков)
+    """
+    path = cache_path(cache_dir, classifier_name, dtype)
+    if not (path / WEIGHTS_NAME).exists():
+        print(f"Кеш модели не найден, конвертация в {path} (один раз)...")
+        prepare_cache(cache_dir, classifier_name, feature_extractor_name, dtype)
+    return load_cached_model(path)
@@ -0,0 +1,390 @@
+import gc
+import hashlib
+import json
+import os
+import platform
+import time
+import types
+import warnings
+from pathlib import Path
+
+import numpy as np
+import torch
+
+from core import emotion_pipeline
+
+try:
+    import onnxruntime
+    ONNX_AVAILABLE = True
+except ImportError:
+    onnxruntime = None
+    ONNX_AVAILABLE = False
+
+
+# Реестр моделей эмоций
+# Каждая запись описывает контрольную точку классификатора, экстрактор
+# признаков, форму исполнения и карту меток (вместо общей NUM2EMOTION):
+#   torch     - модель transformers как есть (через кеш safetensors, если включен)
+#   quantized - динамическое квантование линейных слоев в int8 (torch, CPU)
+#   onnx      - экспорт в ONNX и onnxruntime (нужны пакеты onnx и onnxruntime)
+# quality - порядок по точности: больше - точнее. Это ранг, а не измерение;
+# при наличии оценки на своей разметке его можно заменить в файле реестра
+#
+# Метки контрольной точки (config.id2label) сверяются с картой записи при
+# загрузке: checkpoint_labels - ожидаемые имена классов контрольной точки по тем
+# же индексам (по умолчанию - сами метки записи). Безымянные метки LABEL_i
+# принимаются только у записей с labels_verified (соответствие проверено вручную:
+# у HuBERT-large карта меток взята из описания модели, по ней работало приложение);
+# запись с несовпадающими метками не загружается и выпадает из замера
+#
+# Кандидаты замеряются на этом компьютере, и для вкладки реального времени
+# выбирается самая точная модель, чей фактор реального времени (время окна / шаг)
+# укладывается в бюджет. Выбор сохраняется вместе с описанием компьютера и
+# пересчитывается, если компьютер или реестр изменились. Замер идет только по
+# явному запросу (tools/select_model.py, server.py --select-model) или в приложении,
+# пока оно простаивает: параллельный инференс исказил бы RTF. До замера реальное
+# время использует модель файлов
+
+DUSHA_LABELS = dict(emotion_pipeline.NUM2EMOTION)
+# Имена тех же классов в контрольных точках, дообученных на Dusha
+DUSHA_CHECKPOINT_LABELS = {0: 'neutral', 1: 'angry', 2: 'positive', 3: 'sad'}
+
+MODELS = {
+    'hubert-large': {
+        'classifier': emotion_pipeline.CLASSIFIER_NAME,
+        'feature_extractor': emotion_pipeline.FEATURE_EXTRACTOR_NAME,
+        'form': 'torch',
+        'quality': 4,
+        'labels': DUSHA_LABELS,
+        'checkpoint_labels': DUSHA_CHECKPOINT_LABELS,
+        'labels_verified': True,
+    },
+    'hubert-large-onnx': {
+        'classifier': emotion_pipeline.CLASSIFIER_NAME,
+        'feature_extractor': emotion_pipeline.FEATURE_EXTRACTOR_NAME,
+        'form': 'onnx',
+        'quality': 4,
+        'labels': DUSHA_LABELS,
+        'checkpoint_labels': DUSHA_CHECKPOINT_LABELS,
+        'labels_verified': True,
+    },
+    'hubert-large-int8': {
+        'classifier': emotion_pipeline.CLASSIFIER_NAME,
+        'feature_extractor': emotion_pipeline.FEATURE_EXTRACTOR_NAME,
+        'form': 'quantized',
+        'quality': 3,
+        'labels': DUSHA_LABELS,
+        'checkpoint_labels': DUSHA_CHECKPOINT_LABELS,
+        'labels_verified': True,
+    },
+    'hubert-base': {
+        'classifier': "xbgoose/hubert-base-speech-emotion-recognition-russian-dusha-finetuned",
+        'feature_extractor': emotion_pipeline.FEATURE_EXTRACTOR_NAME,
+        'form': 'torch',
+        'quality': 2,
+        'labels': DUSHA_LABELS,
+        'checkpoint_labels': DUSHA_CHECKPOINT_LABELS,
+    },
+    'hubert-base-onnx': {
+        'classifier': "xbgoose/hubert-base-speech-emotion-recognition-russian-dusha-finetuned",
+        'feature_extractor': emotion_pipeline.FEATURE_EXTRACTOR_NAME,
+        'form': 'onnx',
+        'quality': 2,
+        'labels': DUSHA_LABELS,
+        'checkpoint_labels': DUSHA_CHECKPOINT_LABELS,
+    },
+    'hubert-base-int8': {
+        'classifier': "xbgoose/hubert-base-speech-emotion-recognition-russian-dusha-finetuned",
+        'feature_extractor': emotion_pipeline.FEATURE_EXTRACTOR_NAME,
+        'form': 'quantized',
+        'quality': 1,
+        'labels': DUSHA_LABELS,
+        'checkpoint_labels': DUSHA_CHECKPOINT_LABELS,
+    },
+}
+
+ONNX_NAME = "model.onnx"
+
+
+def load_registry(path=None):
+    """
+    Реестр: встроенные модели и записи из JSON-файла (новые или замена встроенных)
+    Ключи карты меток в JSON - строки, они приводятся к int
+    """
+    registry = {name: dict(entry) for name, entry in MODELS.items()}
+    if path and Path(path).exists():
+        extra = json.loads(Path(path).read_text(encoding="utf-8"))
+        for name, entry in extra.items():
+            registry[name] = dict(registry.get(name, {}), **entry)
+    for entry in registry.values():
+        entry['labels'] = {int(k): v for k, v in entry['labels'].items()}
+        if entry.get('checkpoint_labels'):
+            entry['checkpoint_labels'] = {int(k): v for k, v in entry['checkpoint_labels'].items()}
+    return registry
+
+
+def availability(entry):
+    """(можно ли загрузить, причина)"""
+    if entry['form'] == 'onnx' and not ONNX_AVAILABLE:
+        return False, "onnxruntime не установлен"
+    if entry['form'] not in ('torch', 'quantized', 'onnx'):
+        return False, f"неизвестная форма {entry['form']}"
+    return True, None
+
+
+def label_mismatch(entry, config):
+    """Причина несовпадения меток контрольной точки с картой записи или None"""
+    id2label = {int(k): str(v).lower() for k, v in (getattr(config, 'id2label', None) or {}).items()}
+    missing = sorted(set(entry['labels']) - set(id2label))
+    if missing:
+        return f"в контрольной точке нет классов {missing}"
+    if all(name == f"label_{index}" for index, name in id2label.items()):
+        if entry.get('labels_verified'):
+            return None
+        return "метки контрольной точки безымянные (LABEL_i), соответствие карте не проверено"
+    expected = entry.get('checkpoint_labels') or entry['labels']
+    wrong = {index: id2label[index] for index in entry['labels'] if id2label[index] != str(expected[index]).lower()}
+    if wrong:
+        return f"метки контрольной точки {wrong} не совпадают с ожидаемыми {dict(expected)}"
+    return None
+
+
+def load_registered_model(entry, cache=None):
+    """
+    (модель, экстрактор признаков, карта меток) для записи реестра
+    ValueError, если метки контрольной точки не совпадают с картой записи
+    """
+    model, feature_extractor = emotion_pipeline.load_emotion_model(
+        entry['feature_extractor'], entry['classifier'], cache=cache)
+    reason = label_mismatch(entry, model.config)
+    if reason is not None:
+        raise ValueError(f"{entry['classifier']}: {reason}")
+    if entry['form'] == 'quantized':
+        model = quantize_model(model)
+    elif entry['form'] == 'onnx':
+        cache_dir = (cache or {}).get('path') or "model_cache"
+        model = OnnxEmotionModel.from_model(model, onnx_path(cache_dir, entry['classifier']))
+    if entry['form'] != 'torch' or getattr(model, '_mmap_weights', False):
+        # Процессы пула инференса загружают такую модель сами: веса из кеша
+        # отображаются из того же файла, int8 и ONNX не передаются через state_dict
+        model._pool_loader = (load_model_only, (entry, cache))
+    return model, feature_extractor, entry['labels']
+
+
+def load_model_only(entry, cache=None):
+    """Модель записи реестра (загрузчик для процессов пула инференса)"""
+    return load_registered_model(entry, cache)[0]
+
+
+def quantize_model(model):
+    """Динамическое квантование линейных слоев: веса int8, активации float32"""
+    with warnings.catch_warnings():
+        # Eager-квантование в torch помечено как устаревшее в пользу torchao
+        warnings.simplefilter("ignore")
+        quantized = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    quantized.eval()
+    return quantized
+
+
+def onnx_path(cache_dir, classifier_name):
+    return Path(cache_dir) / (classifier_name.replace("/", "--") + "-onnx") / ONNX_NAME
+
+
+class _LogitsOnly(torch.nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_values):
+        return self.model(input_values).logits
+
+
+class OnnxEmotionModel(torch.nn.Module):
+    """
+    Классификатор в onnxruntime с интерфейсом модели transformers:
+    model(input_values).logits, model.config; прямой проход можно оборачивать
+    и ставить на него хуки, как у исходной модели
+    """
+
+    def __init__(self, path, config, threads=None):
+        super().__init__()
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(str(path), options, providers=["CPUExecutionProvider"])
+        self.config = config
+        self.path = Path(path)
+
+    @classmethod
+    def from_model(cls, model, path):
+        """Экспорт при первом использовании, затем загрузка файла"""
+        path = Path(path)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(path.name + f".tmp-{os.getpid()}")
+            example = torch.zeros(1, emotion_pipeline.TARGET_SAMPLE_RATE)
+            torch.onnx.export(_LogitsOnly(model), (example,), str(tmp), input_names=["input_values"],
+                              output_names=["logits"], opset_version=17, dynamo=False,
+                              dynamic_axes={'input_values': {0: 'batch', 1: 'samples'}, 'logits': {0: 'batch'}})
+            os.replace(tmp, path)
+        return cls(path, model.config, threads=torch.get_num_threads())
+
+    def forward(self, input_values, **kwargs):
+        logits = self.session.run(None, {'input_values': input_values.detach().cpu().numpy()})[0]
+        return types.SimpleNamespace(logits=torch.from_numpy(logits))
+
+
+def host_fingerprint():
+    """Описание компьютера, от которого зависит скорость моделей"""
+    return {
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'system': platform.system(),
+        'cpu_count': os.cpu_count(),
+        'torch': torch.__version__,
+        'torch_threads': torch.get_num_threads(),
+        'onnxruntime': onnxruntime.__version__ if ONNX_AVAILABLE else None,
+    }
+
+
+def registry_version(registry):
+    """Отпечаток содержимого реестра: сохраненный выбор действителен, пока реестр не менялся"""
+    payload = json.dumps(registry, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def benchmark_model(model, feature_extractor, labels, window_seconds=3.0, repeats=5, should_stop=None):
+    """
+    Медианное время анализа одного окна, с (после прогрева)
+    None, если should_stop() вернул True между повторами
+    """
+    rng = np.random.default_rng(0)
+    audio = (0.1 * rng.standard_normal(int(window_seconds * emotion_pipeline.TARGET_SAMPLE_RATE))).astype(np.float32)
+    emotion_pipeline.analyze_audio(model, feature_extractor, audio, labels)
+    samples = []
+    for _ in range(repeats):
+        if should_stop is not None and should_stop():
+            return None
+        start = time.perf_counter()
+        emotion_pipeline.analyze_audio(model, feature_extractor, audio, labels)
+        samples.append(time.perf_counter() - start)
+    return float(np.median(samples))
+
+
+def benchmark_registry(registry, cache=None, window_seconds=3.0, repeats=5, names=None, progress=print,
+                       should_stop=None):
+    """
+    Замер всех доступных кандидатов по очереди (модели выгружаются после замера)
+    should_stop() проверяется перед каждой моделью и между повторами: при True
+    замер прерывается, недомеренная модель в результат не попадает
+    Возвращает {имя: {'seconds': ..., 'load_seconds': ...} или {'error': ...}}
+    """
+    results = {}
+    for name in names or registry:
+        if should_stop is not None and should_stop():
+            break
+        entry = registry[name]
+        ok, reason = availability(entry)
+        if not ok:
+            results[name] = {'error': reason}
+            continue
+        progress(f"Замер модели {name}...")
+        try:
+            started = time.perf_counter()
+            model, feature_extractor, labels = load_registered_model(entry, cache)
+            loaded = time.perf_counter() - started
+            seconds = benchmark_model(model, feature_extractor, labels, window_seconds, repeats, should_stop)
+            if seconds is None:
+                break
+            results[name] = {'seconds': seconds, 'load_seconds': loaded}
+        except Exception as e:
+            results[name] = {'error': str(e)}
+        finally:
+            model = feature_extractor = None
+            gc.collect()
+    return results
+
+
+def choose_model(registry, results, hop_seconds, rtf_budget):
+    """
+    Самая точная модель с фактором реального времени не выше бюджета
+    (при равной точности - более быстрая); если не укладывается ни одна - самая быстрая
+    """
+    measured = {name: r['seconds'] / hop_seconds for name, r in results.items() if 'seconds' in r}
+    if not measured:
+        return None
+    fitting = [name for name, rtf in measured.items() if rtf <= rtf_budget]
+    if fitting:
+        return max(fitting, key=lambda name: (registry[name]['quality'], -measured[name]))
+    return min(measured, key=measured.get)
+
+
+def host_idle(max_load=0.5):
+    """
+    Компьютер простаивает: средняя загрузка за минуту меньше max_load на ядро
+    Без os.getloadavg (Windows) проверяется только занятость самого приложения
+    """
+    try:
+        load = os.getloadavg()[0]
+    except (AttributeError, OSError):
+        return True
+    return load < max_load * (os.cpu_count() or 1)
+
+
+def configured_realtime_model(registry, settings):
+    """
+    Модель реального времени без замера: имя из настроек или выбор, сохраненный
+    на этом компьютере для этой версии реестра (в том числе выбор select_model.py
+    с --models или --budget); None - нужен замер
+    """
+    if settings['realtime'] != 'auto':
+        return settings['realtime']
+    try:
+        saved = json.loads(Path(settings['selection_path']).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if (saved.get('host') == host_fingerprint() and saved.get('registry') == registry_version(registry)
+            and saved.get('selected') in registry):
+        return saved['selected']
+    return None
+
+
+def select_realtime_model(registry, settings, cache=None, rtf_budget=0.6, force=False, names=None, progress=print,
+                          should_stop=None):
+    """
+    Модель для реального времени по секции "models" настроек
+    realtime: имя записи или "auto" (замер на этом компьютере с сохранением выбора)
+    names - кандидаты для замера (по умолчанию весь реестр); прерванный через
+    should_stop() замер не сохраняется, возвращается None
+    Возвращает имя записи реестра
+    """
+    if settings['realtime'] != 'auto':
+        return settings['realtime']
+    if not force:
+        selected = configured_realtime_model(registry, settings)
+        if selected is not None:
+            return selected
+
+    path = Path(settings['selection_path'])
+    hop_seconds = settings['benchmark_window']
+    results = benchmark_registry(registry, cache, hop_seconds, settings['benchmark_repeats'], names=names,
+                                 progress=progress, should_stop=should_stop)
+    if should_stop is not None and should_stop():
+        return None
+    selected = choose_model(registry, results, hop_seconds, rtf_budget) or settings['file']
+    for name, result in results.items():
+        if 'seconds' in result:
+            result['rtf'] = result['seconds'] / hop_seconds
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({
+        'host': host_fingerprint(),
+        'registry': registry_version(registry),
+        'candidates': sorted(names or registry),
+        'rtf_budget': rtf_budget,
+        'window_seconds': hop_seconds,
+        'results': results,
+        'selected': selected,
+        'created_at': time.time(),
+    }, ensure_ascii=False, indent=2), encoding="utf-8")
+    progress(f"Модель реального времени: {selected}")
+    return selected
@@ -0,0 +1,46 @@
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from core.model_registry import select_realtime_model
+from core.thread_budget import pin_current_thread
+
+
+class ModelSelectionWorker(QThread):
+    """
+    Замер моделей реестра в фоне (первый запуск на этом компьютере), пока
+    приложение простаивает. Выбор сохраняется в models.selection_path и применяется
+    при следующем запуске; stop() прерывает замер после текущего повтора (в том числе
+    когда начинается анализ), прерванный замер не сохраняется
+    """
+
+    progress = pyqtSignal(str)
+    selected = pyqtSignal(str)
+    failed = pyqtSignal(str)
+
+    def __init__(self, registry, model_settings, cache=None, rtf_budget=0.6, parent=None):
+        super().__init__(parent)
+        self.registry = registry
+        self.model_settings = model_settings
+        self.cache = cache
+        self.rtf_budget = rtf_budget
+        self._running = True
+
+    def stop(self):
+        self._running = False
+
+    def run(self):
+        pin_current_thread('inference')
+        try:
+            name = select_realtime_model(
+                self.registry,
+                self.model_settings,
+                self.cache,
+                rtf_budget=self.rtf_budget,
+                force=True,
+                progress=self.progress.emit,
+                should_stop=lambda: not self._running
+            )
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        if name is not None:
+            self.selected.emit(name)
@@ -0,0 +1,187 @@
+import collections
+import contextlib
+import functools
+import os
+import time
+
+
+# Счетчики производительности конвейера реального времени
+# Запись не берет блокировок: выборки - deque.append (атомарен под GIL),
+# показатели - присваивание в словарь. Счетчики событий рассчитаны на одного
+# писателя (каждый увеличивается из одного потока). Панель читает снимок
+# с низкой фиксированной частотой, поэтому замеры не нагружают GUI-поток
+#
+# Имена, которые использует панель:
+#   выборки:    latency (захват -> экран), hubert, vosk (время вызова, с)
+#   счетчики:   dropped_chunks.<писатель> (сумма - потерянные блоки), windows
+#   У каждого потока свой счетчик потерь: инкремент без блокировки не атомарен,
+#   и два писателя одного счетчика теряли бы увеличения
+#   показатели: queue.<имя> (глубина очереди: число заданий или секунды аудио)
+# Показатели очередей обычно регистрируются функцией (register_gauge), которая
+# вызывается только при снимке для панели
+
+SAMPLE_WINDOW = 512
+
+
+class PerfCounters:
+    def __init__(self, sample_window=SAMPLE_WINDOW):
+        self.sample_window = sample_window
+        self._samples = {}
+        self._counts = {}
+        self.gauges = {}
+        self._sources = {}
+
+    def record(self, name, value):
+        """Выборка значения (например, длительности вызова в секундах)"""
+        samples = self._samples.get(name)
+        if samples is None:
+            samples = self._samples.setdefault(name, collections.deque(maxlen=self.sample_window))
+        samples.append(value)
+
+    def increment(self, name, n=1):
+        self._counts[name] = self._counts.get(name, 0) + n
+
+    def set_gauge(self, name, value):
+        self.gauges[name] = value
+
+    def register_gauge(self, name, source):
+        """Показатель, значение которого source() возвращает в момент снимка"""
+        self._sources[name] = source
+
+    def unregister_gauge(self, name):
+        self._sources.pop(name, None)
+
+    @contextlib.contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def time_calls(self, obj, method, name):
+        """Замер каждого вызова метода объекта (например, AcceptWaveform распознавателя)"""
+        func = getattr(obj, method)
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.record(name, time.perf_counter() - start)
+
+        setattr(obj, method, timed)
+        return obj
+
+    def wrap_model(self, model, name='hubert'):
+        """Модель с замером прямых проходов для одного потребителя (общая модель не меняется)"""
+        def on_forward(input_values, seconds):
+            self.record(name, seconds)
+            self.increment('windows')
+
+        return TimedModel(model, on_forward)
+
+    def mark_displayed(self, captured_at):
+        """
+        Вывод результата окна на экран; captured_at - время захвата конца окна
+        (time.perf_counter). Без времени захвата задержка не учитывается
+        """
+        if captured_at is not None:
+            self.record('latency', time.perf_counter() - captured_at)
+
+    def snapshot(self, hop_seconds=None):
+        """Сводка для панели: перцентили, RTF, очереди, потери, RSS"""
+        stats = {name: _percentiles(list(samples)) for name, samples in list(self._samples.items())}
+        gauges = dict(self.gauges)
+        for name, source in list(self._sources.items()):
+            try:
+                gauges[name] = source()
+            except Exception:
+                pass
+        hubert = stats.get('hubert')
+        rtf = None
+        if hubert and hop_seconds:
+            # Среднее время на окно, деленное на шаг между окнами
+            rtf = hubert['mean'] / hop_seconds
+        return {
+            'latency': stats.get('latency'),
+            'hubert': hubert,
+            'vosk': stats.get('vosk'),
+            'rtf': rtf,
+            'queues': {name[len('queue.'):]: value for name, value in gauges.items()
+                       if name.startswith('queue.') and value is not None},
+            'dropped_chunks': sum(count for name, count in list(self._counts.items())
+                                  if name.startswith('dropped_chunks.')),
+            'windows': self._counts.get('windows', 0),
+            'rss_mb': process_rss() / 2 ** 20,
+        }
+
+    def reset(self):
+        self._samples = {}
+        self._counts = {}
+        self.gauges = {}
+
+
+class TimedModel:
+    """
+    Модель для одного потребителя (например, аудио процессора реального времени):
+    каждый прямой проход передается в on_forward(input_values, секунды), остальные
+    атрибуты берутся у модели. Общая модель не меняется, поэтому вызовы других
+    потребителей (анализ файлов, транскрипция) в замеры не попадают
+    """
+
+    def __init__(self, model, on_forward):
+        self.model = model
+        self.on_forward = on_forward
+
+    def __call__(self, input_values, *args, **kwargs):
+        return self.forward(input_values, *args, **kwargs)
+
+    def forward(self, input_values, *args, **kwargs):
+        start = time.perf_counter()
+        output = self.model(input_values, *args, **kwargs)
+        self.on_forward(input_values, time.perf_counter() - start)
+        return output
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+
+def _percentiles(samples):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    n = len(ordered)
+    return {
+        'p50': ordered[n // 2],
+        'p95': ordered[min(n - 1, int(n * 0.95))],
+        'max': ordered[-1],
+        'mean': sum(ordered) / n,
+        'n': n,
+    }
+
+
+def process_rss():
+    """Резидентная память процесса в байтах"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        # Пиковое значение: на Linux в килобайтах, на macOS в байтах
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+    except ImportError:
+        return 0
+
+
+# Общий экземпляр процесса: пишут потоки реального времени, читает панель
+counters = PerfCounters()
@@ -0,0 +1,134 @@
+import contextlib
+import cProfile
+import functools
+import os
+import threading
+import time
+from pathlib import Path
+
+
+# Профилирование включается переменными окружения или флагами командной строки:
+#   SINCHRONIIYA_PROFILE=1          --profile
+#   SINCHRONIIYA_PROFILE_EVERY=10   --profile-every 10
+#   SINCHRONIIYA_PROFILE_DIR=dir    --profile-dir dir
+PROFILE_ENV_VAR = "SINCHRONIIYA_PROFILE"
+PROFILE_EVERY_ENV_VAR = "SINCHRONIIYA_PROFILE_EVERY"
+PROFILE_DIR_ENV_VAR = "SINCHRONIIYA_PROFILE_DIR"
+
+_session = None
+
+
+class ProfilingSession:
+    """
+    Выборочное профилирование участков кода
+    - Каждый участок (scope) профилируется на каждом N-м вызове
+    - cProfile сохраняется в .pstats, torch.profiler - в chrome trace (.json)
+    - Отчеты пишутся в каталог с меткой времени запуска
+    Одновременно профилируется только один участок: cProfile не поддерживает
+    несколько активных профилировщиков в разных потоках
+    """
+
+    def __init__(self, output_dir="profiles", every_n=10, torch_trace=True):
+        self.output_dir = Path(output_dir) / time.strftime("%Y%m%d-%H%M%S")
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.every_n = max(1, int(every_n))
+        self.torch_trace = torch_trace
+        self._counters = {}
+        self._counters_lock = threading.Lock()
+        self._active = threading.Lock()
+
+    def _should_sample(self, name):
+        with self._counters_lock:
+            count = self._counters.get(name, 0)
+            self._counters[name] = count + 1
+        return count % self.every_n == 0, count
+
+    @contextlib.contextmanager
+    def scope(self, name, torch_trace=True):
+        """Профилирование участка кода, если он попал в выборку"""
+        sampled, index = self._should_sample(name)
+        if not sampled or not self._active.acquire(blocking=False):
+            yield
+            return
+
+        try:
+            torch_profiler = self._start_torch(name) if (torch_trace and self.torch_trace) else None
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+                stem = self.output_dir / f"{name}_{index:06d}"
+                profiler.dump_stats(f"{stem}.pstats")
+                if torch_profiler is not None:
+                    self._stop_torch(torch_profiler, f"{stem}.trace.json")
+        finally:
+            self._active.release()
+
+    def _start_torch(self, name):
+        try:
+            import torch
+            profiler = torch.profiler.profile(activities=[torch.profiler.ProfilerActivity.CPU])
+            profiler.__enter__()
+            record = torch.profiler.record_function(name)
+            record.__enter__()
+            return profiler, record
+        except Exception as e:
+            print(f"torch.profiler недоступен: {e}")
+            return None
+
+    def _stop_torch(self, handles, path):
+        profiler, record = handles
+        try:
+            record.__exit__(None, None, None)
+            profiler.__exit__(None, None, None)
+            profiler.export_chrome_trace(path)
+        except Exception as e:
+            print(f"Не удалось сохранить trace torch.profiler: {e}")
+
+
+def configure_profiling(enabled=None, every_n=None, output_dir=None):
+    """
+    Включение профилирования для процесса
+    Незаданные параметры берутся из переменных окружения
+    """
+    global _session
+    if enabled is None:
+        enabled = os.environ.get(PROFILE_ENV_VAR, "").lower() in ("1", "true", "yes", "on")
+    if not enabled:
+        _session = None
+        return None
+
+    every_n = every_n or int(os.environ.get(PROFILE_EVERY_ENV_VAR, "10"))
+    output_dir = output_dir or os.environ.get(PROFILE_DIR_ENV_VAR, "profiles")
+    _session = ProfilingSession(output_dir, every_n)
+    print(f"Профилирование включено: каждый {_session.every_n}-й вызов, отчеты в {_session.output_dir}")
+    return _session
+
+
+def profile_scope(name, torch_trace=True):
+    """Контекст профилирования; без активной сессии ничего не делает"""
+    if _session is None:
+        return contextlib.nullcontext()
+    return _session.scope(name, torch_trace)
+
+
+def profile_model_forward(model, name="model_forward"):
+    """
+    Профилирование прямых проходов модели
+    Охватывает все вызовы модели, в том числе батчи реального времени из AudioProcessor
+    """
+    if _session is None or getattr(model, '_profiling_wrapped', False):
+        return model
+
+    forward = model.forward
+
+    @functools.wraps(forward)
+    def wrapped_forward(*args, **kwargs):
+        with profile_scope(name):
+            return forward(*args, **kwargs)
+
+    model.forward = wrapped_forward
+    model._profiling_wrapped = True
+    return model
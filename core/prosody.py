@@ -0,0 +1,239 @@
+import collections
+import time
+
+import numpy as np
+
+
+# Быстрый первый уровень оценки эмоций по просодии
+# На каждом блоке 100-250 мс векторно считаются энергия, основной тон
+# (автокорреляция через FFT), его разброс, доля вокализованных кадров,
+# темп (слоговые пики огибающей за последние секунды) и спектральный центроид.
+# Признаки нормируются по скользящей статистике диктора, предварительная
+# эмоция - линейная модель поверх них. Когда приходит результат HuBERT для
+# окна, модель дообучается на нем (мягкие метки), поэтому предварительные
+# оценки со временем сходятся к подтвержденным
+
+FEATURES = ('energy', 'pitch', 'pitch_var', 'voicing', 'rate', 'centroid')
+
+# Начальные веса до первых подтверждений HuBERT: громкая, быстрая и высокая
+# речь - гнев или радость, тихая и медленная - грусть, близкая к обычной - нейтральная
+PRIOR_WEIGHTS = {
+    'нейтральная': (0.0, 0.0, 0.0, 0.0, 0.0, 0.0),
+    'гнев': (1.0, 0.3, 0.5, 0.0, 0.5, 0.6),
+    'радость': (0.4, 0.8, 0.7, 0.2, 0.3, 0.2),
+    'грусть': (-0.8, -0.5, -0.6, -0.2, -0.6, -0.4),
+}
+PRIOR_BIAS = {'нейтральная': 0.8}
+
+FRAME_SECONDS = 0.04
+HOP_SECONDS = 0.01
+MIN_PITCH = 60.0
+MAX_PITCH = 400.0
+
+
+def frame_signal(audio, frame, hop):
+    """Кадры [n, frame] как представление массива (без копии)"""
+    if len(audio) < frame:
+        audio = np.pad(audio, (0, frame - len(audio)))
+    return np.lib.stride_tricks.sliding_window_view(audio, frame)[::hop]
+
+
+def chunk_features(chunk, sample_rate=16000, energy_floor_db=-50.0):
+    """
+    Покадровые признаки блока: (энергия дБ, тон Гц, вокализация 0..1, центроид Гц)
+    Все кадры обрабатываются одной матричной операцией
+    """
+    frame = int(FRAME_SECONDS * sample_rate)
+    hop = int(HOP_SECONDS * sample_rate)
+    frames = frame_signal(np.asarray(chunk, dtype=np.float32), frame, hop)
+    frames = frames - frames.mean(axis=1, keepdims=True)
+
+    energy = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+
+    window = np.hanning(frame).astype(np.float32)
+    size = 1 << int(np.ceil(np.log2(2 * frame)))
+    spectrum = np.fft.rfft(frames * window, n=size, axis=1)
+    power = np.abs(spectrum) ** 2
+
+    # Автокорреляция как обратное преобразование спектра мощности
+    autocorr = np.fft.irfft(power, axis=1)[:, :frame]
+    min_lag = int(sample_rate / MAX_PITCH)
+    max_lag = min(frame - 1, int(sample_rate / MIN_PITCH))
+    lags = autocorr[:, min_lag:max_lag]
+    best = np.argmax(lags, axis=1)
+    peak = lags[np.arange(len(lags)), best]
+    voicing = np.clip(peak / (autocorr[:, 0] + 1e-10), 0.0, 1.0)
+    pitch = sample_rate / (best + min_lag)
+
+    freqs = np.fft.rfftfreq(size, 1.0 / sample_rate)
+    centroid = (power @ freqs) / (power.sum(axis=1) + 1e-10)
+
+    voiced = (voicing > 0.45) & (energy > energy_floor_db)
+    return energy, np.where(voiced, pitch, np.nan), voicing, centroid, voiced
+
+
+class ProsodicEstimator:
+    """
+    Предварительная оценка эмоции по блокам аудио
+    push() возвращает (эмоция, уверенность %, вероятности %) или None на тишине;
+    learn() дообучает модель на вероятностях HuBERT для последнего окна
+    """
+
+    def __init__(self, num2emotion, sample_rate=16000, history_seconds=2.0, learning_rate=0.05,
+                 baseline_seconds=20.0, energy_floor_db=-50.0):
+        self.num2emotion = num2emotion
+        self.emotions = [num2emotion[i] for i in sorted(num2emotion)]
+        self.sample_rate = sample_rate
+        self.learning_rate = learning_rate
+        self.baseline_seconds = baseline_seconds
+        self.energy_floor_db = energy_floor_db
+        frames = int(history_seconds / HOP_SECONDS)
+        self.history_energy = collections.deque(maxlen=frames)
+        self.history_pitch = collections.deque(maxlen=frames)
+        self.weights = np.array([PRIOR_WEIGHTS.get(e, (0.0,) * len(FEATURES)) for e in self.emotions],
+                                dtype=np.float64)
+        self.bias = np.array([PRIOR_BIAS.get(e, 0.0) for e in self.emotions], dtype=np.float64)
+        # Признаки последних блоков с временем для сопоставления с окнами HuBERT
+        self.recent = collections.deque(maxlen=256)
+        self.mean = None
+        self.var = None
+        self.audio_time = 0.0
+        self.updates = 0
+
+    def features(self, chunk):
+        """Вектор признаков блока с учетом истории (темп и разброс тона) или None на тишине"""
+        energy, pitch, voicing, centroid, voiced = chunk_features(chunk, self.sample_rate, self.energy_floor_db)
+        self.history_energy.extend(energy)
+        self.history_pitch.extend(pitch)
+        if not voiced.any():
+            return None
+
+        history_pitch = np.array(self.history_pitch)
+        history_pitch = history_pitch[~np.isnan(history_pitch)]
+        semitones = 12 * np.log2(history_pitch / 100.0)
+        return np.array([
+            float(energy[voiced].mean()),
+            float(np.nanmedian(12 * np.log2(pitch[voiced] / 100.0))),
+            float(semitones.std()) if len(semitones) > 1 else 0.0,
+            float(voiced.mean()),
+            self._syllable_rate(),
+            float(np.log(centroid[voiced].mean() + 1.0)),
+        ])
+
+    def _syllable_rate(self):
+        """Слоговые пики огибающей энергии в секунду за историю"""
+        envelope = np.array(self.history_energy)
+        if len(envelope) < 5:
+            return 0.0
+        envelope = np.convolve(envelope, np.ones(5) / 5, mode='same')
+        threshold = max(self.energy_floor_db, np.percentile(envelope, 60))
+        peaks = (envelope[1:-1] > envelope[:-2]) & (envelope[1:-1] >= envelope[2:]) & (envelope[1:-1] > threshold)
+        return float(peaks.sum() / (len(envelope) * HOP_SECONDS))
+
+    def push(self, chunk):
+        duration = len(chunk) / self.sample_rate
+        self.audio_time += duration
+        values = self.features(chunk)
+        if values is None:
+            return None
+        self._update_baseline(values, duration)
+        z = self._normalize(values)
+        self.recent.append((self.audio_time, z))
+        probs = self._predict(z)
+        best = int(np.argmax(probs))
+        return self.emotions[best], float(probs[best] * 100), {
+            emotion: float(p * 100) for emotion, p in zip(self.emotions, probs)
+        }
+
+    def learn(self, target_probs, window_seconds=3.0, audio_time=None):
+        """
+        Шаг градиента мягкой логистической регрессии на среднем признаков окна
+        target_probs - вероятности HuBERT (% или доли) по эмоциям
+        """
+        end = self.audio_time if audio_time is None else audio_time
+        window = [z for t, z in self.recent if end - window_seconds < t <= end + 1e-6]
+        if not window:
+            return False
+        z = np.mean(window, axis=0)
+        target = np.array([target_probs.get(e, 0.0) for e in self.emotions], dtype=np.float64)
+        if target.sum() <= 0:
+            return False
+        target /= target.sum()
+        error = self._predict(z) - target
+        self.weights -= self.learning_rate * np.outer(error, z)
+        self.bias -= self.learning_rate * error
+        self.updates += 1
+        return True
+
+    def _update_baseline(self, values, duration):
+        # Базовая линия диктора: экспоненциальное среднее с постоянной baseline_seconds
+        if self.mean is None:
+            self.mean = values.copy()
+            self.var = np.ones_like(values)
+            return
+        alpha = min(1.0, duration / self.baseline_seconds)
+        delta = values - self.mean
+        self.mean += alpha * delta
+        self.var += alpha * (delta ** 2 - self.var)
+
+    def _normalize(self, values):
+        return np.clip((values - self.mean) / np.sqrt(self.var + 1e-6), -4.0, 4.0)
+
+    def _predict(self, z):
+        logits = self.weights @ z + self.bias
+        logits -= logits.max()
+        exp = np.exp(logits)
+        return exp / exp.sum()
+
+
+class TieredEmotionTracker:
+    """
+    Учет двух уровней оценки: предварительной (просодия) и подтвержденной (HuBERT)
+    Для каждого окна HuBERT сравнивается последняя предварительная оценка,
+    выданная внутри окна: доля совпадений и выигрыш во времени
+    """
+
+    def __init__(self, window_seconds=3.0, sample_window=512):
+        self.window_seconds = window_seconds
+        self.provisional_events = collections.deque(maxlen=sample_window)
+        self.agreements = collections.deque(maxlen=sample_window)
+        self.gains = collections.deque(maxlen=sample_window)
+        self.state = None
+        self.current = None
+
+    def provisional(self, result, audio_time, emitted_at=None):
+        """Новая предварительная оценка; audio_time - конец блока в потоке"""
+        emitted_at = time.perf_counter() if emitted_at is None else emitted_at
+        self.provisional_events.append((audio_time, emitted_at, result[0]))
+        self.current = result
+        self.state = 'provisional'
+
+    def confirm(self, result, audio_time=None, received_at=None):
+        """
+        Результат HuBERT для окна, заканчивающегося в audio_time
+        Возвращает (совпала ли предварительная оценка, выигрыш в секундах) или None
+        """
+        received_at = time.perf_counter() if received_at is None else received_at
+        self.current = result
+        self.state = 'confirmed'
+        candidates = [event for event in self.provisional_events
+                      if audio_time is None or audio_time - self.window_seconds < event[0] <= audio_time + 1e-6]
+        if not candidates:
+            return None
+        # Последняя предварительная оценка до конца окна: выигрыш - насколько
+        # раньше оценка того же аудио появилась на экране
+        _, emitted_at, emotion = candidates[-1]
+        agree = emotion == result[0]
+        gain = received_at - emitted_at
+        self.agreements.append(agree)
+        self.gains.append(gain)
+        return agree, gain
+
+    def stats(self):
+        gains = sorted(self.gains)
+        return {
+            'windows': len(self.agreements),
+            'agreement': sum(self.agreements) / len(self.agreements) if self.agreements else None,
+            'latency_gain_p50': gains[len(gains) // 2] if gains else None,
+            'latency_gain_mean': sum(gains) / len(gains) if gains else None,
+        }
@@ -0,0 +1,250 @@
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+
+# Архив сессий в SQLite
+# - sessions: сессии анализа в реальном времени и анализа файлов
+# - phrases: распознанные фразы с эмоцией, уверенностью и временем
+# - file_results: результаты анализа файлов с вероятностями всех эмоций
+# - phrases_fts: полнотекстовый индекс FTS5 по тексту фраз (синхронизируется триггерами)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    title TEXT,
+    goal TEXT,
+    started_at REAL NOT NULL,
+    ended_at REAL
+);
+CREATE INDEX IF NOT EXISTS sessions_started ON sessions(started_at);
+
+CREATE TABLE IF NOT EXISTS phrases (
+    id INTEGER PRIMARY KEY,
+    session_id INTEGER NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    timestamp REAL NOT NULL,
+    text TEXT NOT NULL,
+    emotion TEXT,
+    confidence REAL
+);
+CREATE INDEX IF NOT EXISTS phrases_session ON phrases(session_id, timestamp);
+CREATE INDEX IF NOT EXISTS phrases_emotion ON phrases(emotion, confidence);
+
+CREATE TABLE IF NOT EXISTS file_results (
+    id INTEGER PRIMARY KEY,
+    session_id INTEGER NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    path TEXT NOT NULL,
+    emotion TEXT,
+    confidence REAL,
+    probs TEXT,
+    duration REAL,
+    analyzed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS file_results_emotion ON file_results(emotion, confidence);
+CREATE INDEX IF NOT EXISTS file_results_path ON file_results(path);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS phrases_fts USING fts5(
+    text, content='phrases', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS phrases_ai AFTER INSERT ON phrases BEGIN
+    INSERT INTO phrases_fts(rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS phrases_ad AFTER DELETE ON phrases BEGIN
+    INSERT INTO phrases_fts(phrases_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+CREATE TRIGGER IF NOT EXISTS phrases_au AFTER UPDATE OF text ON phrases BEGIN
+    INSERT INTO phrases_fts(phrases_fts, rowid, text) VALUES ('delete', old.id, old.text);
+    INSERT INTO phrases_fts(rowid, text) VALUES (new.id, new.text);
+END;
+"""
+
+
+class SessionArchive:
+    """
+    Локальный архив сессий
+    Фразы копятся в буфере и записываются пачками в одной транзакции
+    (flush_every фраз, завершение сессии или явный flush)
+    """
+
+    def __init__(self, path="sessions.db", flush_every=50):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.flush_every = flush_every
+        self._lock = threading.Lock()
+        self._pending = []
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+        try:
+            self.conn.executescript(FTS_SCHEMA)
+            self.fts = True
+        except sqlite3.OperationalError as e:
+            # SQLite без FTS5: поиск по тексту работает через LIKE
+            print(f"FTS5 недоступен, полнотекстовый поиск будет медленным: {e}")
+            self.fts = False
+        self.conn.commit()
+
+    def start_session(self, kind, title=None, goal=None, started_at=None):
+        """Новая сессия ('realtime' или 'files'), возвращает ее id"""
+        with self._lock:
+            cursor = self.conn.execute(
+                "INSERT INTO sessions(kind, title, goal, started_at) VALUES (?, ?, ?, ?)",
+                (kind, title, goal, started_at or time.time())
+            )
+            self.conn.commit()
+            return cursor.lastrowid
+
+    def end_session(self, session_id, ended_at=None):
+        with self._lock:
+            self._flush_locked()
+            self.conn.execute("UPDATE sessions SET ended_at = ? WHERE id = ?",
+                              (ended_at or time.time(), session_id))
+            self.conn.commit()
+
+    def add_phrase(self, session_id, text, emotion=None, confidence=None, timestamp=None):
+        """Фраза ставится в буфер пакетной записи"""
+        with self._lock:
+            self._pending.append((session_id, timestamp or time.time(), text, emotion, confidence))
+            if len(self._pending) >= self.flush_every:
+                self._flush_locked()
+
+    def add_phrases(self, rows):
+        """Пакетная вставка [(session_id, timestamp, text, emotion, confidence), ...] одной транзакцией"""
+        with self._lock:
+            self._pending.extend(rows)
+            self._flush_locked()
+
+    def add_file_result(self, session_id, path, emotion, confidence, probs=None, duration=None):
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO file_results(session_id, path, emotion, confidence, probs, duration, analyzed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (session_id, str(path), emotion, confidence,
+                 json.dumps(probs, ensure_ascii=False) if probs is not None else None,
+                 duration, time.time())
+            )
+            self.conn.commit()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO phrases(session_id, timestamp, text, emotion, confidence) VALUES (?, ?, ?, ?, ?)",
+                self._pending
+            )
+        self._pending = []
+
+    def search_phrases(self, query=None, emotion=None, min_confidence=None, since=None, until=None,
+                       kind=None, limit=100):
+        """
+        Поиск фраз: полнотекстовый запрос FTS5 (например 'возврат*'), эмоция,
+        минимальная уверенность, интервал времени и тип сессии
+        Возвращает список словарей, новые фразы первыми
+        """
+        where, params = self._phrase_filter(query, emotion, min_confidence, since, until, kind)
+        # Порядок по id (порядок записи) позволяет FTS5 отдавать совпадения
+        # от новых к старым и остановиться на limit без сортировки всех совпадений
+        source, order = self._phrase_source(query)
+        sql = ("SELECT p.id, p.session_id, p.timestamp, p.text, p.emotion, p.confidence, "
+               f"s.kind, s.title, s.started_at FROM {source}{where} ORDER BY {order} DESC LIMIT ?")
+        self.flush()
+        with self._lock:
+            return [dict(row) for row in self.conn.execute(sql, params + [limit])]
+
+    def search_sessions(self, query=None, emotion=None, min_confidence=None, since=None, until=None,
+                        kind=None, limit=100):
+        """Сессии с подходящими фразами: число совпадений и пример фразы"""
+        where, params = self._phrase_filter(query, emotion, min_confidence, since, until, kind)
+        sql = ("SELECT s.id AS session_id, s.kind, s.title, s.goal, s.started_at, s.ended_at, "
+               "COUNT(*) AS matches, MIN(p.text) AS example "
+               f"FROM {self._phrase_source(query)[0]}"
+               f"{where} GROUP BY s.id ORDER BY s.started_at DESC LIMIT ?")
+        self.flush()
+        with self._lock:
+            return [dict(row) for row in self.conn.execute(sql, params + [limit])]
+
+    def _phrase_source(self, query):
+        """(источник FROM, столбец сортировки); при поиске по тексту порядок задает FTS5"""
+        if query and self.fts:
+            return ("phrases_fts f JOIN phrases p ON p.id = f.rowid "
+                    "JOIN sessions s ON s.id = p.session_id", "f.rowid")
+        return "phrases p JOIN sessions s ON s.id = p.session_id", "p.id"
+
+    def _phrase_filter(self, query, emotion, min_confidence, since, until, kind):
+        conditions = []
+        params = []
+        if query:
+            if self.fts:
+                conditions.append("phrases_fts MATCH ?")
+                params.append(query)
+            else:
+                conditions.append("p.text LIKE ?")
+                params.append(f"%{query.rstrip('*')}%")
+        if emotion:
+            conditions.append("p.emotion = ?")
+            params.append(emotion)
+        if min_confidence is not None:
+            conditions.append("p.confidence >= ?")
+            params.append(min_confidence)
+        if since is not None:
+            conditions.append("p.timestamp >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("p.timestamp < ?")
+            params.append(until)
+        if kind:
+            conditions.append("s.kind = ?")
+            params.append(kind)
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        return where, params
+
+    def search_file_results(self, emotion=None, min_confidence=None, max_confidence=None, limit=100):
+        """Результаты анализа файлов по эмоции и диапазону уверенности"""
+        conditions = []
+        params = []
+        if emotion:
+            conditions.append("emotion = ?")
+            params.append(emotion)
+        if min_confidence is not None:
+            conditions.append("confidence >= ?")
+            params.append(min_confidence)
+        if max_confidence is not None:
+            conditions.append("confidence <= ?")
+            params.append(max_confidence)
+        sql = "SELECT * FROM file_results"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY analyzed_at DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = [dict(row) for row in self.conn.execute(sql, params)]
+        for row in rows:
+            row['probs'] = json.loads(row['probs']) if row['probs'] else None
+        return rows
+
+    def session_phrases(self, session_id):
+        """Все фразы сессии по порядку"""
+        self.flush()
+        with self._lock:
+            return [dict(row) for row in self.conn.execute(
+                "SELECT timestamp, text, emotion, confidence FROM phrases WHERE session_id = ? ORDER BY timestamp",
+                (session_id,)
+            )]
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self.conn.close()
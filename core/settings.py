@@ -0,0 +1,148 @@
+import copy
+import json
+import os
+from pathlib import Path
+
+
+# Путь к файлу настроек можно переопределить переменной окружения
+SETTINGS_ENV_VAR = "SINCHRONIIYA_SETTINGS"
+DEFAULT_SETTINGS_PATH = Path(__file__).resolve().parent.parent / "config" / "settings.json"
+
+DEFAULT_SETTINGS = {
+    "ollama": {
+        "host": None,              # None - адрес по умолчанию (OLLAMA_HOST или localhost:11434)
+        "model": "deepseek-llm:7b",
+        "keep_alive": "30m",       # сколько модель остается загруженной после запроса
+        "timeout": None,
+        "warm_up": True,           # прогрев модели при установке цели разговора
+        "options": {
+            "num_ctx": 4096,
+            "num_thread": None,    # None - Ollama выбирает сама
+        },
+    },
+    "vosk": {
+        "model_path": "vosk-model-ru-0.42",
+    },
+    "transcription": {
+        "workers": None,           # процессов декодирования; None - все ядра
+        "chunk_seconds": 60.0,     # длина фрагмента, разрез ищется в паузе рядом с границей
+    },
+    "server": {
+        "host": "0.0.0.0",
+        "port": 8765,
+        "window_seconds": 3.0,
+        "hop_seconds": 1.0,
+        "inference_workers": 1,    # параллельные батчи HuBERT
+        "max_batch": 8,            # окон разных сессий в одном прямом проходе
+        "max_wait": 0.01,          # ожидание добора батча, с
+        "inbound_chunks": 32,      # входная очередь сессии; при переполнении чтение сокета приостанавливается
+        "streaming_encoder": False,  # кеш кадров сверточного энкодера HuBERT между окнами сессии
+    },
+    "capture": {
+        "callback": True,          # захват в режиме колбэка PyAudio в кольцевой буфер float32
+        "frames_per_buffer": 512,  # семплов в блоке колбэка
+        "ring_seconds": 30.0,      # емкость кольца захвата
+    },
+    "prosody": {
+        "enabled": True,           # предварительная оценка эмоции по просодии до результата HuBERT
+        "chunk_seconds": 0.2,      # блок оценки, 0.1-0.25 с
+        "learning_rate": 0.05,     # дообучение на подтвержденных результатах HuBERT
+    },
+    "timeline": {
+        "raw_capacity": 1024,      # сырых результатов окон в кольце (график, выгрузка)
+        "recent_seconds": 300,     # окно доминирующей эмоции для интерфейса и советника
+    },
+    "realtime": {
+        "adaptive_window": False,  # подбирать окно и шаг по измеренному времени инференса
+        "min_window": 1.0,
+        "max_window": 10.0,
+        "target_rtf": 0.6,         # допустимая доля шага, которую занимает инференс окна
+    },
+    "models": {
+        "file": "hubert-large",    # модель вкладки файлов (точность важнее скорости)
+        "realtime": "auto",        # имя из реестра или "auto" - замер кандидатов на этом компьютере
+        "registry_path": None,     # JSON с дополнительными моделями реестра
+        "selection_path": "model_cache/selection.json",  # сохраненный результат замера
+        "benchmark_window": 3.0,   # окно и шаг при замере, с; бюджет - realtime.target_rtf
+        "benchmark_repeats": 5,
+    },
+    "model_cache": {
+        "enabled": True,           # веса HuBERT из локального кеша safetensors через mmap
+        "path": "model_cache",
+        "dtype": "float32",        # "float16" - файл вдвое меньше, но веса копируются при загрузке
+    },
+    "worker_pool": {
+        "enabled": False,          # прямой проход HuBERT в отдельных процессах
+        "workers": 2,
+        "slots": None,             # None - 4 слота общей памяти на процесс
+        "max_batch": 4,
+        "threads_per_worker": None,  # None - потоки torch поровну между процессами
+    },
+    "ingest": {
+        "workers": None,           # файлов, читаемых параллельно на вкладке файлов; None - до 4
+        "inference_slots": 1,      # одновременных прямых проходов модели
+    },
+    "archive": {
+        "enabled": True,           # архив сессий, фраз и результатов анализа файлов
+        "path": "sessions.db",
+        "flush_every": 50,         # фраз в одной транзакции
+    },
+    "batch": {
+        "shard_size": 200,         # файлов в шарде задания
+        "lease_seconds": 300,      # захват шарда без пульса дольше этого считается брошенным
+        "checkpoint_every": 20,    # файлов между fsync контрольной точки
+    },
+    "embeddings": {
+        "enabled": False,          # сохранять эмбеддинги окон HuBERT для поиска похожих фрагментов
+        "path": "embeddings",
+        "nprobe": 16,              # списков IVF, просматриваемых при поиске
+    },
+    "threads": {
+        "mode": "auto",            # "auto" - по числу ядер, "manual" - значения ниже, "off"
+        "pinning": False,          # закреплять захват/ASR/GUI и инференс за разными ядрами (auto - от 6 ядер)
+        "torch_intra_op": None,
+        "torch_inter_op": None,
+        "cpus": None,              # manual: {"gui": [0], "capture": [1], "asr": [2], "inference": [3, 4, 5]}
+    },
+    "advisor": {
+        "summary_fold_words": 120,  # сколько несвернутых слов запускает обновление резюме
+        "summary_max_words": 100,
+        "context_max_words": 600,   # предел дословных фраз в промпте: окно и еще не свернутые в резюме
+        "cache": {
+            "enabled": True,
+            "max_entries": 256,
+            "ttl": 3600,           # секунды
+            "path": None,          # файл для сохранения кеша между запусками
+        },
+    },
+}
+
+
+def _deep_merge(base, override):
+    """Рекурсивное слияние словарей настроек"""
+    result = copy.deepcopy(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(result.get(key), dict):
+            result[key] = _deep_merge(result[key], value)
+        else:
+            result[key] = value
+    return result
+
+
+def load_settings(path=None):
+    """
+    Загрузка настроек приложения
+    Значения из config/settings.json накладываются на значения по умолчанию
+    """
+    path = Path(path or os.environ.get(SETTINGS_ENV_VAR) or DEFAULT_SETTINGS_PATH)
+    if not path.exists():
+        return copy.deepcopy(DEFAULT_SETTINGS)
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            user_settings = json.load(f)
+    except Exception as e:
+        print(f"Ошибка чтения настроек {path}: {e}")
+        return copy.deepcopy(DEFAULT_SETTINGS)
+
+    return _deep_merge(DEFAULT_SETTINGS, user_settings)
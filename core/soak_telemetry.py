@@ -0,0 +1,180 @@
+import collections
+import contextlib
+import linecache
+import time
+import tracemalloc
+from pathlib import Path
+
+from core.perf_counters import process_rss
+
+
+# Телеметрия длительных прогонов (soak): через равные промежутки времени
+# сессии снимаются RSS, объем кучи Python (tracemalloc), размеры отслеживаемых
+# структур и перцентили задержек стадий за промежуток. По завершении для
+# каждого ряда считается наклон линейной регрессии в единицах на час сессии:
+# утечка или деградация видна как устойчивый положительный наклон, а не как
+# разовый скачок при прогреве
+
+ROOT = str(Path(__file__).resolve().parent.parent)
+
+# Допустимые наклоны по умолчанию (на час сессии)
+DEFAULT_LIMITS = {
+    'rss_mb': 20.0,
+    'heap_mb': 10.0,
+    'latency_ms': 5.0,
+}
+
+
+def linear_slope(xs, ys):
+    """Наклон прямой наименьших квадратов; None, если точек меньше двух"""
+    points = [(x, y) for x, y in zip(xs, ys) if y is not None]
+    if len(points) < 2:
+        return None
+    n = len(points)
+    mean_x = sum(x for x, _ in points) / n
+    mean_y = sum(y for _, y in points) / n
+    var_x = sum((x - mean_x) ** 2 for x, _ in points)
+    if var_x == 0:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / var_x
+
+
+class SoakMonitor:
+    """
+    Сбор рядов телеметрии по времени сессии
+    record_stage() - длительность стадии конвейера (секунды)
+    track() - функция, возвращающая размер структуры (элементы, символы)
+    sample() - точка рядов; вызывается по времени сессии, а не по часам
+    """
+
+    def __init__(self, trace_frames=5, top=10):
+        self.trace_frames = trace_frames
+        self.top = top
+        self.stage_samples = collections.defaultdict(list)
+        self.trackers = {}
+        self.timeline = []
+        self.started_at = None
+        self.baseline_snapshot = None
+        self.warm_snapshot = None
+
+    def start(self):
+        if self.trace_frames and not tracemalloc.is_tracing():
+            tracemalloc.start(self.trace_frames)
+        self.started_at = time.perf_counter()
+        self.baseline_snapshot = self._snapshot()
+
+    def stop(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def track(self, name, fn):
+        self.trackers[name] = fn
+
+    def record_stage(self, name, seconds):
+        self.stage_samples[name].append(seconds)
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Контекст замера стадии"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(name, time.perf_counter() - start)
+
+    def sample(self, session_seconds):
+        """Точка рядов на момент session_seconds от начала сессии"""
+        point = {
+            'session_hours': session_seconds / 3600,
+            'wall_seconds': time.perf_counter() - self.started_at,
+            'rss_mb': process_rss() / 2 ** 20,
+            'heap_mb': tracemalloc.get_traced_memory()[0] / 2 ** 20 if tracemalloc.is_tracing() else None,
+            'stages': {},
+            'sizes': {},
+        }
+        for name, samples in self.stage_samples.items():
+            if not samples:
+                continue
+            ordered = sorted(samples)
+            point['stages'][name] = {
+                'p50_ms': ordered[len(ordered) // 2] * 1000,
+                'p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+                'n': len(ordered),
+            }
+            samples.clear()
+        for name, fn in self.trackers.items():
+            try:
+                point['sizes'][name] = fn()
+            except Exception:
+                point['sizes'][name] = None
+        self.timeline.append(point)
+        return point
+
+    def mark_warm(self):
+        """Конец прогрева: рост кучи дальше сравнивается с этим снимком"""
+        self.warm_snapshot = self._snapshot()
+
+    def top_allocators(self):
+        """Места в коде с наибольшим ростом памяти после прогрева"""
+        reference = self.warm_snapshot or self.baseline_snapshot
+        current = self._snapshot()
+        if reference is None or current is None:
+            return []
+        stats = current.compare_to(reference, 'traceback')
+        growth = []
+        for stat in stats[:self.top]:
+            # Кадры от внешнего к внутреннему: место выделения - последний кадр,
+            # ближайший к нему кадр проекта указывает на владельца памяти
+            frame = stat.traceback[-1]
+            own = next((f for f in reversed(stat.traceback) if f.filename.startswith(ROOT)), frame)
+            growth.append({
+                'location': f"{frame.filename}:{frame.lineno}",
+                'line': linecache.getline(frame.filename, frame.lineno).strip(),
+                'project_location': f"{own.filename}:{own.lineno}",
+                'size_diff_kb': stat.size_diff / 1024,
+                'count_diff': stat.count_diff,
+                'traceback': [f"{f.filename}:{f.lineno}" for f in stat.traceback],
+            })
+        return growth
+
+    def slopes(self, warmup_fraction=0.1):
+        """
+        Наклоны рядов на час сессии без начального прогрева
+        Возвращает {ряд: наклон}: rss_mb, heap_mb, latency_ms.<стадия>, size.<структура>
+        """
+        skip = int(len(self.timeline) * warmup_fraction)
+        points = self.timeline[skip:]
+        xs = [p['session_hours'] for p in points]
+        result = {
+            'rss_mb': linear_slope(xs, [p['rss_mb'] for p in points]),
+            'heap_mb': linear_slope(xs, [p['heap_mb'] for p in points]),
+        }
+        stages = sorted({name for p in points for name in p['stages']})
+        for name in stages:
+            result[f'latency_ms.{name}'] = linear_slope(
+                xs, [p['stages'][name]['p50_ms'] if name in p['stages'] else None for p in points])
+        for name in self.trackers:
+            result[f'size.{name}'] = linear_slope(xs, [p['sizes'].get(name) for p in points])
+        return result
+
+    def check(self, slopes, limits=None):
+        """Нарушения допустимых наклонов: список (ряд, наклон, предел)"""
+        limits = dict(DEFAULT_LIMITS, **(limits or {}))
+        violations = []
+        for name, slope in slopes.items():
+            limit = limits.get(name)
+            if limit is None and name.startswith('latency_ms.'):
+                limit = limits.get('latency_ms')
+            if limit is not None and slope is not None and slope > limit:
+                violations.append((name, slope, limit))
+        return violations
+
+    def _snapshot(self):
+        if not tracemalloc.is_tracing():
+            return None
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, linecache.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+
@@ -0,0 +1,496 @@
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+
+from core import emotion_pipeline
+from core.advice_scheduler import AdviceTriggerScheduler
+from core.conversation_context import build_advice_messages
+from core.emotion_timeline import EmotionTimeline
+from core.prosody import ProsodicEstimator, TieredEmotionTracker
+from core.streaming_hubert import StreamingEmotionClassifier
+
+try:
+    from vosk import KaldiRecognizer, Model as VoskModel
+    VOSK_AVAILABLE = True
+except ImportError:
+    KaldiRecognizer = None
+    VoskModel = None
+    VOSK_AVAILABLE = False
+
+
+# Протокол WebSocket
+# Клиент -> сервер:
+#   {"type": "start", "sample_rate": 16000, "goal": "..."}   первое сообщение
+#   бинарные сообщения: PCM int16 little-endian, моно
+#   {"type": "goal", "goal": "..."}                           смена цели для советов
+#   {"type": "stop"}                                          завершение сессии
+# Сервер -> клиент (JSON):
+#   {"type": "ready", "session": id}
+#   {"type": "transcript", "final": bool, "text": ..., "audio_time": с}
+#   {"type": "emotion_provisional", "emotion": ..., "confidence": %, "probs": {...}, "audio_time": с, "latency": с}
+#       предварительная оценка по просодии каждые 100-250 мс (может отбрасываться)
+#   {"type": "emotion", "emotion": ..., "confidence": %, "probs": {...}, "audio_time": с, "latency": с,
+#    "provisional_agreed": bool | null}   подтвержденная оценка HuBERT
+#   {"type": "advice_delta", "text": ...} / {"type": "advice", "text": ..., "metrics": {...}}
+#   {"type": "stats", ..., "emotions": {"mean": {...}, "dominant": ...}} перед закрытием
+
+
+class InferenceBatcher:
+    """
+    Общий для всех сессий классификатор эмоций
+    Окна от разных сессий собираются в батч (до max_batch окон или max_wait секунд)
+    и классифицируются одним прямым проходом в пуле потоков
+    """
+
+    def __init__(self, model, feature_extractor, num2emotion, workers=1, max_batch=8, max_wait=0.01):
+        self.model = model
+        self.feature_extractor = feature_extractor
+        self.num2emotion = num2emotion
+        self.workers = workers
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inference")
+        self.queue = None
+        self.batches = 0
+        self.windows = 0
+
+    def start(self):
+        """Запуск обработчиков очереди в текущем цикле событий"""
+        self.queue = asyncio.Queue()
+        return [asyncio.ensure_future(self._run()) for _ in range(self.workers)]
+
+    async def classify(self, audio, sample_rate):
+        """Классификация окна, возвращает (эмоция, уверенность, вероятности)"""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put(((audio, sample_rate), future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                results = await loop.run_in_executor(self.executor, self._infer, [a for a, _ in batch])
+                for (_, future), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _infer(self, windows):
+        """Предобработка и прямой проход по батчу; окна разной длины группируются по длине"""
+        audios = []
+        for audio, sample_rate in windows:
+            audio = emotion_pipeline.normalize_audio(audio)
+            audio, _ = emotion_pipeline.resample_audio(audio, sample_rate)
+            audios.append(audio)
+
+        results = [None] * len(audios)
+        groups = {}
+        for i, audio in enumerate(audios):
+            groups.setdefault(len(audio), []).append(i)
+
+        for indices in groups.values():
+            input_values = torch.cat([
+                emotion_pipeline.extract_input_values(self.feature_extractor, audios[i]) for i in indices
+            ])
+            with torch.no_grad():
+                logits = self.model(input_values).logits
+            for row, i in enumerate(indices):
+                results[i] = emotion_pipeline.interpret_logits(logits[row:row + 1], self.num2emotion)
+
+        self.batches += 1
+        self.windows += len(audios)
+        return results
+
+
+class StreamSession:
+    """
+    Сессия одного клиента: ASR Vosk + окна эмоций + советы ИИ
+    Обратное давление: входящие блоки идут через ограниченную очередь; когда она
+    заполнена, чтение из сокета приостанавливается и клиент упирается в окно TCP.
+    Если классификация предыдущего окна еще не завершена, новое окно пропускается
+    """
+
+    def __init__(self, server, websocket, session_id):
+        self.server = server
+        self.websocket = websocket
+        self.session_id = session_id
+        self.sample_rate = 16000
+        self.inbound = asyncio.Queue(maxsize=server.inbound_chunks)
+        self.outbound = asyncio.Queue()
+        self.recognizer = None
+        self.goal = ""
+        self.history = []
+        self.emotion = "нейтральная"
+        self.emotion_task = None
+        self.stream_classifier = None
+        self.stream_audio = []
+        self.prosody = None
+        self.prosody_task = None
+        self.prosody_targets = []
+        self.prosody_skipped = []
+        self.tiers = TieredEmotionTracker(server.window_seconds)
+        # Ряд вероятностей по времени аудио: доминирующая эмоция за окно без пересчета истории
+        self.timeline = EmotionTimeline(server.batcher.num2emotion.values())
+        self.advice_scheduler = AdviceTriggerScheduler()
+        self.stats = {
+            'chunks': 0, 'samples': 0, 'windows': 0, 'windows_skipped': 0,
+            'partials_dropped': 0, 'inbound_full': 0, 'inbound_max': 0, 'advice': 0, 'provisional': 0, 'provisional_skipped': 0
+        }
+
+    def emit(self, event, droppable=False):
+        """Постановка события в очередь отправки; промежуточные события можно отбросить"""
+        if droppable and self.outbound.qsize() >= self.server.outbound_limit:
+            self.stats['partials_dropped'] += 1
+            return
+        self.outbound.put_nowait(event)
+
+    async def run(self):
+        start = json.loads(await asyncio.wait_for(self.websocket.recv(), timeout=10))
+        if start.get('type') != 'start':
+            raise ValueError("Первое сообщение должно иметь тип start")
+
+        self.sample_rate = int(start.get('sample_rate', 16000))
+        self.goal = start.get('goal', "")
+        self.window_samples = int(self.server.window_seconds * self.sample_rate)
+        self.hop_samples = int(self.server.hop_seconds * self.sample_rate)
+        self.window = np.zeros(self.window_samples, dtype=np.float32)
+        self.since_window = 0
+
+        # Потоковый энкодер: кадры перекрывающихся окон не пересчитываются
+        batcher = self.server.batcher
+        if self.server.streaming_encoder and self.sample_rate == emotion_pipeline.TARGET_SAMPLE_RATE \
+                and hasattr(batcher.model, 'hubert'):
+            self.stream_classifier = StreamingEmotionClassifier(
+                batcher.model, batcher.num2emotion, self.server.window_seconds,
+                normalize=batcher.feature_extractor.do_normalize
+            )
+
+        # Предварительные оценки по просодии на блоках prosody_chunk_seconds
+        if self.server.prosody_chunk_seconds:
+            self.prosody = ProsodicEstimator(batcher.num2emotion, self.sample_rate,
+                                             learning_rate=self.server.prosody_learning_rate)
+            self.prosody_chunk = np.zeros(int(self.server.prosody_chunk_seconds * self.sample_rate), dtype=np.float32)
+            self.prosody_filled = 0
+
+        if self.server.vosk_model is not None:
+            self.recognizer = KaldiRecognizer(self.server.vosk_model, self.sample_rate)
+            self.recognizer.SetWords(True)
+
+        self.emit({'type': 'ready', 'session': self.session_id})
+        sender = asyncio.ensure_future(self._send_loop())
+        processor = asyncio.ensure_future(self._process_loop())
+        try:
+            await self._receive_loop()
+            await self.inbound.put(None)
+            await processor
+            if self.emotion_task is not None:
+                await self.emotion_task
+        finally:
+            processor.cancel()
+            for task in (self.emotion_task, self.prosody_task):
+                if task is not None:
+                    task.cancel()
+            dominant = self.timeline.dominant()
+            self.emit({'type': 'stats', **self.stats, 'tiers': self.tiers.stats(),
+                       'emotions': {'mean': self.timeline.mean(), 'dominant': dominant[0] if dominant else None}})
+            self.outbound.put_nowait(None)
+            await sender
+
+    async def _receive_loop(self):
+        async for message in self.websocket:
+            if isinstance(message, bytes):
+                if self.inbound.full():
+                    self.stats['inbound_full'] += 1
+                # Ожидание свободного места и есть обратное давление на клиента
+                await self.inbound.put((message, time.monotonic()))
+                # Наибольшая глубина входящей очереди за сессию
+                self.stats['inbound_max'] = max(self.stats['inbound_max'], self.inbound.qsize())
+                continue
+
+            control = json.loads(message)
+            if control.get('type') == 'stop':
+                return
+            if control.get('type') == 'goal':
+                self.goal = control.get('goal', "")
+                self.advice_scheduler.reset()
+
+    async def _send_loop(self):
+        while True:
+            event = await self.outbound.get()
+            if event is None:
+                return
+            try:
+                await self.websocket.send(json.dumps(event, ensure_ascii=False))
+            except Exception:
+                return
+
+    async def _process_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self.inbound.get()
+            if item is None:
+                if self.recognizer is not None:
+                    final = json.loads(await loop.run_in_executor(
+                        self.server.asr_executor, self.recognizer.FinalResult))
+                    self._on_final_text(final.get('text', ""))
+                return
+
+            data, arrived = item
+            pcm = np.frombuffer(data, dtype=np.int16)
+            self.stats['chunks'] += 1
+            self.stats['samples'] += len(pcm)
+
+            if self.recognizer is not None:
+                await self._accept_asr(data)
+            self._push_audio(pcm, arrived)
+
+    async def _accept_asr(self, data):
+        loop = asyncio.get_running_loop()
+        is_final = await loop.run_in_executor(self.server.asr_executor, self.recognizer.AcceptWaveform, data)
+        audio_time = self.stats['samples'] / self.sample_rate
+        if is_final:
+            result = json.loads(self.recognizer.Result())
+            self._on_final_text(result.get('text', ""), audio_time)
+        else:
+            partial = json.loads(self.recognizer.PartialResult()).get('partial', "")
+            if partial:
+                self.emit({'type': 'transcript', 'final': False, 'text': partial,
+                           'audio_time': audio_time}, droppable=True)
+
+    def _push_audio(self, pcm, arrived):
+        """Сдвиг окна эмоций и запуск классификации каждые hop секунд"""
+        samples = pcm.astype(np.float32) / 32768.0
+        if self.stream_classifier is not None:
+            self.stream_audio.append(samples)
+        if self.prosody is not None:
+            self._push_prosody(samples, arrived)
+        n = len(samples)
+        if n >= self.window_samples:
+            self.window[:] = samples[-self.window_samples:]
+        else:
+            self.window[:-n] = self.window[n:]
+            self.window[-n:] = samples
+        self.since_window += n
+
+        if self.stats['samples'] < self.window_samples or self.since_window < self.hop_samples:
+            return
+        self.since_window = 0
+
+        if self.emotion_task is not None and not self.emotion_task.done():
+            self.stats['windows_skipped'] += 1
+            return
+        audio_time = self.stats['samples'] / self.sample_rate
+        if self.stream_classifier is not None:
+            # Кодировщику передается только аудио, пришедшее после прошлого окна
+            window = np.concatenate(self.stream_audio)
+            self.stream_audio = []
+        else:
+            window = self.window.copy()
+        self.emotion_task = asyncio.ensure_future(self._classify(window, audio_time, arrived))
+
+    def _push_prosody(self, samples, arrived):
+        """Накопление блока для просодии; полный блок оценивается в пуле потоков ASR"""
+        chunk = self.prosody_chunk
+        position = 0
+        while position < len(samples):
+            n = min(len(chunk) - self.prosody_filled, len(samples) - position)
+            chunk[self.prosody_filled:self.prosody_filled + n] = samples[position:position + n]
+            self.prosody_filled += n
+            position += n
+            if self.prosody_filled < len(chunk):
+                return
+            self.prosody_filled = 0
+            if self.prosody_task is not None and not self.prosody_task.done():
+                # Оценка предыдущего блока еще идет - этот блок только учитывается во времени;
+                # сдвиг применяется в _prosody_step, где живет состояние оценщика
+                self.prosody_skipped.append(len(chunk) / self.sample_rate)
+                self.stats['provisional_skipped'] += 1
+                continue
+            audio_time = (self.stats['samples'] - (len(samples) - position)) / self.sample_rate
+            self.prosody_task = asyncio.ensure_future(self._estimate_prosody(chunk.copy(), audio_time, arrived))
+
+    async def _estimate_prosody(self, chunk, audio_time, arrived):
+        result = await asyncio.get_running_loop().run_in_executor(
+            self.server.asr_executor, self._prosody_step, chunk)
+        if result is None:
+            return
+        self.tiers.provisional(result, audio_time)
+        self.stats['provisional'] += 1
+        emotion, confidence, probs = result
+        self.emit({
+            'type': 'emotion_provisional',
+            'emotion': emotion,
+            'confidence': confidence,
+            'probs': probs,
+            'audio_time': audio_time,
+            'latency': time.monotonic() - arrived
+        }, droppable=True)
+
+    def _prosody_step(self, chunk):
+        # Оценка и дообучение идут в одном потоке задачи: состояние модели не делится
+        targets, self.prosody_targets = self.prosody_targets, []
+        skipped, self.prosody_skipped = self.prosody_skipped, []
+        self.prosody.audio_time += sum(skipped)
+        for probs, audio_time in targets:
+            self.prosody.learn(probs, self.server.window_seconds, audio_time)
+        return self.prosody.push(chunk)
+
+    async def _classify(self, window, audio_time, arrived):
+        try:
+            if self.stream_classifier is not None:
+                emotion, confidence, probs = await asyncio.get_running_loop().run_in_executor(
+                    self.server.batcher.executor, self._classify_streaming, window)
+            else:
+                emotion, confidence, probs = await self.server.batcher.classify(window, self.sample_rate)
+        except Exception as e:
+            self.emit({'type': 'error', 'message': f"Ошибка классификации: {e}"})
+            return
+
+        self.emotion = emotion
+        self.stats['windows'] += 1
+        self.timeline.add(probs, audio_time)
+        tier = self.tiers.confirm((emotion, confidence, probs), audio_time)
+        if self.prosody is not None:
+            self.prosody_targets.append((probs, audio_time))
+        self.emit({
+            'type': 'emotion',
+            'emotion': emotion,
+            'confidence': confidence,
+            'probs': probs,
+            'audio_time': audio_time,
+            'latency': time.monotonic() - arrived,
+            'provisional_agreed': tier[0] if tier else None
+        })
+
+    def _classify_streaming(self, new_audio):
+        self.stream_classifier.push(new_audio)
+        return self.stream_classifier.classify()
+
+    def _on_final_text(self, text, audio_time=None):
+        if not text:
+            return
+        self.emit({'type': 'transcript', 'final': True, 'text': text,
+                   'audio_time': audio_time if audio_time is not None else self.stats['samples'] / self.sample_rate})
+        self.history.append({'text': text, 'emotion': self.emotion, 'timestamp': time.time()})
+
+        if self.server.advisor_client is None or not self.goal:
+            return
+        self.advice_scheduler.add_words(len(text.split()))
+        if self.advice_scheduler.check_trigger(self.emotion):
+            # В подсказку - доминирующая эмоция за последние минуты, а не последнего окна
+            dominant = self.timeline.dominant(self.server.recent_seconds)
+            messages = build_advice_messages(
+                self.goal, self.history, "", 0, self.server.advice_window_words, 0,
+                dominant[0] if dominant else self.emotion, self.timeline.describe(self.server.recent_seconds))
+            key = self.advice_scheduler.context_key(messages)
+            if not self.advice_scheduler.is_duplicate(key):
+                self.stats['advice'] += 1
+                job_id = self.stats['advice']
+                self.advice_scheduler.mark_sent(job_id, key, self.emotion)
+                asyncio.ensure_future(self._advise(job_id, messages))
+
+    async def _advise(self, job_id, messages):
+        loop = asyncio.get_running_loop()
+        parts = []
+
+        def on_chunk(content):
+            parts.append(content)
+            loop.call_soon_threadsafe(self.emit, {'type': 'advice_delta', 'text': content}, True)
+
+        try:
+            # Импорт здесь: без советника сервер работает и без пакета ollama
+            from core.llm_client import generate_advice
+            metrics = await loop.run_in_executor(
+                self.server.advisor_executor,
+                lambda: generate_advice(self.server.advisor_client, messages, on_chunk)
+            )
+            self.emit({'type': 'advice', 'text': "".join(parts), 'metrics': metrics})
+        except Exception as e:
+            self.emit({'type': 'error', 'message': f"Ошибка получения совета: {e}"})
+        finally:
+            self.advice_scheduler.mark_done(job_id)
+
+
+class StreamingAnalysisServer:
+    """
+    Headless-сервер потокового анализа
+    Модели HuBERT и Vosk загружаются один раз и разделяются всеми сессиями
+    """
+
+    def __init__(self, model, feature_extractor, num2emotion=None, vosk_model=None,
+                 advisor_client=None, host="0.0.0.0", port=8765, window_seconds=3.0,
+                 hop_seconds=1.0, inference_workers=1, max_batch=8, max_wait=0.01,
+                 asr_workers=None, inbound_chunks=32, outbound_limit=64, advice_window_words=50,
+                 streaming_encoder=False, prosody_chunk_seconds=0.2, prosody_learning_rate=0.05,
+                 recent_seconds=300):
+        self.host = host
+        self.port = port
+        self.window_seconds = window_seconds
+        self.hop_seconds = hop_seconds
+        self.vosk_model = vosk_model
+        self.advisor_client = advisor_client
+        self.inbound_chunks = inbound_chunks
+        self.outbound_limit = outbound_limit
+        self.advice_window_words = advice_window_words
+        self.streaming_encoder = streaming_encoder
+        self.prosody_chunk_seconds = prosody_chunk_seconds
+        self.prosody_learning_rate = prosody_learning_rate
+        self.recent_seconds = recent_seconds
+        self.batcher = InferenceBatcher(
+            model, feature_extractor, num2emotion or emotion_pipeline.NUM2EMOTION,
+            workers=inference_workers, max_batch=max_batch, max_wait=max_wait
+        )
+        self.asr_executor = ThreadPoolExecutor(
+            max_workers=asr_workers or os.cpu_count() or 1, thread_name_prefix="asr")
+        self.advisor_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="advisor")
+        self.sessions = {}
+        self._next_id = 1
+
+    async def handle(self, websocket, path=None):
+        session_id = self._next_id
+        self._next_id += 1
+        session = StreamSession(self, websocket, session_id)
+        self.sessions[session_id] = session
+        try:
+            await session.run()
+        except Exception as e:
+            print(f"Сессия {session_id} завершена с ошибкой: {e}")
+        finally:
+            del self.sessions[session_id]
+
+    async def serve_forever(self):
+        import websockets
+
+        self.batcher.start()
+        # max_queue ограничивает буфер сообщений внутри websockets, чтобы
+        # обратное давление доходило до TCP, а не копилось в памяти
+        async with websockets.serve(self.handle, self.host, self.port, max_size=2 ** 20, max_queue=4):
+            print(f"Сервер анализа слушает ws://{self.host}:{self.port}")
+            await asyncio.Future()
+
+
+def load_vosk_model(path):
+    """Загрузка модели Vosk (None, если Vosk или модель недоступны)"""
+    if not VOSK_AVAILABLE or not path or not os.path.isdir(path):
+        print(f"Модель Vosk не найдена ({path}), транскрипция отключена")
+        return None
+    return VoskModel(path)
@@ -0,0 +1,190 @@
+import threading
+import time
+
+import numpy as np
+import torch
+
+from core import emotion_pipeline
+
+
+# Потоковый режим классификатора HuBERT для перекрывающихся окон
+# Сверточный энкодер признаков локален: кадр k зависит только от семплов
+# [k * stride, k * stride + receptive_field). Поэтому кадры, посчитанные для
+# предыдущих окон, переиспользуются из кольцевого буфера, энкодер обрабатывает
+# только новое аудио, а трансформер и голова классификации работают на
+# собранной последовательности кадров окна
+
+_local = threading.local()
+
+
+def _feature_encoder_hook(module, args, output):
+    # Подмена выхода энкодера кешированными кадрами только в потоке,
+    # который сейчас выполняет потоковую классификацию
+    features = getattr(_local, 'features', None)
+    if features is not None:
+        return features
+    return output
+
+
+def conv_geometry(config):
+    """(рецептивное поле, шаг) сверточного энкодера в семплах"""
+    receptive_field = 1
+    stride = 1
+    for kernel, conv_stride in zip(config.conv_kernel, config.conv_stride):
+        receptive_field += (kernel - 1) * stride
+        stride *= conv_stride
+    return receptive_field, stride
+
+
+class StreamingEmotionClassifier:
+    """
+    Классификация эмоций потока с кешированием кадров сверточного энкодера
+    push() принимает новые семплы 16 кГц, classify() оценивает последние window_seconds
+    Нормализация входа (do_normalize экстрактора) считается по скользящей
+    статистике потока, а не по окну, поэтому результат приближенный - точность
+    проверяется validate_streaming()
+    """
+
+    def __init__(self, model, num2emotion=None, window_seconds=3.0, normalize=True,
+                 sample_rate=emotion_pipeline.TARGET_SAMPLE_RATE):
+        if not hasattr(model, 'hubert'):
+            raise ValueError("Потоковый режим требует HubertForSequenceClassification в процессе")
+        if model.config.feat_extract_norm == "group":
+            print("Предупреждение: GroupNorm в энкодере зависит от всего окна, кеш кадров приближенный")
+
+        self.model = model
+        self.num2emotion = num2emotion or emotion_pipeline.NUM2EMOTION
+        self.normalize = normalize
+        self.sample_rate = sample_rate
+        self.window_samples = int(window_seconds * sample_rate)
+        self.receptive_field, self.stride = conv_geometry(model.config)
+        self.window_frames = (self.window_samples - self.receptive_field) // self.stride + 1
+        self.channels = model.config.conv_dim[-1]
+
+        if not getattr(model, '_streaming_hook', None):
+            model._streaming_hook = model.hubert.feature_extractor.register_forward_hook(_feature_encoder_hook)
+        self.reset()
+
+    def reset(self):
+        """Начало нового потока"""
+        self.ring = torch.zeros(self.channels, self.window_frames)
+        self.frames = 0
+        self.pending = np.zeros(0, dtype=np.float32)
+        self.mean = None
+        self.var = None
+        self.frames_encoded = 0
+        self.windows = 0
+
+    def push(self, audio):
+        """Кодирование нового аудио; возвращает число новых кадров"""
+        audio = np.asarray(audio, dtype=np.float32)
+        if len(audio) == 0:
+            return 0
+        if self.normalize:
+            audio = self._normalize(audio)
+        self.pending = np.concatenate([self.pending, audio])
+        if len(self.pending) < self.receptive_field:
+            return 0
+
+        n_new = (len(self.pending) - self.receptive_field) // self.stride + 1
+        length = self.stride * (n_new - 1) + self.receptive_field
+        with torch.no_grad():
+            features = self.model.hubert.feature_extractor(torch.from_numpy(self.pending[:length])[None])[0]
+        self.pending = self.pending[self.stride * n_new:]
+        self._write(features[:, -self.window_frames:])
+        self.frames_encoded += n_new
+        return n_new
+
+    def classify(self):
+        """Эмоция последнего окна: (эмоция, уверенность %, вероятности %) или None, пока окно не заполнено"""
+        if self.frames < self.window_frames:
+            return None
+
+        features = self._read()[None]
+        _local.features = features
+        try:
+            with torch.no_grad():
+                # Вход-заглушка длиной в один кадр: выход энкодера подменяется хуком
+                logits = self.model(torch.zeros(1, self.receptive_field)).logits
+        finally:
+            _local.features = None
+
+        self.windows += 1
+        return emotion_pipeline.interpret_logits(logits, self.num2emotion)
+
+    def savings(self):
+        """Доля кадров окон, не пересчитанных энкодером"""
+        total = self.windows * self.window_frames
+        return max(0.0, 1.0 - self.frames_encoded / total) if total else 0.0
+
+    def _normalize(self, audio):
+        # Скользящее среднее и дисперсия с постоянной времени в одно окно
+        alpha = min(1.0, len(audio) / self.window_samples)
+        mean, var = float(audio.mean()), float(audio.var())
+        if self.mean is None:
+            self.mean, self.var = mean, var
+        else:
+            self.mean += alpha * (mean - self.mean)
+            self.var += alpha * (var - self.var)
+        return ((audio - self.mean) / np.sqrt(self.var + 1e-7)).astype(np.float32)
+
+    def _write(self, features):
+        n = features.shape[1]
+        start = self.frames % self.window_frames
+        first = min(n, self.window_frames - start)
+        self.ring[:, start:start + first] = features[:, :first]
+        if first < n:
+            self.ring[:, :n - first] = features[:, first:]
+        self.frames += n
+
+    def _read(self):
+        start = self.frames % self.window_frames
+        return torch.cat([self.ring[:, start:], self.ring[:, :start]], dim=1)
+
+
+def validate_streaming(model, feature_extractor, audio, num2emotion=None, window_seconds=3.0,
+                       hop_seconds=1.0, sample_rate=emotion_pipeline.TARGET_SAMPLE_RATE):
+    """
+    Сравнение потокового режима с полным пересчетом каждого окна
+    Возвращает отчет: совпадение предсказаний, расхождение вероятностей и время на окно
+    """
+    num2emotion = num2emotion or emotion_pipeline.NUM2EMOTION
+    streaming = StreamingEmotionClassifier(model, num2emotion, window_seconds,
+                                           normalize=feature_extractor.do_normalize)
+    window = int(window_seconds * sample_rate)
+    hop = int(hop_seconds * sample_rate)
+
+    agree = 0
+    prob_diffs = []
+    full_times = []
+    stream_times = []
+    position = 0
+    for end in range(window, len(audio) + 1, hop):
+        start = time.perf_counter()
+        streaming.push(audio[position:end])
+        stream_result = streaming.classify()
+        stream_times.append(time.perf_counter() - start)
+        position = end
+
+        start = time.perf_counter()
+        segment = emotion_pipeline.normalize_audio(audio[end - window:end])
+        full_result = emotion_pipeline.analyze_audio(model, feature_extractor, segment, num2emotion)
+        full_times.append(time.perf_counter() - start)
+
+        agree += stream_result[0] == full_result[0]
+        prob_diffs.append(max(abs(stream_result[2][e] - full_result[2][e]) for e in full_result[2]))
+
+    # Первое окно кодируется целиком, поэтому в среднее времени не входит
+    full_time = float(np.mean(full_times[1:] or full_times))
+    stream_time = float(np.mean(stream_times[1:] or stream_times))
+    return {
+        'windows': len(prob_diffs),
+        'agreement': agree / len(prob_diffs) if prob_diffs else None,
+        'max_prob_diff': max(prob_diffs, default=None),
+        'mean_prob_diff': float(np.mean(prob_diffs)) if prob_diffs else None,
+        'frames_per_window': streaming.window_frames,
+        'encoder_savings': streaming.savings(),
+        'full_time_per_window': full_time,
+        'streaming_time_per_window': stream_time,
+        'time_savings': 1.0 - stream_time / full_time if full_time else None,
+    }
@@ -0,0 +1,189 @@
+import functools
+import os
+import threading
+
+
+# Роли потоков приложения
+ROLES = ('gui', 'capture', 'asr', 'inference')
+
+# Переменные окружения, которыми OpenMP/BLAS (torch, numpy, Kaldi внутри Vosk)
+# определяют число потоков. Действуют только до загрузки библиотек
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS')
+
+# Закрепление выполняется один раз на поток: флаг в локальном хранилище
+# потока, а не по идентификатору (идентификаторы завершившихся потоков переиспользуются)
+_pinned = threading.local()
+_active_budget = None
+
+# Закрепление в режиме auto - только от 6 ядер: GUI, захват и ASR получают по
+# своему ядру, инференсу остается не меньше трех. На 3-5 ядрах легкие роли
+# делили бы ядро (на 4 ядрах ASR попадал бы на ядро GUI), поэтому потоки там
+# не закрепляются, ограничивается только число потоков torch
+PINNING_MIN_CPUS = 6
+
+
+def available_cpus():
+    """Процессоры, доступные процессу"""
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(os.cpu_count() or 1))
+
+
+def plan_thread_budget(settings=None, cpus=None):
+    """
+    Расчет бюджета потоков
+    settings - секция "threads" настроек:
+      mode: "auto" | "manual" | "off"
+      pinning: закреплять ли потоки за ядрами
+      torch_intra_op, torch_inter_op: явные значения (manual)
+      cpus: {"gui": [...], "capture": [...], "asr": [...], "inference": [...]} (manual)
+    Возвращает словарь бюджета или None для mode="off"
+    """
+    settings = settings or {}
+    mode = settings.get('mode', 'auto')
+    if mode == 'off':
+        return None
+
+    cpus = list(cpus) if cpus is not None else available_cpus()
+    n = len(cpus)
+
+    if mode == 'manual' and settings.get('cpus'):
+        role_cpus = {role: list(settings['cpus'].get(role) or cpus) for role in ROLES}
+    elif n <= 2:
+        # На двух ядрах изоляция невозможна, ограничиваем только torch
+        role_cpus = {role: cpus for role in ROLES}
+    else:
+        # Захват, GUI и ASR делят "легкие" ядра, остальное отдается HuBERT:
+        # 3 ядра -> 1 легкое, 4 -> 2, 6 и больше -> 3 (по ядру на роль)
+        reserved = min(3, n // 2)
+        light = cpus[:reserved]
+        role_cpus = {
+            'gui': [light[0]],
+            'capture': [light[1 % reserved]],
+            'asr': [light[2 % reserved]],
+            'inference': cpus[reserved:],
+        }
+
+    intra = settings.get('torch_intra_op') or (len(role_cpus['inference']) if n > 2 else 1)
+    # Ручная раскладка ядер закрепляется как задана, автоматическая - от PINNING_MIN_CPUS
+    manual_cpus = mode == 'manual' and bool(settings.get('cpus'))
+    return {
+        'mode': mode,
+        'pinning': bool(settings.get('pinning', False)) and (n >= PINNING_MIN_CPUS or manual_cpus),
+        'cpus': role_cpus,
+        'torch_intra_op': intra,
+        'torch_inter_op': settings.get('torch_inter_op') or 1,
+    }
+
+
+def apply_thread_environment(settings=None):
+    """
+    Ограничение потоков OpenMP/BLAS через окружение
+    Вызывается до импорта numpy, torch и Vosk; уже заданные переменные не меняются
+    """
+    budget = plan_thread_budget(settings)
+    if budget is None:
+        return None
+    # Vosk/Kaldi использует тот же BLAS, что и torch: отдельного числа потоков
+    # для распознавателя нет, декодирование идет в вызывающем потоке
+    threads = str(budget['torch_intra_op'])
+    for var in THREAD_ENV_VARS:
+        os.environ.setdefault(var, threads)
+    return budget
+
+
+def apply_thread_budget(settings=None):
+    """
+    Применение бюджета при старте: потоки torch и закрепление GUI-потока
+    Вызывается из главного потока до загрузки моделей
+    """
+    global _active_budget
+    budget = plan_thread_budget(settings)
+    _active_budget = budget
+    if budget is None:
+        return None
+
+    try:
+        import torch
+        torch.set_num_threads(budget['torch_intra_op'])
+        try:
+            torch.set_num_interop_threads(budget['torch_inter_op'])
+        except RuntimeError:
+            # Пул inter-op уже создан (повторный вызов) - оставляем как есть
+            pass
+    except ImportError:
+        pass
+
+    if budget['pinning']:
+        # GUI-поток получает свое ядро. Созданные из него потоки наследуют эту
+        # маску, поэтому потоки ролей закрепляются сами при первом вызове:
+        # колбэк захвата, распознаватель Vosk, прямые проходы модели, очередь
+        # файлов и транскрипция
+        pin_current_thread('gui')
+
+    skipped = (settings or {}).get('pinning') and not budget['pinning']
+    print(f"Бюджет потоков: torch {budget['torch_intra_op']}/{budget['torch_inter_op']}, "
+          f"закрепление: {'да' if budget['pinning'] else 'нет'}"
+          f"{f' (нужно не меньше {PINNING_MIN_CPUS} ядер или ручная раскладка cpus)' if skipped else ''}")
+    return budget
+
+
+def pin_current_thread(role):
+    """
+    Закрепление вызывающего потока за ядрами его роли
+    Выполняется один раз на поток; без активного бюджета ничего не делает
+    """
+    budget = _active_budget
+    if budget is None or not budget['pinning'] or getattr(_pinned, 'role', None):
+        return False
+    _pinned.role = role
+    return _set_affinity(budget['cpus'][role])
+
+
+def role_cpus(role):
+    """Ядра роли при включенном закреплении, иначе None (для дочерних процессов)"""
+    budget = _active_budget
+    if budget is None or not budget['pinning']:
+        return None
+    return list(budget['cpus'][role])
+
+
+def pin_calls(obj, method, role):
+    """
+    Закрепление потока, вызывающего метод объекта, при первом вызове
+    (например, AcceptWaveform распознавателя Vosk в потоке аудио процессора)
+    """
+    if _active_budget is None or not _active_budget['pinning']:
+        return obj
+    func = getattr(obj, method)
+
+    @functools.wraps(func)
+    def pinned(*args, **kwargs):
+        pin_current_thread(role)
+        return func(*args, **kwargs)
+
+    setattr(obj, method, pinned)
+    return obj
+
+
+def pin_model_threads(model, role='inference'):
+    """Закрепление потоков, вызывающих модель, при первом прямом проходе в каждом из них"""
+    if _active_budget is None or not _active_budget['pinning']:
+        return model
+
+    def pin_hook(module, args):
+        pin_current_thread(role)
+
+    model._thread_pin_hook = model.register_forward_pre_hook(pin_hook)
+    return model
+
+
+def _set_affinity(cpus):
+    # На Linux pid 0 означает вызывающий поток, а не весь процесс
+    try:
+        os.sched_setaffinity(0, cpus)
+        return True
+    except (AttributeError, OSError) as e:
+        print(f"Не удалось закрепить поток за ядрами {cpus}: {e}")
+        return False
@@ -0,0 +1,56 @@
+import threading
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from core.file_transcription import TranscriptionCancelled, transcribe_file
+from core.thread_budget import pin_current_thread
+
+
+class FileTranscriptionWorker(QThread):
+    """
+    Фоновая транскрипция файла с эмоциями фраз; результат отдается сигналом
+    cancel() завершает процессы пула; после отмены сигналы результата не отправляются
+    """
+
+    progress = pyqtSignal(int, int)
+    finished_ok = pyqtSignal(dict)
+    failed = pyqtSignal(str)
+
+    def __init__(self, path, vosk_model_path, model=None, feature_extractor=None, num2emotion=None,
+                 workers=None, chunk_seconds=60.0, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.vosk_model_path = vosk_model_path
+        self.model = model
+        self.feature_extractor = feature_extractor
+        self.num2emotion = num2emotion
+        self.workers = workers
+        self.chunk_seconds = chunk_seconds
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def run(self):
+        # Процессы пула наследуют маску потока, который их создает
+        pin_current_thread('inference')
+        try:
+            result = transcribe_file(
+                self.path,
+                self.vosk_model_path,
+                emotion_model=self.model,
+                feature_extractor=self.feature_extractor,
+                num2emotion=self.num2emotion,
+                workers=self.workers,
+                chunk_seconds=self.chunk_seconds,
+                on_progress=self.progress.emit,
+                cancel_event=self._cancel
+            )
+        except TranscriptionCancelled:
+            return
+        except Exception as e:
+            if not self._cancel.is_set():
+                self.failed.emit(str(e))
+            return
+        if not self._cancel.is_set():
+            self.finished_ok.emit(result)
@@ -0,0 +1,271 @@
+import os
+import queue
+import threading
+import types
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+
+import numpy as np
+import torch
+import torch.multiprocessing
+
+from core import emotion_pipeline
+from core.thread_budget import role_cpus
+
+
+# Пул процессов инференса HuBERT
+# - Процессы запускаются через forkserver (spawn, где его нет), а не fork от
+#   окна приложения: к моменту создания пула родитель мог уже выполнять прямые
+#   проходы (замер моделей реестра), и fork унаследовал бы запущенные пулы
+#   потоков OpenMP/MKL, на которых дочерний процесс может зависнуть
+# - Веса переносятся в общую память (model.share_memory), и процессу передаются
+#   класс, конфигурация и state_dict: тензоры сериализуются дескрипторами без
+#   копирования. Модель с загрузчиком (_pool_loader, задает реестр моделей:
+#   веса из кеша safetensors через mmap, int8, ONNX) процесс загружает сам.
+#   В RAM одна копия весов на все процессы
+# - Окна (input_values) и логиты передаются через кольца слотов в общей памяти,
+#   по очередям идут только номера слотов и длины
+# - PooledModel повторяет интерфейс модели, так что окно приложения, сервер и
+#   бенчмарки используют пул без изменений кода вызова
+
+MAX_WINDOW_SAMPLES = emotion_pipeline.TARGET_SAMPLE_RATE * emotion_pipeline.MAX_INPUT_SECONDS
+
+
+class ModelWorkerPool:
+    """
+    Пул процессов, выполняющих прямой проход модели
+    workers - число процессов; threads_per_worker - потоки torch в каждом
+    slots - емкость кольца; когда все слоты заняты, infer ждет освобождения
+    max_batch - сколько окон процесс забирает из очереди за один прямой проход
+    """
+
+    def __init__(self, model, workers=2, slots=None, max_batch=4, threads_per_worker=None,
+                 max_samples=MAX_WINDOW_SAMPLES):
+        self.workers = workers
+        self.slots = slots or workers * 4
+        self.max_samples = max_samples
+        self.num_labels = model.config.num_labels
+        threads = threads_per_worker or max(1, torch.get_num_threads() // workers)
+
+        self._input_shm = shared_memory.SharedMemory(create=True, size=self.slots * max_samples * 4)
+        self._output_shm = shared_memory.SharedMemory(create=True, size=self.slots * self.num_labels * 4)
+        self._inputs = np.ndarray((self.slots, max_samples), dtype=np.float32, buffer=self._input_shm.buf)
+        self._outputs = np.ndarray((self.slots, self.num_labels), dtype=np.float32, buffer=self._output_shm.buf)
+
+        self._free = queue.Queue()
+        for slot in range(self.slots):
+            self._free.put(slot)
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._closed = False
+
+        # Модель целиком не сериализуется (weight_norm свертки позиций HuBERT),
+        # поэтому процесс собирает ее из конфигурации и state_dict в общей памяти
+        source = getattr(model, '_pool_loader', None)
+        if source is None:
+            model.share_memory()
+            source = (_build_model, (type(model), model.config, model.state_dict()))
+        methods = torch.multiprocessing.get_all_start_methods()
+        context = torch.multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+        self._tasks = context.Queue()
+        self._results = context.Queue()
+        self._processes = []
+        try:
+            for index in range(workers):
+                process = context.Process(
+                    target=_worker_main,
+                    args=(source, self._input_shm.name, self._output_shm.name, (self.slots, max_samples),
+                          self._tasks, self._results, max_batch, threads, role_cpus('inference')),
+                    name=f"inference-{index}",
+                    daemon=True
+                )
+                process.start()
+                self._processes.append(process)
+        except Exception:
+            # Например, модель не сериализуется (ONNX): общая память освобождается
+            for process in self._processes:
+                process.terminate()
+            self._release_memory()
+            raise
+
+        self._collector = threading.Thread(target=self._collect, name="pool-results", daemon=True)
+        self._collector.start()
+        print(f"Пул инференса: {workers} процессов по {threads} потоков, {self.slots} слотов")
+
+    def infer(self, input_values, timeout=None):
+        """Логиты для тензора input_values формы [окна, семплы]"""
+        if self._closed:
+            raise RuntimeError("Пул инференса остановлен")
+        if input_values.shape[1] > self.max_samples:
+            raise ValueError(f"Окно длиннее {self.max_samples} семплов")
+
+        rows = input_values.detach().to(torch.float32).numpy()
+        submitted = []
+        try:
+            for row in rows:
+                slot = self._free.get(timeout=timeout)
+                self._inputs[slot, :len(row)] = row
+                future = Future()
+                with self._pending_lock:
+                    self._pending[slot] = future
+                submitted.append((slot, future))
+                self._tasks.put((slot, len(row)))
+
+            logits = np.empty((len(rows), self.num_labels), dtype=np.float32)
+            for i, (slot, future) in enumerate(submitted):
+                future.result(timeout)
+                logits[i] = self._outputs[slot]
+            return torch.from_numpy(logits)
+        finally:
+            for slot, future in submitted:
+                # Слот невыполненной задачи освобождается только после ответа процесса
+                future.add_done_callback(lambda _, slot=slot: self._free.put(slot))
+
+    def close(self):
+        """Остановка процессов и освобождение общей памяти"""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._processes:
+            self._tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=2)
+            if process.is_alive():
+                process.terminate()
+        self._results.put(None)
+        self._collector.join(timeout=2)
+        self._fail_pending(RuntimeError("Пул инференса остановлен"))
+        self._release_memory()
+
+    def _release_memory(self):
+        del self._inputs, self._outputs
+        for shm in (self._input_shm, self._output_shm):
+            shm.close()
+            shm.unlink()
+
+    def _collect(self):
+        """Поток разбора результатов: завершает Future по номеру слота"""
+        while True:
+            try:
+                item = self._results.get(timeout=0.5)
+            except queue.Empty:
+                if not self._closed and not all(p.is_alive() for p in self._processes):
+                    self._fail_pending(RuntimeError("Процесс инференса завершился аварийно"))
+                    self._closed = True
+                    return
+                continue
+            if item is None:
+                return
+
+            slot, error = item
+            with self._pending_lock:
+                future = self._pending.pop(slot, None)
+            if future is None:
+                continue
+            if error is None:
+                future.set_result(slot)
+            else:
+                future.set_exception(RuntimeError(error))
+
+    def _fail_pending(self, error):
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(error)
+
+
+class PooledModel:
+    """Замена модели: прямой проход выполняется в пуле процессов"""
+
+    def __init__(self, pool, model):
+        self.pool = pool
+        self.config = model.config
+
+    def __call__(self, input_values, **kwargs):
+        return self.forward(input_values, **kwargs)
+
+    def forward(self, input_values, **kwargs):
+        return types.SimpleNamespace(logits=self.pool.infer(input_values))
+
+    def eval(self):
+        return self
+
+    def close(self):
+        self.pool.close()
+
+
+def create_model_pool(model, settings):
+    """
+    Пул по секции "worker_pool" настроек
+    Возвращает PooledModel или исходную модель, если пул выключен или недоступен
+    """
+    if not settings.get('enabled'):
+        return model
+    try:
+        pool = ModelWorkerPool(
+            model,
+            workers=settings.get('workers') or 2,
+            slots=settings.get('slots'),
+            max_batch=settings.get('max_batch') or 4,
+            threads_per_worker=settings.get('threads_per_worker')
+        )
+    except Exception as e:
+        print(f"Пул инференса недоступен, используется модель в процессе: {e}")
+        return model
+    return PooledModel(pool, model)
+
+
+def _build_model(model_class, config, state):
+    """Модель из state_dict без инициализации весов: параметры - тензоры общей памяти"""
+    with torch.device("meta"):
+        model = model_class(config)
+    model.load_state_dict(state, strict=True, assign=True)
+    return model.eval()
+
+
+def _worker_main(source, input_name, output_name, shape, tasks, results, max_batch, threads, cpus):
+    # Процесс наследует маску ядер сервера процессов, а не потока инференса
+    if cpus:
+        try:
+            os.sched_setaffinity(0, cpus)
+        except (AttributeError, OSError):
+            pass
+    torch.set_num_threads(threads)
+    loader, loader_args = source
+    model = loader(*loader_args)
+    input_shm = shared_memory.SharedMemory(name=input_name)
+    output_shm = shared_memory.SharedMemory(name=output_name)
+    inputs = np.ndarray(shape, dtype=np.float32, buffer=input_shm.buf)
+    outputs = np.ndarray((shape[0], model.config.num_labels), dtype=np.float32, buffer=output_shm.buf)
+    running = True
+    while running:
+        task = tasks.get()
+        if task is None:
+            break
+        batch = [task]
+        while len(batch) < max_batch:
+            try:
+                task = tasks.get_nowait()
+            except queue.Empty:
+                break
+            if task is None:
+                running = False
+                break
+            batch.append(task)
+
+        # Окна одинаковой длины идут одним прямым проходом
+        groups = {}
+        for slot, length in batch:
+            groups.setdefault(length, []).append(slot)
+        for length, group in groups.items():
+            try:
+                input_values = torch.from_numpy(np.stack([inputs[slot, :length] for slot in group]))
+                with torch.no_grad():
+                    logits = model(input_values).logits
+                outputs[group] = logits.numpy()
+                error = None
+            except Exception as e:
+                error = str(e)
+            for slot in group:
+                results.put((slot, error))
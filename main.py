@@ -1,8 +1,13 @@
 import sys
 import os
-import threading
 import time
 from pathlib import Path
+
+# Потоки OpenMP/BLAS ограничиваются до загрузки numpy, torch и Vosk
+from core.settings import load_settings
+from core.thread_budget import apply_thread_environment, apply_thread_budget, pin_calls, pin_model_threads
+apply_thread_environment(load_settings()['threads'])
+
 import numpy as np
 from PyQt5.QtWidgets import *
 from PyQt5.QtCore import *
@@ -16,8 +21,30 @@ from ui.elements import *
 from ui.styles import *
 from core.audio_recorder import AudioRecorder
 from core.audio_processor import *
-
-import ollama
+from core import emotion_pipeline
+from core.ai_worker import AIAdviceWorker
+from core.advice_scheduler import AdviceTriggerScheduler
+from core.llm_client import OllamaAdvisorClient
+from core.llm_cache import LLMResponseCache
+from core.conversation_context import RollingConversationSummary, build_advice_messages, build_advice_system_prompt
+from core.profiling import configure_profiling, profile_model_forward
+from core.worker_pool import PooledModel, create_model_pool
+from core.adaptive_window import AdaptiveWindowController
+from core.session_archive import SessionArchive
+from core.perf_counters import counters as perf_counters
+from core.transcription_worker import FileTranscriptionWorker
+from core.file_transcription import load_vosk_model
+from core.capture_ring import CallbackCapture
+from core.capture_analysis import ProsodyWorker, SpeechRecognitionWorker, WindowAnalysisWorker, create_recognizer, current_window_time
+from core.embedding_store import EmbeddingRecorder, EmbeddingStore
+from core.prosody import ProsodicEstimator, TieredEmotionTracker
+from core.model_registry import configured_realtime_model, host_idle, load_registered_model, load_registry
+from core.model_selection_worker import ModelSelectionWorker
+from core.ingest_queue import IngestQueue
+from core.emotion_timeline import EmotionTimeline
+from core.batch_runner import list_inputs
+from ui.perf_panel import PerfPanel
+from ui.ingest_table import IngestResultsTable
 
 # ИМПОРТИРУЕМ МОДЕЛИ В НАЧАЛЕ ФАЙЛА
 try:
@@ -32,14 +59,55 @@ except ImportError as e:
 class EmotionRecognitionApp(QMainWindow):
     def __init__(self):
         super().__init__()
+        self.settings = load_settings()
         self.model = None
         self.feature_extractor = None
         # Убрали эмоцию "другая"
-        self.num2emotion = {0: 'нейтральная', 1: 'гнев', 2: 'радость', 3: 'грусть'}
+        self.num2emotion = dict(emotion_pipeline.NUM2EMOTION)
+        # Модель вкладки реального времени (из реестра, может быть легче файловой)
+        self.realtime_model = None
+        self.realtime_feature_extractor = None
+        self.realtime_num2emotion = dict(self.num2emotion)
+        self.realtime_model_name = None
+        self.model_selection_worker = None
+        # Реестр, ожидающий замера: замер идет, только пока приложение простаивает
+        self.pending_model_selection = None
+        self.vosk_model = None
+        # Вероятности эмоций по времени с кольцами 10 с и 1 мин: средние за окно за O(1)
+        self.emotion_timeline = EmotionTimeline(self.realtime_num2emotion.values(),
+                                                raw_capacity=self.settings['timeline']['raw_capacity'])
         self.current_file = None
         self.recorder = None
         self.audio_processor = None
+        self.capture = None
+        # Потребители кольца захвата: окна HuBERT и поток распознавания Vosk
+        self.window_worker = None
+        self.speech_worker = None
+        realtime_settings = self.settings['realtime']
+        self.adaptive_window = AdaptiveWindowController(
+            min_window=realtime_settings['min_window'],
+            max_window=realtime_settings['max_window'],
+            target_rtf=realtime_settings['target_rtf']
+        )
+        # Архив сессий с полнотекстовым поиском по фразам
+        self.archive = None
+        self.archive_session_id = None
+        self.archive_files_session_id = None
+        archive_settings = self.settings['archive']
+        if archive_settings['enabled']:
+            try:
+                self.archive = SessionArchive(archive_settings['path'], archive_settings['flush_every'])
+            except Exception as e:
+                print(f"Архив сессий недоступен: {e}")
+        self.embedding_store = None
+        # Предварительная оценка эмоции по просодии из кольца захвата (в своем потоке)
+        self.prosody_worker = None
+        self.emotion_tiers = TieredEmotionTracker()
+        # Очередь анализа файлов (создается после загрузки модели)
+        self.ingest_queue = None
+        self.ingest_single_job = None
         self.init_ui()
+        self.setAcceptDrops(True)
         self.load_model_async()
         # AI 
         self.ai_goal = ""
@@ -48,8 +116,40 @@ class EmotionRecognitionApp(QMainWindow):
         self.conversation_history = []
         self.dominant_emotion = "нейтральная"
         self.emotion_counter = {}
-        self.ai_thread = None  # Поток для работы с ИИ
-        self.ai_advice_queue = []  # Очередь для хранения полученных советов
+        
+        # Планировщик автоматических запросов совета
+        self.advice_scheduler = AdviceTriggerScheduler(words_threshold=self.words_for_ai)
+        
+        # Постоянный клиент Ollama и поток ИИ с очередью заданий
+        self.ai_client = OllamaAdvisorClient.from_settings(self.settings['ollama'])
+        cache_settings = self.settings['advisor']['cache']
+        self.ai_cache = LLMResponseCache(
+            max_entries=cache_settings['max_entries'],
+            ttl=cache_settings['ttl'],
+            path=cache_settings['path']
+        ) if cache_settings['enabled'] else None
+        self.ai_worker = AIAdviceWorker(self.ai_client, cache=self.ai_cache, parent=self)
+        
+        # Резюме старой части разговора, обновляемое в фоне
+        self.conversation_summary = RollingConversationSummary(
+            self.ai_client,
+            fold_words=self.settings['advisor']['summary_fold_words'],
+            max_summary_words=self.settings['advisor']['summary_max_words']
+        )
+        self.ai_worker.job_started.connect(self._on_ai_job_started)
+        self.ai_worker.chunk_received.connect(self._on_ai_advice_chunk)
+        self.ai_worker.job_finished.connect(self._on_ai_job_finished)
+        self.ai_worker.job_cancelled.connect(self._on_ai_job_cancelled)
+        self.ai_worker.start()
+        perf_counters.register_gauge('queue.ai', self.ai_worker.queue_depth)
+        
+        # Потоковый вывод совета: токены копятся в буфере и выводятся
+        # не чаще одного раза за кадр (~60 Гц), чтобы не перерисовывать
+        # QTextEdit на каждый токен
+        self.ai_stream_buffer = []
+        self.ai_paint_timer = QTimer(self)
+        self.ai_paint_timer.setInterval(16)
+        self.ai_paint_timer.timeout.connect(self._flush_ai_stream_buffer)
         
     def init_ui(self):
         self.setWindowTitle("СинхронИИя - Распознавание эмоций и речи")
@@ -128,8 +228,15 @@ class EmotionRecognitionApp(QMainWindow):
         browse_btn.setFixedWidth(120)
         browse_btn.setStyleSheet(Styles.get_button_style(primary=True, height=30))
         
+        # Папка целиком или перетаскивание файлов в окно - в фоновую очередь
+        folder_btn = QPushButton("📁 Папка...")
+        folder_btn.clicked.connect(self.browse_folder)
+        folder_btn.setFixedWidth(120)
+        folder_btn.setStyleSheet(Styles.get_button_style(primary=False, height=30))
+        
         file_layout.addWidget(self.file_label, 1)
         file_layout.addWidget(browse_btn)
+        file_layout.addWidget(folder_btn)
         file_group.setLayout(file_layout)
         layout.addWidget(file_group)
         
@@ -169,19 +276,51 @@ class EmotionRecognitionApp(QMainWindow):
         
         # Кнопка анализа
         self.analyze_btn = QPushButton("🔍 Анализировать эмоции")
-        self.analyze_btn.clicked.connect(self.analyze_emotion)
+        # Через lambda: clicked передает checked, а обернутый слот (например,
+        # профилированием) принял бы его как лишний аргумент
+        self.analyze_btn.clicked.connect(lambda: self.analyze_emotion())
         self.analyze_btn.setEnabled(False)
         self.analyze_btn.setMinimumHeight(50)
         self.analyze_btn.setStyleSheet(Styles.get_button_style(primary=True, height=50))
         layout.addWidget(self.analyze_btn)
         
+        # Кнопка транскрипции: текст файла с эмоцией каждой фразы
+        self.transcribe_btn = QPushButton("📝 Транскрибировать файл")
+        self.transcribe_btn.clicked.connect(self.start_file_transcription)
+        self.transcribe_btn.setEnabled(False)
+        self.transcribe_btn.setMinimumHeight(40)
+        self.transcribe_btn.setStyleSheet(Styles.get_button_style(primary=False, height=40, color=Styles.SUCCESS_COLOR))
+        layout.addWidget(self.transcribe_btn)
+        self.transcription_worker = None
+        
         # Индикатор выполнения
         self.progress_bar = QProgressBar()
         self.progress_bar.setVisible(False)
         self.progress_bar.setStyleSheet(Styles.get_progress_bar_style())
         layout.addWidget(self.progress_bar)
         
-        layout.addStretch(1)
+        # Результаты очереди файлов: строки появляются при постановке в очередь
+        # и заполняются по мере готовности, сортировка по любому столбцу
+        queue_group = QGroupBox("🗂️ Очередь файлов")
+        queue_group.setStyleSheet(Styles.get_groupbox_style())
+        queue_layout = QVBoxLayout()
+        self.ingest_table = IngestResultsTable(list(self.num2emotion.values()))
+        queue_layout.addWidget(self.ingest_table)
+        
+        queue_buttons = QHBoxLayout()
+        self.ingest_cancel_btn = QPushButton("⏹ Отменить")
+        self.ingest_cancel_btn.clicked.connect(self.cancel_ingest)
+        self.ingest_cancel_btn.setEnabled(False)
+        self.ingest_cancel_btn.setStyleSheet(Styles.get_button_style(primary=False, height=30, color=Styles.ERROR_COLOR))
+        ingest_clear_btn = QPushButton("🗑 Очистить")
+        ingest_clear_btn.clicked.connect(self.clear_ingest_results)
+        ingest_clear_btn.setStyleSheet(Styles.get_button_style(primary=False, height=30))
+        queue_buttons.addStretch(1)
+        queue_buttons.addWidget(self.ingest_cancel_btn)
+        queue_buttons.addWidget(ingest_clear_btn)
+        queue_layout.addLayout(queue_buttons)
+        queue_group.setLayout(queue_layout)
+        layout.addWidget(queue_group, 1)
         
     def setup_realtime_tab(self, tab):
         """Настройка вкладки анализа в реальном времени"""
@@ -227,6 +366,36 @@ class EmotionRecognitionApp(QMainWindow):
         slider_layout.addWidget(self.batch_length_label)
         control_layout.addLayout(slider_layout)
         
+        # Адаптивное окно: длина батча подстраивается под скорость инференса
+        adaptive_layout = QHBoxLayout()
+        self.adaptive_window_check = QCheckBox("⚙️ Адаптивное окно")
+        self.adaptive_window_check.setStyleSheet(Styles.get_device_label_style())
+        self.adaptive_window_check.setChecked(self.settings['realtime']['adaptive_window'])
+        self.adaptive_window_check.setToolTip(
+            "Окно и шаг подбираются так, чтобы анализ успевал за реальным временем"
+        )
+        adaptive_min_label = QLabel("от")
+        adaptive_min_label.setStyleSheet(Styles.get_device_label_style())
+        self.adaptive_min_spin = QDoubleSpinBox()
+        self.adaptive_min_spin.setRange(0.5, 10.0)
+        self.adaptive_min_spin.setSingleStep(0.5)
+        self.adaptive_min_spin.setSuffix(" с")
+        self.adaptive_min_spin.setValue(self.adaptive_window.min_window)
+        adaptive_max_label = QLabel("до")
+        adaptive_max_label.setStyleSheet(Styles.get_device_label_style())
+        self.adaptive_max_spin = QDoubleSpinBox()
+        self.adaptive_max_spin.setRange(0.5, 10.0)
+        self.adaptive_max_spin.setSingleStep(0.5)
+        self.adaptive_max_spin.setSuffix(" с")
+        self.adaptive_max_spin.setValue(self.adaptive_window.max_window)
+        adaptive_layout.addWidget(self.adaptive_window_check)
+        adaptive_layout.addWidget(adaptive_min_label)
+        adaptive_layout.addWidget(self.adaptive_min_spin)
+        adaptive_layout.addWidget(adaptive_max_label)
+        adaptive_layout.addWidget(self.adaptive_max_spin)
+        adaptive_layout.addStretch()
+        control_layout.addLayout(adaptive_layout)
+        
         # Кнопки записи
         button_layout = QHBoxLayout()
         
@@ -299,6 +468,10 @@ class EmotionRecognitionApp(QMainWindow):
         self.realtime_status_label.setStyleSheet(Styles.get_status_label_style())
         layout.addWidget(self.realtime_status_label)
         
+        # Панель производительности: обновляется дважды в секунду, пока идет анализ
+        self.perf_panel = PerfPanel(hop_seconds=self.current_hop_seconds)
+        layout.addWidget(self.perf_panel)
+        
         layout.addStretch(1)
         
     def setup_speech_tab(self, tab):
@@ -322,6 +495,18 @@ class EmotionRecognitionApp(QMainWindow):
         text_group.setLayout(text_layout)
         layout.addWidget(text_group)
         
+        # Транскрипция файла выводится отдельно и не затирает текст с микрофона
+        file_text_group = QGroupBox("📄 Транскрипция файла")
+        file_text_group.setStyleSheet(Styles.get_groupbox_style())
+        file_text_layout = QVBoxLayout()
+        self.file_text_display = QTextEdit()
+        self.file_text_display.setReadOnly(True)
+        self.file_text_display.setStyleSheet(Styles.get_text_edit_style())
+        self.file_text_display.setMinimumHeight(150)
+        file_text_layout.addWidget(self.file_text_display)
+        file_text_group.setLayout(file_text_layout)
+        layout.addWidget(file_text_group)
+        
         # Кнопки управления текстом
         text_buttons_layout = QHBoxLayout()
         
@@ -495,12 +680,19 @@ class EmotionRecognitionApp(QMainWindow):
         self.get_advice_btn.setMinimumHeight(40)
         self.get_advice_btn.setStyleSheet(Styles.get_button_style(primary=True, height=40))
         
+        self.cancel_advice_btn = QPushButton("⏹️ Отменить")
+        self.cancel_advice_btn.clicked.connect(self.cancel_ai_advice)
+        self.cancel_advice_btn.setEnabled(False)
+        self.cancel_advice_btn.setMinimumHeight(40)
+        self.cancel_advice_btn.setStyleSheet(Styles.get_button_style(primary=False, height=40, color=Styles.ERROR_COLOR))
+        
         self.clear_advice_btn = QPushButton("🧹 Очистить советы")
         self.clear_advice_btn.clicked.connect(self.clear_ai_advice)
         self.clear_advice_btn.setMinimumHeight(40)
         self.clear_advice_btn.setStyleSheet(Styles.get_button_style(primary=False, height=40, color=Styles.WARNING_COLOR))
         
         advice_button_layout.addWidget(self.get_advice_btn)
+        advice_button_layout.addWidget(self.cancel_advice_btn)
         advice_button_layout.addWidget(self.clear_advice_btn)
         advice_button_layout.addStretch()
         
@@ -532,6 +724,7 @@ class EmotionRecognitionApp(QMainWindow):
         """Обновление метки слайдера количества слов"""
         self.words_slider_label.setText(f"{value} слов")
         self.words_for_ai = value
+        self.advice_scheduler.words_threshold = value
         
     def load_model_async(self):
         """Загрузка модели в отдельном потоке для предотвращения зависания UI"""
@@ -543,18 +736,64 @@ class EmotionRecognitionApp(QMainWindow):
             if not TRANSFORMERS_AVAILABLE:
                 raise ImportError("Библиотека transformers не установлена. Установите: pip install transformers")
             
-            # Загрузка модели и экстрактора признаков
-            self.feature_extractor = Wav2Vec2FeatureExtractor.from_pretrained(
-                "facebook/hubert-large-ls960-ft"
-            )
-            
-            self.model = HubertForSequenceClassification.from_pretrained(
-                "xbgoose/hubert-speech-emotion-recognition-russian-dusha-finetuned"
+            # Модели из реестра: вкладка файлов - самая точная, вкладка реального
+            # времени - выбранная замером на этом компьютере под бюджет RTF
+            # (веса из кеша safetensors через mmap, если он включен в настройках).
+            # Без сохраненного выбора замер идет в фоне, пока приложение простаивает,
+            # а до следующего запуска реальное время использует модель файлов
+            model_settings = self.settings['models']
+            cache = self.settings['model_cache']
+            registry = load_registry(model_settings['registry_path'])
+            self.model, self.feature_extractor, self.num2emotion = load_registered_model(
+                registry[model_settings['file']], cache
             )
-            self.model.eval()
+            self.realtime_model_name = configured_realtime_model(registry, model_settings)
+            if self.realtime_model_name is None:
+                self.realtime_model_name = model_settings['file']
+                self.pending_model_selection = registry
+                self.start_model_selection()
+            if self.realtime_model_name != model_settings['file']:
+                try:
+                    self.realtime_model, self.realtime_feature_extractor, self.realtime_num2emotion = \
+                        load_registered_model(registry[self.realtime_model_name], cache)
+                except ValueError as e:
+                    # Метки контрольной точки не совпадают с картой записи реестра
+                    print(f"Модель {self.realtime_model_name} пропущена: {e}")
+                    self.realtime_model_name = model_settings['file']
+            if self.realtime_model_name == model_settings['file']:
+                self.realtime_model, self.realtime_feature_extractor = self.model, self.feature_extractor
+                self.realtime_num2emotion = self.num2emotion
+            
+            # При включенном профилировании каждый N-й прямой проход модели
+            # (включая батчи реального времени) попадает в отчет
+            profile_model_forward(self.realtime_model, 'model_forward')
+            
+            # Потоки, вызывающие модель, закрепляются за ядрами инференса
+            pin_model_threads(self.realtime_model)
+            
+            # Пул процессов инференса (выключен по умолчанию). Процессы запускаются
+            # через forkserver: замер моделей реестра уже выполнил прямые проходы
+            # здесь, и fork унаследовал бы запущенные пулы потоков OpenMP/MKL
+            shared = self.realtime_model is self.model
+            self.realtime_model = create_model_pool(self.realtime_model, self.settings['worker_pool'])
+            if shared:
+                self.model = self.realtime_model
+            
+            # Эмбеддинги окон для поиска похожих фрагментов (только инференс в процессе)
+            embedding_settings = self.settings['embeddings']
+            if embedding_settings['enabled'] and not isinstance(self.realtime_model, PooledModel):
+                try:
+                    self.embedding_store = EmbeddingStore(embedding_settings['path'])
+                    if self.embedding_store.index is not None:
+                        self.embedding_store.index.nprobe = embedding_settings['nprobe']
+                    EmbeddingRecorder(self.embedding_store, self.embedding_context).attach(self.realtime_model)
+                except Exception as e:
+                    self.embedding_store = None
+                    print(f"Хранилище эмбеддингов недоступно: {e}")
             
             # Проверяем количество меток в модели
-            print(f"Количество меток в модели: {self.model.config.num_labels}")
+            print(f"Количество меток в модели: {self.model.config.num_labels}, "
+                  f"реальное время: {self.realtime_model_name}")
             
             # Если модель исходно была для 5 эмоций, адаптируем выходной слой
             if self.model.config.num_labels != 4:
@@ -563,16 +802,59 @@ class EmotionRecognitionApp(QMainWindow):
                 # Вместо пересоздания модели, будем правильно интерпретировать выходы
                 pass
             
-            # Инициализация аудио процессора
+            # Столбцы таблицы очереди - по карте меток загруженной модели
+            self.ingest_table.set_emotions(self.num2emotion.values())
+            
+            # Фоновая очередь анализа файлов на модели вкладки файлов
+            ingest_settings = self.settings['ingest']
+            self.ingest_queue = IngestQueue(
+                self.model,
+                self.feature_extractor,
+                self.num2emotion,
+                workers=ingest_settings['workers'],
+                inference_slots=ingest_settings['inference_slots'],
+                parent=self
+            )
+            self.ingest_queue.job_started.connect(self._on_ingest_started)
+            self.ingest_queue.job_finished.connect(self._on_ingest_finished)
+            self.ingest_queue.job_failed.connect(self._on_ingest_failed)
+            self.ingest_queue.job_cancelled.connect(self._on_ingest_cancelled)
+            self.ingest_queue.progress.connect(self._on_ingest_progress)
+            self.ingest_queue.drained.connect(self._on_ingest_drained)
+            perf_counters.register_gauge('queue.ingest', self.ingest_queue.pending_count)
+            
+            # Инициализация аудио процессора. Время его прямых проходов идет в
+            # адаптивное окно и панель производительности через обертки: модель
+            # может быть общей с вкладкой файлов, и ее вызовы не должны влиять
+            # на RTF реального времени (замер в вызывающем потоке, поэтому
+            # включает передачу окна в пул)
             self.audio_processor = AudioProcessor(
-                self.model, 
-                self.feature_extractor, 
-                self.num2emotion
+                perf_counters.wrap_model(self.adaptive_window.wrap(self.realtime_model)), 
+                self.realtime_feature_extractor, 
+                self.realtime_num2emotion
             )
             
-            # Загрузка модели Vosk
-            if self.audio_processor.init_vosk():
+            # Загрузка модели Vosk. При захвате в кольцо распознаватель потока
+            # Vosk создается по модели, загруженной здесь один раз; аудио процессор
+            # в этом режиме не используется и свою копию модели не загружает
+            if self.settings['capture']['callback']:
+                try:
+                    self.vosk_model = load_vosk_model(self.settings['vosk']['model_path'])
+                    self.speech_status_label.setText("Модель Vosk успешно загружена")
+                except Exception as e:
+                    print(f"Модель Vosk не загружена: {e}")
+                    self.speech_status_label.setText("⚠️ Модель Vosk не найдена! Скачайте с: https://alphacephei.com/vosk/models")
+            elif self.audio_processor.init_vosk():
                 self.speech_status_label.setText("Модель Vosk успешно загружена")
+                # Время вызовов распознавателя для панели производительности
+                recognizer = getattr(self.audio_processor, 'recognizer', None)
+                if recognizer is not None:
+                    try:
+                        perf_counters.time_calls(recognizer, 'AcceptWaveform', 'vosk')
+                        # Поток распознавания закрепляется за ядром ASR при первом блоке
+                        pin_calls(recognizer, 'AcceptWaveform', 'asr')
+                    except AttributeError:
+                        pass
             else:
                 self.speech_status_label.setText("⚠️ Модель Vosk не найдена! Скачайте с: https://alphacephei.com/vosk/models")
             
@@ -583,7 +865,7 @@ class EmotionRecognitionApp(QMainWindow):
             # Заполнение списка устройств микрофона
             self.populate_microphone_devices()
             
-            self.status_bar.showMessage("Модель успешно загружена!")
+            self.status_bar.showMessage(f"Модель успешно загружена! Реальное время: {self.realtime_model_name}")
             self.analyze_btn.setEnabled(False)
             
         except Exception as e:
@@ -591,6 +873,64 @@ class EmotionRecognitionApp(QMainWindow):
             self.status_bar.showMessage("Не удалось загрузить модель")
             print(f"Подробности ошибки: {e}")
             
+    def start_model_selection(self):
+        """
+        Фоновый замер моделей реестра для выбора модели реального времени
+        Замер параллельно с анализом исказил бы RTF, поэтому он откладывается, пока
+        идут реальное время, очередь файлов или транскрипция, и возобновляется по их
+        окончании; при загрузке компьютера другими программами - повтор через минуту
+        """
+        if self.pending_model_selection is None or self.model_selection_worker is not None:
+            return
+        if self.model_selection_busy():
+            return
+        if not host_idle():
+            QTimer.singleShot(60000, self.start_model_selection)
+            return
+        self.model_selection_worker = ModelSelectionWorker(
+            self.pending_model_selection,
+            self.settings['models'],
+            self.settings['model_cache'],
+            rtf_budget=self.settings['realtime']['target_rtf'],
+            parent=self
+        )
+        self.model_selection_worker.progress.connect(self.show_model_progress)
+        self.model_selection_worker.selected.connect(self._on_model_selected)
+        self.model_selection_worker.failed.connect(self._on_model_selection_failed)
+        self.model_selection_worker.finished.connect(self._on_model_selection_thread_done)
+        self.model_selection_worker.start()
+    
+    def model_selection_busy(self):
+        """Приложение занято инференсом: замер моделей подождет"""
+        return (self.stop_realtime_btn.isEnabled() or self.transcription_worker is not None
+                or (self.ingest_queue is not None and self.ingest_queue.is_busy()))
+    
+    def interrupt_model_selection(self):
+        """Начинается инференс: замер прерывается после текущего повтора и не сохраняется"""
+        if self.model_selection_worker is not None:
+            self.model_selection_worker.stop()
+            self.status_bar.showMessage("Замер моделей отложен до окончания анализа")
+    
+    def _on_model_selection_thread_done(self):
+        self.model_selection_worker = None
+    
+    def show_model_progress(self, message):
+        """Ход фонового замера моделей при первом запуске"""
+        print(message)
+        self.status_bar.showMessage(message)
+    
+    def _on_model_selected(self, name):
+        self.pending_model_selection = None
+        if name == self.realtime_model_name:
+            self.status_bar.showMessage(f"Модель реального времени по замеру: {name}")
+        else:
+            self.status_bar.showMessage(f"Модель реального времени по замеру: {name} (применится при следующем запуске)")
+    
+    def _on_model_selection_failed(self, error):
+        self.pending_model_selection = None
+        print(f"Замер моделей не удался: {error}")
+        self.status_bar.showMessage("Замер моделей не удался, реальное время использует модель файлов")
+    
     def populate_microphone_devices(self):
         """Заполнение выпадающего списка устройств микрофона"""
         try:
@@ -613,18 +953,21 @@ class EmotionRecognitionApp(QMainWindow):
             print(f"Ошибка заполнения устройств: {e}")
             
     def browse_file(self):
-        """Открытие диалога выбора аудиофайла"""
+        """Открытие диалога выбора аудиофайла (несколько файлов - в очередь)"""
         file_dialog = QFileDialog()
         file_dialog.setNameFilter("Аудиофайлы (*.wav *.mp3 *.flac *.ogg *.m4a *.opus)")
-        file_dialog.setFileMode(QFileDialog.ExistingFile)
+        file_dialog.setFileMode(QFileDialog.ExistingFiles)
         file_dialog.setStyleSheet(Styles.get_file_dialog_style())
         
         if file_dialog.exec_():
             files = file_dialog.selectedFiles()
-            if files:
+            if len(files) > 1:
+                self.enqueue_files(files)
+            elif files:
                 self.current_file = files[0]
                 self.file_label.setText(Path(self.current_file).name)
                 self.analyze_btn.setEnabled(True)
+                self.transcribe_btn.setEnabled(self.transcription_worker is None)
                 self.emotion_label.setText("Готов к анализу")
                 self.emotion_label.setStyleSheet(Styles.get_emotion_label_style())
                 self.confidence_label.setText("Уверенность: --")
@@ -650,227 +993,98 @@ class EmotionRecognitionApp(QMainWindow):
                     self.audio_info_label.setText("Не удалось прочитать информацию об аудиофайле")
     
     def normalize_audio(self, audio_data, target_sample_rate=16000, min_duration=1.0):
-        """
-        Комплексная функция нормализации аудио
-        - Конвертирует стерео в моно
-        - Нормализует амплитуду до [-1, 1]
-        - Обеспечивает минимальную длительность
-        - Передискретизирует до целевой частоты
-        """
-        # Конвертация в numpy array, если это torch tensor
-        if isinstance(audio_data, torch.Tensor):
-            audio_data = audio_data.numpy()
-        
-        # Обработка стерео аудио
-        if audio_data.ndim > 1:
-            # Усреднение по каналам (axis=1 для формы [семплы, каналы])
-            if audio_data.shape[0] < audio_data.shape[1]:
-                # Форма [каналы, семплы]
-                audio_data = np.mean(audio_data, axis=0)
-            else:
-                # Форма [семплы, каналы]
-                audio_data = np.mean(audio_data, axis=1)
-        
-        # Нормализация амплитуды до [-1, 1]
-        max_val = np.max(np.abs(audio_data))
-        if max_val > 0:
-            audio_data = audio_data / max_val
-        
-        return audio_data
+        """Нормализация аудио (см. core.emotion_pipeline.normalize_audio)"""
+        return emotion_pipeline.normalize_audio(audio_data, target_sample_rate, min_duration)
     
     def ensure_minimum_length(self, audio_data, sample_rate, min_seconds=1.0):
-        """
-        Обеспечение минимальной длины аудио путем повторения при необходимости
-        Возвращает аудио с минимальной длительностью min_seconds
-        """
-        min_samples = int(min_seconds * sample_rate)
-        current_samples = len(audio_data)
-        
-        if current_samples < min_samples:
-            # Расчет необходимого количества повторений
-            repeats_needed = int(np.ceil(min_samples / current_samples))
-            
-            # Повторение аудио
-            audio_data = np.tile(audio_data, repeats_needed)
-            
-            # Обрезка до точной минимальной длины при необходимости
-            if len(audio_data) > min_samples:
-                audio_data = audio_data[:min_samples]
-        
-        return audio_data
+        """Обеспечение минимальной длины аудио (см. core.emotion_pipeline)"""
+        return emotion_pipeline.ensure_minimum_length(audio_data, sample_rate, min_seconds)
     
     def load_and_preprocess_audio(self, filepath):
         """
         Загрузка аудиофайла и предобработка для модели HuBERT
         Возвращает нормализованное аудио с частотой 16кГц и минимальной длительностью 1 секунда
         """
-        try:
-            # Попытка различных методов загрузки аудио
-            audio_data = None
-            sample_rate = None
-            
-            # Метод 1: Попытка soundfile
-            try:
-                audio_data, sample_rate = sf.read(filepath)
-            except:
-                # Метод 2: Попытка torchaudio
-                try:
-                    waveform, sample_rate = torchaudio.load(filepath, normalize=True)
-                    audio_data = waveform.numpy()
-                    if audio_data.ndim > 1:
-                        audio_data = np.mean(audio_data, axis=0)
-                except:
-                    # Метод 3: Попытка librosa
-                    try:
-                        import librosa
-                        audio_data, sample_rate = librosa.load(filepath, sr=None, mono=True)
-                    except Exception as e:
-                        raise Exception(f"Все методы загрузки аудио не удались: {e}")
-            
-            # Нормализация аудио
-            audio_data = self.normalize_audio(audio_data)
-            
-            # Обеспечение минимальной длины
-            audio_data = self.ensure_minimum_length(audio_data, sample_rate, min_seconds=1.0)
-            
-            # Передискретизация до 16кГц при необходимости
-            if sample_rate != 16000:
-                try:
-                    import librosa
-                    audio_data = librosa.resample(audio_data, orig_sr=sample_rate, target_sr=16000)
-                    sample_rate = 16000
-                except:
-                    # Резервный вариант: передискретизация torchaudio
-                    waveform = torch.FloatTensor(audio_data).unsqueeze(0)
-                    transform = torchaudio.transforms.Resample(sample_rate, 16000)
-                    audio_data = transform(waveform).squeeze(0).numpy()
-                    sample_rate = 16000
-            
-            return audio_data, sample_rate
-            
-        except Exception as e:
-            raise Exception(f"Не удалось загрузить и предобработать аудио: {str(e)}")
+        return emotion_pipeline.load_and_preprocess_audio(filepath)
     
     def analyze_emotion(self):
-        """Анализ эмоций из выбранного аудиофайла"""
-        if not self.current_file or not self.model:
+        """Анализ эмоций выбранного аудиофайла в фоновой очереди"""
+        if not self.current_file or not self.ingest_queue:
             QMessageBox.warning(self, "Предупреждение", "Пожалуйста, сначала выберите аудиофайл")
             return
-            
-        try:
-            # Показать прогресс
-            self.progress_bar.setVisible(True)
-            self.progress_bar.setValue(0)
-            self.analyze_btn.setEnabled(False)
-            self.status_bar.showMessage("Обработка аудио...")
-            QApplication.processEvents()
-            
-            # Шаг 1: Загрузка и предобработка аудио
-            self.progress_bar.setValue(25)
-            self.status_bar.showMessage("Загрузка и предобработка аудио...")
-            
-            audio_data, sample_rate = self.load_and_preprocess_audio(self.current_file)
-            
-            # Шаг 2: Извлечение признаков
-            self.progress_bar.setValue(50)
-            self.status_bar.showMessage("Извлечение признаков...")
-            
-            # Обеспечение достаточной длины аудио
-            if len(audio_data) < 10:
-                audio_data = np.pad(audio_data, (0, 10 - len(audio_data)), mode='constant')
-            
-            inputs = self.feature_extractor(
-                audio_data,
-                sampling_rate=16000,
-                return_tensors="pt",
-                padding=True,
-                max_length=16000 * 10,
-                truncation=True
-            )
-            
-            # Шаг 3: Создание предсказания
-            self.progress_bar.setValue(75)
-            self.status_bar.showMessage("Анализ эмоций...")
-            
-            with torch.no_grad():
-                input_values = inputs['input_values']
-                
-                # Обработка различных размерностей ввода
-                if input_values.dim() == 4:
-                    input_values = input_values.squeeze(1).squeeze(1)
-                elif input_values.dim() == 3:
-                    input_values = input_values.squeeze(1)
-                
-                # Двойная проверка длины ввода
-                if input_values.shape[1] < 10:
-                    padding = 10 - input_values.shape[1]
-                    input_values = torch.nn.functional.pad(input_values, (0, padding), mode='constant', value=0)
-                
-                # Создание предсказания
-                logits = self.model(input_values).logits
-                predictions = torch.argmax(logits, dim=-1)
-                probabilities = torch.nn.functional.softmax(logits, dim=-1)
-                
-                predicted_class = predictions.numpy()[0]
-                
-                # Если модель возвращает 5 классов, а у нас 4, берем только первые 4
-                if probabilities.shape[1] > 4:
-                    probabilities = probabilities[:, :4]  # Берем только первые 4 класса
-                    # Нормализуем вероятности
-                    probabilities = torch.nn.functional.softmax(probabilities, dim=-1)
-                    if predicted_class >= 4:
-                        predicted_class = 3  # Переназначаем на последний доступный класс
-                
-                confidence = probabilities[0][predicted_class].item() * 100
-                predicted_emotion = self.num2emotion[predicted_class]
-                
-                # Получение вероятностей всех эмоций
-                all_probs = {}
-                for i, emotion in self.num2emotion.items():
-                    all_probs[emotion] = probabilities[0][i].item() * 100
-            
-            # Шаг 4: Обновление UI
-            self.progress_bar.setValue(100)
-            
-            # Обновление отображения эмоций
-            self.emotion_label.setText(predicted_emotion.upper())
-            self.confidence_label.setText(f"Уверенность: {confidence:.1f}%")
-            
-            # Установка цвета в зависимости от эмоции
-            color = Styles.EMOTION_COLORS.get(predicted_emotion, '#000000')
-            self.emotion_label.setStyleSheet(f"""
-                QLabel {{
-                    padding: 14px;
-                    border-radius: 8px;
-                    background-color: {Styles.SECONDARY_COLOR};
-                    color: {color};
-                    border: 2px solid {color};
-                }}
-            """)
-            
-            # Создание подробного сообщения с результатами
-            details = "\n".join([f"{emotion}: {prob:.1f}%" for emotion, prob in all_probs.items()])
-            
-            self.status_bar.showMessage(f"Анализ завершен: {predicted_emotion} ({confidence:.1f}%)")
-            
-            # Показать подробные результаты в окне сообщения
-            msg_box = QMessageBox(self)
-            msg_box.setWindowTitle("Результаты анализа")
-            msg_box.setText(f"<b>Предсказанная эмоция: {predicted_emotion.upper()}</b><br>"
-                          f"Уверенность: {confidence:.1f}%<br><br>"
-                          f"<b>Все вероятности:</b><br>{details}")
-            msg_box.setStandardButtons(QMessageBox.Ok)
-            
-            # Стилизация окна сообщения для темной темы
-            msg_box.setStyleSheet(Styles.get_message_box_style())
-            
-            msg_box.exec_()
-            
-        except Exception as e:
-            import traceback
-            error_msg = f"Не удалось проанализировать аудио: {str(e)}\n\n{traceback.format_exc()}"
-            print(error_msg)
-            QMessageBox.critical(self, "Ошибка", f"Не удалось проанализировать аудио: {str(e)}")
+        
+        self.analyze_btn.setEnabled(False)
+        self.emotion_label.setText("Анализ...")
+        self.emotion_label.setStyleSheet(Styles.get_emotion_label_style())
+        self.status_bar.showMessage("Анализ эмоций...")
+        jobs = self.enqueue_files([self.current_file])
+        self.ingest_single_job = jobs[0][0] if jobs else None
+    
+    def browse_folder(self):
+        """Все аудиофайлы папки (рекурсивно) - в очередь анализа"""
+        folder = QFileDialog.getExistingDirectory(self, "Папка с аудиофайлами")
+        if folder:
+            self.enqueue_files(list_inputs(folder))
+    
+    def dragEnterEvent(self, event):
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
+    
+    def dropEvent(self, event):
+        """Перетащенные файлы и папки - в очередь анализа на вкладке файлов"""
+        paths = []
+        for url in event.mimeData().urls():
+            path = url.toLocalFile()
+            if os.path.isdir(path):
+                paths.extend(list_inputs(path))
+            elif path:
+                paths.append(path)
+        if paths:
+            event.acceptProposedAction()
+            self.tab_widget.setCurrentIndex(0)
+            self.enqueue_files(paths)
+    
+    def enqueue_files(self, paths):
+        """Постановка файлов в фоновую очередь; возвращает [(задание, путь)]"""
+        if not self.ingest_queue:
+            QMessageBox.warning(self, "Предупреждение", "Модель еще не загружена")
+            return []
+        if not paths:
+            self.status_bar.showMessage("Аудиофайлы не найдены")
+            return []
+        self.interrupt_model_selection()
+        jobs = self.ingest_queue.submit(paths)
+        self.ingest_table.add_jobs(jobs)
+        self.ingest_cancel_btn.setEnabled(True)
+        self.progress_bar.setVisible(True)
+        self.status_bar.showMessage(f"В очереди: {len(jobs)} файлов")
+        return jobs
+    
+    def cancel_ingest(self):
+        if self.ingest_queue:
+            self.ingest_queue.cancel()
+    
+    def clear_ingest_results(self):
+        """Очистка таблицы (выполняющиеся задания отменяются)"""
+        self.cancel_ingest()
+        self.ingest_table.clear_jobs()
+    
+    def _on_ingest_started(self, job_id):
+        self.ingest_table.set_status(job_id, "Анализ...")
+    
+    def _on_ingest_finished(self, job_id, result):
+        self.ingest_table.set_result(job_id, result)
+        self.archive_file_result(result['path'], result['emotion'], result['confidence'], result['probs'],
+                                 result['duration'])
+        if job_id == self.ingest_single_job:
+            self.ingest_single_job = None
+            self.show_file_result(result['emotion'], result['confidence'], result['probs'])
+    
+    def _on_ingest_failed(self, job_id, error):
+        self.ingest_table.set_status(job_id, "Ошибка", Styles.ERROR_COLOR)
+        print(f"Не удалось проанализировать файл (задание {job_id}): {error}")
+        if job_id == self.ingest_single_job:
+            self.ingest_single_job = None
             self.status_bar.showMessage("Анализ не удался")
             self.emotion_label.setText("Ошибка")
             self.emotion_label.setStyleSheet(f"""
@@ -882,14 +1096,153 @@ class EmotionRecognitionApp(QMainWindow):
                     border: 2px solid {Styles.ERROR_COLOR};
                 }}
             """)
-            
-        finally:
-            self.progress_bar.setVisible(False)
-            self.analyze_btn.setEnabled(True)
+            QMessageBox.critical(self, "Ошибка", f"Не удалось проанализировать аудио: {error}")
+    
+    def _on_ingest_cancelled(self, job_id):
+        self.ingest_table.set_status(job_id, "Отменено", Styles.MUTED_TEXT_COLOR)
+        if job_id == self.ingest_single_job:
+            self.ingest_single_job = None
+            self.emotion_label.setText("Анализ отменен")
+    
+    def _on_ingest_progress(self, done, total):
+        self.progress_bar.setValue(int(done / total * 100) if total else 0)
+        self.status_bar.showMessage(f"Файлов обработано: {done} из {total}")
+    
+    def _on_ingest_drained(self, stats):
+        self.progress_bar.setVisible(False)
+        self.start_model_selection()
+        self.ingest_cancel_btn.setEnabled(False)
+        self.analyze_btn.setEnabled(self.current_file is not None)
+        if stats['total'] > 1:
+            speed = stats['audio_seconds'] / stats['elapsed'] if stats['elapsed'] else 0
+            self.status_bar.showMessage(
+                f"Очередь завершена: готово {stats['done']}, ошибок {stats['failed']}, "
+                f"отменено {stats['cancelled']} за {stats['elapsed']:.0f} с ({speed:.1f}x реального времени)"
+            )
+    
+    def show_file_result(self, predicted_emotion, confidence, all_probs):
+        """Результат анализа выбранного файла: метки вкладки и окно с вероятностями"""
+        self.emotion_label.setText(predicted_emotion.upper())
+        self.confidence_label.setText(f"Уверенность: {confidence:.1f}%")
+        
+        # Установка цвета в зависимости от эмоции
+        color = Styles.EMOTION_COLORS.get(predicted_emotion, '#000000')
+        self.emotion_label.setStyleSheet(f"""
+            QLabel {{
+                padding: 14px;
+                border-radius: 8px;
+                background-color: {Styles.SECONDARY_COLOR};
+                color: {color};
+                border: 2px solid {color};
+            }}
+        """)
+        
+        # Создание подробного сообщения с результатами
+        details = "\n".join([f"{emotion}: {prob:.1f}%" for emotion, prob in all_probs.items()])
+        
+        self.status_bar.showMessage(f"Анализ завершен: {predicted_emotion} ({confidence:.1f}%)")
+        
+        # Показать подробные результаты в окне сообщения
+        msg_box = QMessageBox(self)
+        msg_box.setWindowTitle("Результаты анализа")
+        msg_box.setText(f"<b>Предсказанная эмоция: {predicted_emotion.upper()}</b><br>"
+                      f"Уверенность: {confidence:.1f}%<br><br>"
+                      f"<b>Все вероятности:</b><br>{details}")
+        msg_box.setStandardButtons(QMessageBox.Ok)
+        
+        # Стилизация окна сообщения для темной темы
+        msg_box.setStyleSheet(Styles.get_message_box_style())
+        
+        # Немодальное окно: очередь продолжает выдавать результаты
+        msg_box.open()
+    
+    def start_file_transcription(self):
+        """Транскрипция выбранного файла в фоне с параллельным декодированием фрагментов"""
+        if not self.current_file:
+            QMessageBox.warning(self, "Предупреждение", "Пожалуйста, сначала выберите аудиофайл")
+            return
+        vosk_path = self.settings['vosk']['model_path']
+        if not os.path.isdir(vosk_path):
+            QMessageBox.warning(self, "Предупреждение",
+                                f"Модель Vosk не найдена ({vosk_path}). Скачайте с: https://alphacephei.com/vosk/models")
+            return
+        
+        self.interrupt_model_selection()
+        transcription_settings = self.settings['transcription']
+        self.transcription_worker = FileTranscriptionWorker(
+            self.current_file,
+            vosk_path,
+            model=self.model,
+            feature_extractor=self.feature_extractor,
+            num2emotion=self.num2emotion,
+            workers=transcription_settings['workers'],
+            chunk_seconds=transcription_settings['chunk_seconds'],
+            parent=self
+        )
+        self.transcription_worker.progress.connect(self._on_transcription_progress)
+        self.transcription_worker.finished_ok.connect(self._on_transcription_finished)
+        self.transcription_worker.failed.connect(self._on_transcription_failed)
+        self.transcription_worker.finished.connect(self._on_transcription_thread_done)
+        
+        self.transcribe_btn.setEnabled(False)
+        self.progress_bar.setVisible(True)
+        self.progress_bar.setValue(0)
+        self.status_bar.showMessage("Транскрипция файла...")
+        self.transcription_worker.start()
+    
+    def _on_transcription_progress(self, done, total):
+        self.progress_bar.setValue(int(done / total * 100))
+        self.status_bar.showMessage(f"Транскрипция: фрагмент {done} из {total}")
+    
+    def _on_transcription_finished(self, result):
+        """Вывод фраз файла с метками времени и цветом эмоции в поле транскрипции файла"""
+        self.file_text_display.clear()
+        cursor = self.file_text_display.textCursor()
+        header_format = QTextCharFormat()
+        header_format.setFontWeight(QFont.Bold)
+        cursor.insertText(f"{Path(result['path']).name}\n", header_format)
+        for phrase in result['phrases']:
+            emotion = phrase.get('emotion') or 'нейтральная'
+            text_format = QTextCharFormat()
+            text_format.setForeground(QColor(Styles.EMOTION_COLORS.get(emotion, '#808080')))
+            text_format.setFontWeight(QFont.Bold)
+            minutes, seconds = divmod(int(phrase['start']), 60)
+            cursor.insertText(f"[{minutes:02d}:{seconds:02d}] {phrase['text']}\n", text_format)
+        
+        if self.archive is not None and result['phrases']:
+            session_id = self.archive.start_session('files', title=Path(result['path']).name)
+            # Время фразы - время записи: файл дописан в конце записи, поэтому
+            # начало записи - время изменения файла минус его длительность
+            try:
+                base = os.path.getmtime(result['path']) - result['duration']
+            except OSError:
+                base = time.time() - result['duration']
+            self.archive.add_phrases([
+                (session_id, base + p['start'], p['text'], p.get('emotion'), p.get('confidence'))
+                for p in result['phrases']
+            ])
+            self.archive.end_session(session_id)
+        
+        speed = result['duration'] / result['elapsed'] if result['elapsed'] else 0
+        message = (f"Транскрипция завершена: {len(result['phrases'])} фраз, {result['chunks']} фрагментов, "
+                   f"{result['workers']} процессов, {speed:.1f}x реального времени")
+        self.status_bar.showMessage(message)
+        self.speech_status_label.setText(message)
+        self.progress_bar.setVisible(False)
+    
+    def _on_transcription_failed(self, error):
+        self.progress_bar.setVisible(False)
+        self.status_bar.showMessage("Транскрипция не удалась")
+        QMessageBox.critical(self, "Ошибка", f"Не удалось транскрибировать файл: {error}")
+    
+    def _on_transcription_thread_done(self):
+        self.transcription_worker = None
+        self.transcribe_btn.setEnabled(self.current_file is not None)
+        self.start_model_selection()
     
     def start_realtime_analysis(self):
         """Начало анализа эмоций в реальном времени с микрофона"""
-        if not self.model or not self.audio_processor:
+        if not self.realtime_model or not self.audio_processor:
             QMessageBox.warning(self, "Предупреждение", "Модель еще не загружена")
             return
         
@@ -904,10 +1257,33 @@ class EmotionRecognitionApp(QMainWindow):
         
         # Сброс графика перед началом новой записи
         self.canvas.clear_plot()
+        self.emotion_timeline = EmotionTimeline(self.realtime_num2emotion.values(),
+                                                raw_capacity=self.settings['timeline']['raw_capacity'])
+        
+        self.interrupt_model_selection()
+        
+        # Адаптивное окно стартует с длины из слайдера
+        self.adaptive_window.set_bounds(self.adaptive_min_spin.value(), self.adaptive_max_spin.value())
+        self.adaptive_window.reset(batch_length)
+        self.adaptive_window.active = self.adaptive_window_check.isChecked()
         
         # Начало обработки аудио
         try:
-            self.audio_processor.start_processing(device_index, batch_length)
+            # Захват в режиме колбэка: блоки PyAudio пишутся в заранее выделенное
+            # кольцо float32, окна HuBERT и Vosk читаются из него в своих потоках.
+            # Без него микрофон читает аудио процессор
+            if self.settings['capture']['callback']:
+                self.start_capture(device_index, batch_length)
+            else:
+                self.audio_processor.start_processing(device_index, batch_length)
+            self.start_prosody_tier(batch_length)
+            
+            self.perf_panel.start()
+            
+            if self.archive is not None:
+                self.archive_session_id = self.archive.start_session(
+                    'realtime', title=time.strftime("Запись %Y-%m-%d %H:%M"), goal=self.ai_goal or None
+                )
             
             # Обновление UI
             self.start_realtime_btn.setEnabled(False)
@@ -915,7 +1291,10 @@ class EmotionRecognitionApp(QMainWindow):
             self.save_audio_btn.setEnabled(True)
             self.realtime_emotion_label.setText("Слушаю...")
             self.realtime_confidence_label.setText("Уверенность: --")
-            self.realtime_status_label.setText(f"Запись с батчами {batch_length}с...")
+            if self.adaptive_window.active:
+                self.realtime_status_label.setText(f"Запись, адаптивное окно: {self.adaptive_window.describe()}")
+            else:
+                self.realtime_status_label.setText(f"Запись с батчами {batch_length}с...")
             self.speech_status_label.setText("Распознавание речи активно")
             
         except Exception as e:
@@ -923,8 +1302,18 @@ class EmotionRecognitionApp(QMainWindow):
     
     def stop_realtime_analysis(self):
         """Остановка анализа в реальном времени"""
-        if self.audio_processor:
+        self.adaptive_window.active = False
+        if self.capture is not None:
+            self.stop_capture()
+        elif self.audio_processor:
             self.audio_processor.stop_processing()
+        self.perf_panel.stop()
+        
+        if self.archive is not None and self.archive_session_id is not None:
+            self.archive.end_session(self.archive_session_id)
+            self.archive_session_id = None
+        if self.embedding_store is not None:
+            self.embedding_store.flush()
         
         # Обновление UI
         self.start_realtime_btn.setEnabled(True)
@@ -933,20 +1322,134 @@ class EmotionRecognitionApp(QMainWindow):
         self.realtime_confidence_label.setText("Уверенность: --")
         self.realtime_status_label.setText("Анализ в реальном времени остановлен")
         self.speech_status_label.setText("Модель Vosk ожидает аудио")
+        self.start_model_selection()
+    
+    def start_prosody_tier(self, window_seconds):
+        """
+        Запуск предварительной оценки: нужен захват в кольцевой буфер
+        Признаки блоков считаются в потоке ProsodyWorker, окно получает только результат
+        """
+        prosody_settings = self.settings['prosody']
+        if not prosody_settings['enabled'] or self.capture is None:
+            return
+        estimator = ProsodicEstimator(self.realtime_num2emotion, self.capture.sample_rate,
+                                      learning_rate=prosody_settings['learning_rate'])
+        self.emotion_tiers = TieredEmotionTracker(window_seconds)
+        self.prosody_worker = ProsodyWorker(self.capture, estimator, prosody_settings['chunk_seconds'], parent=self)
+        self.prosody_worker.estimated.connect(self.update_provisional_emotion)
+        self.prosody_worker.start()
+    
+    @pyqtSlot(tuple, float)
+    def update_provisional_emotion(self, result, audio_time):
+        """Вывод предварительной эмоции по блоку, оцененному потоком просодии"""
+        if self.prosody_worker is None:
+            return
+        emotion, confidence, _ = result
+        self.emotion_tiers.provisional(result, audio_time)
+        # Предварительная оценка: приглушенный цвет и пунктирная рамка до подтверждения HuBERT
+        color = Styles.EMOTION_COLORS.get(emotion, '#000000')
+        self.realtime_emotion_label.setText(f"≈ {emotion.upper()}")
+        self.realtime_emotion_label.setStyleSheet(f"""
+            QLabel {{
+                padding: 14px;
+                border-radius: 8px;
+                background-color: {Styles.SECONDARY_COLOR};
+                color: {Styles.MUTED_TEXT_COLOR};
+                border: 2px dashed {color};
+            }}
+        """)
+        self.realtime_confidence_label.setText(f"Предварительно (просодия): {confidence:.0f}%")
+    
+    def start_capture(self, device_index, window_seconds):
+        """Захват в кольцо и потоки, читающие из него окна HuBERT и блоки для Vosk"""
+        capture_settings = self.settings['capture']
+        self.capture = CallbackCapture(
+            device_index,
+            frames_per_buffer=capture_settings['frames_per_buffer'],
+            ring_seconds=max(capture_settings['ring_seconds'], self.adaptive_window.max_window * 2)
+        )
+        self.capture.start()
+        
+        self.window_worker = WindowAnalysisWorker(
+            self.capture,
+            self.realtime_model,
+            self.realtime_feature_extractor,
+            self.realtime_num2emotion,
+            window_seconds,
+            on_timing=self.adaptive_window.observe,
+            parent=self
+        )
+        self.window_worker.window_analyzed.connect(self.update_realtime_display)
+        self.window_worker.start()
+        # Отставание потребителей от захвата, секунды аудио
+        perf_counters.register_gauge('queue.windows', self.window_worker.backlog)
+        
+        if self.vosk_model is None:
+            self.speech_status_label.setText("⚠️ Распознавание речи недоступно: модель Vosk не загружена")
+            return
+        try:
+            recognizer = create_recognizer(self.vosk_model, self.capture.sample_rate)
+        except Exception as e:
+            self.speech_status_label.setText(f"⚠️ Распознавание речи недоступно: {e}")
+            return
+        self.speech_worker = SpeechRecognitionWorker(
+            self.capture,
+            recognizer,
+            emotion_source=lambda: self.window_worker.latest if self.window_worker else None,
+            parent=self
+        )
+        self.speech_worker.speech_recognized.connect(self.on_text_recognized)
+        self.speech_worker.start()
+        perf_counters.register_gauge('queue.asr', self.speech_worker.backlog)
+    
+    def stop_capture(self):
+        """Остановка захвата колбэком, его потоков и отчет о переполнениях входа"""
+        if self.capture is None:
+            return
+        perf_counters.unregister_gauge('queue.windows')
+        perf_counters.unregister_gauge('queue.asr')
+        workers = [w for w in (self.window_worker, self.speech_worker, self.prosody_worker) if w is not None]
+        for worker in workers:
+            worker.stop()
+        self.capture.stop()
+        # Поток окна дожидается текущего прямого прохода
+        for worker in workers:
+            worker.wait()
+        self.window_worker = None
+        self.speech_worker = None
+        self.prosody_worker = None
+        stats = self.capture.stats()
+        if stats['overflows']:
+            print(f"Переполнений входа при захвате: {stats['overflows']} из {stats['callbacks']} блоков")
+        self.capture = None
     
     @pyqtSlot(dict, int)
-    def update_realtime_display(self, emotion_probs, plot_counter):
-        """Обновление отображения в реальном времени новыми данными об эмоциях"""
+    @pyqtSlot(dict, int, float)
+    @pyqtSlot(dict, int, float, float)
+    def update_realtime_display(self, emotion_probs, plot_counter, audio_time=None, captured_at=None):
+        """
+        Обновление отображения в реальном времени новыми данными об эмоциях
+        audio_time - конец окна в секундах потока захвата, captured_at - время
+        захвата конца окна (без захвата в кольцо - None, задержка не замеряется)
+        """
+        perf_counters.mark_displayed(captured_at if captured_at is not None and captured_at >= 0 else None)
         try:
             # Фильтруем только существующие эмоции (убираем "другую" если она есть)
-            filtered_emotions = {k: v for k, v in emotion_probs.items() if k in self.num2emotion.values()}
+            filtered_emotions = {k: v for k, v in emotion_probs.items() if k in self.realtime_num2emotion.values()}
             
             if filtered_emotions:
                 predicted_emotion = max(filtered_emotions, key=filtered_emotions.get)
                 confidence = filtered_emotions[predicted_emotion]
                 
-                # Обновление метки эмоции
-                self.realtime_emotion_label.setText(predicted_emotion.upper())
+                # Обновление метки эмоции (подтвержденная оценка HuBERT)
+                tier = None
+                if self.prosody_worker is not None and audio_time is not None:
+                    # Время конца окна, из которого получен результат (а не текущая
+                    # позиция захвата: к выводу она уходит вперед на время анализа)
+                    tier = self.emotion_tiers.confirm((predicted_emotion, confidence, filtered_emotions), audio_time)
+                    self.prosody_worker.learn(filtered_emotions, self.emotion_tiers.window_seconds, audio_time)
+                self.realtime_emotion_label.setText(f"✓ {predicted_emotion.upper()}" if self.prosody_worker is not None
+                                                    else predicted_emotion.upper())
                 self.realtime_confidence_label.setText(f"Уверенность: {confidence:.1f}%")
                 
                 # Установка цвета в зависимости от эмоции
@@ -963,13 +1466,44 @@ class EmotionRecognitionApp(QMainWindow):
                 
                 # Обновление графика только с 4 эмоциями
                 self.canvas.update_plot(plot_counter, filtered_emotions)
+                self.emotion_timeline.add(filtered_emotions)
                 
                 # Обновление состояния
-                self.realtime_status_label.setText(f"Батч {plot_counter}: {predicted_emotion} ({confidence:.1f}%)")
+                status = f"Батч {plot_counter}: {predicted_emotion} ({confidence:.1f}%)"
+                if tier is not None:
+                    tiers = self.emotion_tiers.stats()
+                    status += (f" | просодия: совпадение {tiers['agreement'] * 100:.0f}%, "
+                               f"раньше на {tiers['latency_gain_p50'] * 1000:.0f} мс")
+                if self.adaptive_window.active:
+                    self.apply_adaptive_window()
+                    status += f" | {self.adaptive_window.describe()}"
+                self.realtime_status_label.setText(status)
                 
         except Exception as e:
             print(f"Ошибка обновления отображения: {e}")
     
+    def current_hop_seconds(self):
+        """Шаг между окнами реального времени: из адаптивного окна или слайдера"""
+        if self.adaptive_window.active:
+            return self.adaptive_window.hop
+        return self.batch_length_slider.value()
+    
+    def apply_adaptive_window(self):
+        """Передача новых окна и шага потоку окон (WindowReader) или аудио процессору"""
+        change = self.adaptive_window.take_change()
+        if change is None:
+            return
+        window, hop = change
+        # Предварительные оценки сопоставляются с окнами HuBERT новой длины
+        self.emotion_tiers.window_seconds = window
+        if self.window_worker is not None:
+            self.window_worker.set_window(window, hop)
+        elif self.audio_processor and hasattr(self.audio_processor, 'set_window'):
+            self.audio_processor.set_window(window, hop)
+        elif self.audio_processor:
+            # Аудио процессор без перекрытия окон: шаг равен окну
+            self.audio_processor.batch_length = window
+    
     def save_full_realtime_audio(self):
         """Сохранение полной записи от начала до конца"""
         if not self.audio_processor:
@@ -1008,7 +1542,7 @@ class EmotionRecognitionApp(QMainWindow):
             emotion = emotion_info.get('emotion', 'нейтральная')
             
             # Проверяем, что эмоция есть в нашем списке
-            if emotion not in self.num2emotion.values():
+            if emotion not in self.realtime_num2emotion.values():
                 emotion = 'нейтральная'  # Заменяем на нейтральную если эмоция "другая"
             
             color = Styles.EMOTION_COLORS.get(emotion, '#808080')
@@ -1030,6 +1564,35 @@ class EmotionRecognitionApp(QMainWindow):
             
             # Обновляем статистику для ИИ советника
             self.update_conversation_stats(text, emotion)
+            
+            if self.archive is not None and self.archive_session_id is not None:
+                self.archive.add_phrase(self.archive_session_id, text, emotion, emotion_info.get('confidence'))
+    
+    def embedding_context(self):
+        """
+        (сессия архива, время начала окна) для эмбеддинга окна реального времени
+        Вызывается в потоке прямого прохода; окна файлов и транскрипции идут
+        через ту же модель из других потоков и не сохраняются (None).
+        Без архива окна сессии пишутся с сессией -1
+        """
+        window_time = current_window_time()
+        if window_time is None:
+            return None
+        session_id = self.archive_session_id if self.archive_session_id is not None else -1
+        return session_id, window_time
+    
+    def archive_file_result(self, path, emotion, confidence, probs, duration):
+        """Запись результата анализа файла в архив (одна сессия 'files' на запуск приложения)"""
+        if self.archive is None:
+            return
+        try:
+            if self.archive_files_session_id is None:
+                self.archive_files_session_id = self.archive.start_session(
+                    'files', title=time.strftime("Анализ файлов %Y-%m-%d %H:%M")
+                )
+            self.archive.add_file_result(self.archive_files_session_id, path, emotion, confidence, probs, duration)
+        except Exception as e:
+            print(f"Не удалось записать результат в архив: {e}")
     
     def clear_recognized_text(self):
         """Очистка распознанного текста"""
@@ -1056,17 +1619,42 @@ class EmotionRecognitionApp(QMainWindow):
                 try:
                     with open(filename, 'w', encoding='utf-8') as f:
                         f.write(text)
+                        f.write(self.format_emotion_timeline())
                     
                     QMessageBox.information(self, "Успех", f"Текст сохранен в {filename}")
                     self.status_bar.showMessage(f"Текст сохранен в {filename}")
                 except Exception as e:
                     QMessageBox.critical(self, "Ошибка", f"Не удалось сохранить текст: {str(e)}")
     
+    def format_emotion_timeline(self):
+        """Средние вероятности эмоций по минутам сессии для выгрузки"""
+        starts, means, counts = self.emotion_timeline.series(60.0)
+        if not len(starts):
+            return ""
+        emotions = self.emotion_timeline.emotions
+        lines = ["", "", "Эмоции по минутам (средние вероятности, %):",
+                 "минута\t" + "\t".join(emotions) + "\tокон"]
+        for start, row, count in zip(starts, means, counts):
+            minutes, seconds = divmod(int(start), 60)
+            lines.append(f"{minutes:02d}:{seconds:02d}\t" + "\t".join(f"{v:.1f}" for v in row) + f"\t{count}")
+        session = self.emotion_timeline.dominant()
+        if session:
+            lines.append(f"Доминирующая за сессию: {session[0]} ({session[1]:.1f}%)")
+        return "\n".join(lines) + "\n"
+    
     def set_conversation_goal(self):
         """Установка цели разговора"""
         goal = self.goal_text_edit.toPlainText().strip()
         if goal:
             self.ai_goal = goal
+            # Совет для прежней цели больше не нужен
+            self.ai_worker.cancel()
+            self.advice_scheduler.reset()
+            
+            # Прогрев модели, чтобы первый совет не включал время ее загрузки
+            if self.settings['ollama'].get('warm_up', True):
+                self.ai_client.warm_up(self.build_ai_system_prompt())
+            
             self.ai_status_label.setText(f"Цель установлена: {goal[:50]}...")
             QMessageBox.information(self, "Успех", "Цель разговора успешно установлена!")
         else:
@@ -1076,6 +1664,8 @@ class EmotionRecognitionApp(QMainWindow):
         """Очистка цели разговора"""
         self.ai_goal = ""
         self.goal_text_edit.clear()
+        self.ai_worker.cancel()
+        self.advice_scheduler.reset()
         self.ai_status_label.setText("Цель разговора очищена")
     
     def update_conversation_stats(self, text, emotion):
@@ -1084,17 +1674,21 @@ class EmotionRecognitionApp(QMainWindow):
             # Подсчет слов
             words = text.split()
             self.word_counter += len(words)
+            self.advice_scheduler.add_words(len(words))
             self.words_counter_label.setText(str(self.word_counter))
             
             # Обновление счетчика эмоций (только для существующих эмоций)
-            if emotion in self.num2emotion.values():
+            if emotion in self.realtime_num2emotion.values():
                 if emotion not in self.emotion_counter:
                     self.emotion_counter[emotion] = 0
                 self.emotion_counter[emotion] += 1
                 
-                # Определение доминирующей эмоции
-                if self.emotion_counter:
-                    self.dominant_emotion = max(self.emotion_counter.items(), key=lambda x: x[1])[0]
+                # Доминирующая эмоция: средние вероятности за последние минуты из
+                # временного ряда, без него - по числу фраз
+                dominant = self.emotion_timeline.dominant(self.settings['timeline']['recent_seconds'])
+                if dominant or self.emotion_counter:
+                    self.dominant_emotion = dominant[0] if dominant else \
+                        max(self.emotion_counter.items(), key=lambda x: x[1])[0]
                     color = Styles.EMOTION_COLORS.get(self.dominant_emotion, '#808080')
                     self.dominant_emotion_label.setText(self.dominant_emotion)
                     self.dominant_emotion_label.setStyleSheet(f"""
@@ -1116,12 +1710,38 @@ class EmotionRecognitionApp(QMainWindow):
                 'timestamp': time.time()
             })
             
-            # Автоматический запрос совета при накоплении достаточного количества слов
-            if self.word_counter >= self.words_for_ai and self.ai_goal:
-                self.get_ai_advice_async()
+            # Автоматический запрос совета по правилам планировщика
+            if self.ai_goal:
+                self.conversation_summary.maybe_refresh(self.conversation_history, self.words_for_ai)
+                self.maybe_request_ai_advice()
+    
+    def maybe_request_ai_advice(self):
+        """Автоматический запрос совета, если планировщик считает его нужным"""
+        if not self.advice_scheduler.check_trigger(self.dominant_emotion):
+            return
+        self.submit_ai_advice()
+    
+    def submit_ai_advice(self):
+        """
+        Отправка задания потоку ИИ
+        Возвращает False, если контекст не изменился с последнего совета
+        """
+        messages = self.build_ai_messages()
+        key = self.advice_scheduler.context_key(messages)
+        if self.advice_scheduler.is_duplicate(key):
+            return False
+        
+        # Контекст фиксируется в момент запроса; если поток ИИ занят,
+        # задание ждет в очереди и вытесняется более свежим
+        job_id = self.ai_worker.submit(messages)
+        self.advice_scheduler.mark_sent(job_id, key, self.dominant_emotion)
+        
+        self.ai_status_label.setText("ИИ анализирует разговор...")
+        self.cancel_advice_btn.setEnabled(True)
+        return True
     
     def get_ai_advice_async(self):
-        """Асинхронный запрос совета от ИИ"""
+        """Асинхронный запрос совета от ИИ (задание ставится в очередь потока ИИ)"""
         if not self.ai_goal:
             QMessageBox.warning(self, "Предупреждение", "Сначала установите цель разговора")
             return
@@ -1130,136 +1750,95 @@ class EmotionRecognitionApp(QMainWindow):
             QMessageBox.warning(self, "Предупреждение", "Нет данных разговора для анализа")
             return
         
-        # Проверяем, не работает ли уже поток ИИ
-        if self.ai_thread and self.ai_thread.is_alive():
-            QMessageBox.warning(self, "Предупреждение", "ИИ уже анализирует разговор. Пожалуйста, подождите.")
-            return
-        
-        # Обновляем UI перед началом работы в потоке
+        if not self.submit_ai_advice():
+            self.ai_status_label.setText("Разговор не изменился с последнего совета")
+    
+    def build_ai_system_prompt(self):
+        """Системный промпт с целью разговора (неизменный префикс промпта)"""
+        return build_advice_system_prompt(self.ai_goal)
+    
+    def build_ai_messages(self):
+        """Формирование сообщений для ИИ из текущего состояния разговора"""
+        summary, summarized_count = self.conversation_summary.snapshot()
+        return build_advice_messages(
+            self.ai_goal,
+            self.conversation_history,
+            summary,
+            summarized_count,
+            self.words_for_ai,
+            self.settings['advisor']['context_max_words'],
+            self.dominant_emotion,
+            self.emotion_timeline.describe(self.settings['timeline']['recent_seconds'])
+        )
+    
+    def cancel_ai_advice(self):
+        """Отмена текущего и ожидающих запросов к ИИ"""
+        self.ai_worker.cancel()
+        self.ai_status_label.setText("Отмена запроса...")
+    
+    @pyqtSlot(int)
+    def _on_ai_job_started(self, job_id):
+        """Начало генерации: заголовок совета выводится сразу"""
+        self.ai_stream_buffer.clear()
+        self.ai_advice_text.append(f"📅 {time.strftime('%H:%M:%S')}\n")
+        self.ai_advice_text.append("="*50 + "\n")
         self.ai_status_label.setText("ИИ анализирует разговор...")
-        self.get_advice_btn.setEnabled(False)
-        QApplication.processEvents()
+        self.cancel_advice_btn.setEnabled(True)
+    
+    @pyqtSlot(int, str)
+    def _on_ai_advice_chunk(self, job_id, text):
+        """Накопление токенов совета до следующего кадра отрисовки"""
+        self.ai_stream_buffer.append(text)
+        if not self.ai_paint_timer.isActive():
+            self.ai_paint_timer.start()
+    
+    def _flush_ai_stream_buffer(self):
+        """Вывод накопленных токенов в панель советов одной вставкой"""
+        if not self.ai_stream_buffer:
+            self.ai_paint_timer.stop()
+            return
         
-        # Создаем и запускаем поток для работы с ИИ
-        self.ai_thread = threading.Thread(target=self._get_ai_advice_thread)
-        self.ai_thread.daemon = True
-        self.ai_thread.start()
+        text = "".join(self.ai_stream_buffer)
+        self.ai_stream_buffer.clear()
         
-        # Запускаем таймер для проверки состояния потока
-        self.ai_check_timer = QTimer()
-        self.ai_check_timer.timeout.connect(self._check_ai_thread_status)
-        self.ai_check_timer.start(100)  # Проверяем каждые 100 мс
+        cursor = self.ai_advice_text.textCursor()
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertText(text)
+        self.ai_advice_text.setTextCursor(cursor)
+        self.ai_advice_text.ensureCursorVisible()
     
-    def _get_ai_advice_thread(self):
-        """Функция для выполнения в отдельном потоке"""
-        try:
-            # Подготовка текста разговора для ИИ
-            conversation_text = self.prepare_conversation_for_ai()
-            
-            # Вызов локального ИИ через Ollama
-            response = ollama.chat(
-                model='deepseek-llm:7b',
-                messages=[
-                    {
-                        'role': 'system',
-                        'content': 'Ты - эксперт по коммуникациям и психологии. Анализируй разговор и давай конкретные советы очень кратко и лаконично. Отвечай только на русском языке.'
-                    },
-                    {
-                        'role': 'user',
-                        'content': f"""
-                        Цель разговора: {self.ai_goal}
-                        
-                        Контекст разговора (последние {self.words_for_ai} слов):
-                        {conversation_text}
-                        
-                        Доминирующая эмоция собеседника: {self.dominant_emotion}
-                        
-                        Проанализируй разговор и дай 3-5 конкретных советов:
-                        1. Что делать дальше для достижения цели?
-                        2. Как реагировать на текущие эмоции собеседника?
-                        3. Какие вопросы задать?
-                        4. Чего избегать в разговоре?
-                        5. Как улучшить коммуникацию?
-                        
-                        Ответ дай на русском языке, структурированно и конкретно. Будь краток!
-                        """
-                    }
-                ]
-            )
-            
-            advice = response['message']['content']
-            
-            # Добавляем совет в очередь для обработки в основном потоке
-            self.ai_advice_queue.append(advice)
-            
-        except Exception as e:
-            print(f"Ошибка получения совета от ИИ: {e}")
-            # Создаем демонстрационный совет при ошибке
-            demo_advice = (
-                "Демонстрационный совет от ИИ:\n\n"
-                "1. Собеседник проявляет интерес к теме - задайте уточняющие вопросы.\n"
-                "2. Поддерживайте позитивный настрой разговора.\n"
-                "3. Используйте открытые вопросы для получения больше информации.\n"
-                "4. Проявляйте эмпатию и понимание.\n"
-                "5. Следите за эмоциональным состоянием собеседника."
+    @pyqtSlot(int, dict)
+    def _on_ai_job_finished(self, job_id, metrics):
+        """Завершение генерации совета"""
+        self.advice_scheduler.mark_done(job_id)
+        # Дописываем оставшиеся токены
+        self._flush_ai_stream_buffer()
+        self.ai_advice_text.append("\n")
+        self.cancel_advice_btn.setEnabled(self.ai_worker.is_busy())
+        
+        if metrics.get('error') is not None:
+            self.ai_status_label.setText("Ошибка получения совета")
+        elif metrics.get('cached'):
+            self.ai_status_label.setText("ИИ совет получен из кеша")
+        elif metrics['ttft'] is not None:
+            print(f"Совет ИИ: первый токен {metrics['ttft']:.2f}с, "
+                  f"{metrics['tokens']} токенов, {metrics['tokens_per_sec'] or 0:.1f} ток/с, "
+                  f"всего {metrics['total']:.2f}с")
+            self.ai_status_label.setText(
+                f"ИИ совет получен! Первый токен: {metrics['ttft']:.2f}с | "
+                f"{metrics['tokens_per_sec'] or 0:.1f} ток/с"
             )
-            self.ai_advice_queue.append(demo_advice)
+        else:
+            self.ai_status_label.setText("ИИ вернул пустой ответ")
     
-    def _check_ai_thread_status(self):
-        """Проверка состояния потока ИИ и обновление UI"""
-        if not self.ai_thread.is_alive():
-            # Останавливаем таймер
-            self.ai_check_timer.stop()
-            
-            # Восстанавливаем кнопку
-            self.get_advice_btn.setEnabled(True)
-            
-            # Обрабатываем результат из очереди
-            if self.ai_advice_queue:
-                advice = self.ai_advice_queue.pop(0)
-                
-                # Отображаем совет в основном потоке
-                self.ai_advice_text.append(f"📅 {time.strftime('%H:%M:%S')}\n")
-                self.ai_advice_text.append("="*50 + "\n")
-                self.ai_advice_text.append(advice + "\n\n")
-                
-                self.ai_status_label.setText("ИИ совет получен!")
-                
-                # Прокручиваем к концу
-                cursor = self.ai_advice_text.textCursor()
-                cursor.movePosition(QTextCursor.End)
-                self.ai_advice_text.setTextCursor(cursor)
-            else:
-                self.ai_status_label.setText("Ошибка получения совета")
-    
-    def prepare_conversation_for_ai(self):
-        """Подготовка текста разговора для отправки в ИИ"""
-        # Берем последние N слов из истории разговора
-        recent_history = []
-        total_words = 0
-        
-        for entry in reversed(self.conversation_history):
-            words = entry['text'].split()
-            if total_words + len(words) <= self.words_for_ai:
-                recent_history.insert(0, entry)
-                total_words += len(words)
-            else:
-                break
-        
-        # Форматирование разговора
-        formatted_conversation = []
-        for entry in recent_history:
-            emotion = entry['emotion']
-            color_code = {
-                'радость': '😊',
-                'грусть': '😢',
-                'гнев': '😠',
-                'нейтральная': '😐'
-            }.get(emotion, '😐')
-            
-            formatted_conversation.append(f"[{color_code} {emotion.upper()}] {entry['text']}")
-        
-        return "\n".join(formatted_conversation)
+    @pyqtSlot(int)
+    def _on_ai_job_cancelled(self, job_id):
+        """Задание отменено или вытеснено более новым"""
+        self.advice_scheduler.mark_done(job_id)
+        self.cancel_advice_btn.setEnabled(self.ai_worker.is_busy())
+        if not self.ai_worker.is_busy():
+            self._flush_ai_stream_buffer()
+            self.ai_status_label.setText("Запрос к ИИ отменен")
     
     def clear_ai_advice(self):
         """Очистка советов от ИИ"""
@@ -1271,16 +1850,47 @@ class EmotionRecognitionApp(QMainWindow):
         # Остановка анализа в реальном времени, если запущен
         if self.audio_processor:
             self.audio_processor.stop_processing()
-        
-        # Остановка таймера ИИ, если он запущен
-        if hasattr(self, 'ai_check_timer'):
-            self.ai_check_timer.stop()
-        
-        # Ожидание завершения потока ИИ
-        if self.ai_thread and self.ai_thread.is_alive():
-            self.ai_thread.join(timeout=1)
+        self.stop_capture()
+        
+        # Отмена очереди файлов (выполняющиеся файлы дочитываются)
+        if self.ingest_queue is not None:
+            self.ingest_queue.shutdown()
+        
+        # Фоновый замер моделей прерывается после текущего повтора и не сохраняется
+        self.pending_model_selection = None
+        if self.model_selection_worker is not None:
+            self.model_selection_worker.stop()
+            self.model_selection_worker.wait()
+        
+        # Отмена транскрипции файла: процессы пула завершаются, результат
+        # не придет после закрытия архива
+        if self.transcription_worker is not None:
+            self.transcription_worker.cancel()
+            self.transcription_worker.wait()
+        
+        # Остановка потока ИИ: отмена проверяется между фрагментами ответа,
+        # поток завершается на следующем фрагменте Ollama
+        self.ai_worker.stop()
+        self.ai_worker.wait()
+        if self.ai_cache is not None:
+            self.ai_cache.save()
+        
+        # Недописанные фразы сохраняются в архив
+        if self.archive is not None:
+            if self.archive_session_id is not None:
+                self.archive.end_session(self.archive_session_id)
+            if self.archive_files_session_id is not None:
+                self.archive.end_session(self.archive_files_session_id)
+            self.archive.close()
+            # Сигналы, уже стоящие в очереди событий, не пишут в закрытый архив
+            self.archive = None
+        if self.embedding_store is not None:
+            self.embedding_store.flush()
         
         # Очистка ресурсов
+        if isinstance(getattr(self, 'realtime_model', None), PooledModel):
+            self.realtime_model.close()
+        self.realtime_model = None
         if hasattr(self, 'model'):
             del self.model
         if hasattr(self, 'feature_extractor'):
@@ -1288,8 +1898,28 @@ class EmotionRecognitionApp(QMainWindow):
         
         event.accept()
 
+def parse_args(argv):
+    """Разбор аргументов командной строки (неизвестные аргументы остаются для Qt)"""
+    import argparse
+    parser = argparse.ArgumentParser(description="СинхронИИя - Распознавание эмоций и речи")
+    parser.add_argument("--profile", action="store_true", help="Включить выборочное профилирование")
+    parser.add_argument("--profile-every", type=int, default=None, help="Профилировать каждый N-й вызов")
+    parser.add_argument("--profile-dir", default=None, help="Каталог для отчетов профилирования")
+    return parser.parse_known_args(argv[1:])
+
+
 def main():
-    app = QApplication(sys.argv)
+    args, qt_args = parse_args(sys.argv)
+    configure_profiling(
+        enabled=True if args.profile else None,
+        every_n=args.profile_every,
+        output_dir=args.profile_dir
+    )
+    
+    # Потоки torch и закрепление GUI-потока за своим ядром - до создания потоков Qt и загрузки моделей
+    apply_thread_budget(load_settings()['threads'])
+    
+    app = QApplication(sys.argv[:1] + qt_args)
     app.setApplicationName("СинхронИИя - Распознавание эмоций и речи")
     
     # Установка темного стиля приложения
@@ -0,0 +1,115 @@
+"""
+Headless-режим: сервер потокового анализа речи и эмоций по WebSocket
+
+Запуск:
+    python server.py --port 8765 --vosk-model vosk-model-ru-0.42 --inference-workers 2
+    python server.py --advisor   # советы ИИ через Ollama из config/settings.json
+"""
+import argparse
+import asyncio
+
+from core.settings import load_settings
+from core.thread_budget import apply_thread_environment, apply_thread_budget
+
+# Потоки OpenMP/BLAS ограничиваются до загрузки numpy, torch и Vosk
+settings = load_settings()
+apply_thread_environment(settings['threads'])
+
+from core.model_registry import configured_realtime_model, load_registered_model, load_registry, select_realtime_model
+from core.stream_server import StreamingAnalysisServer, load_vosk_model
+from core.worker_pool import PooledModel, create_model_pool
+
+
+def main():
+    server_settings = settings['server']
+    parser = argparse.ArgumentParser(description="Сервер потокового анализа СинхронИИя")
+    parser.add_argument("--host", default=server_settings['host'])
+    parser.add_argument("--port", type=int, default=server_settings['port'])
+    parser.add_argument("--vosk-model", default=settings['vosk']['model_path'], help="Каталог модели Vosk")
+    parser.add_argument("--window", type=float, default=server_settings['window_seconds'], help="Окно эмоций, с")
+    parser.add_argument("--hop", type=float, default=server_settings['hop_seconds'], help="Шаг окна эмоций, с")
+    parser.add_argument("--inference-workers", type=int, default=server_settings['inference_workers'])
+    parser.add_argument("--max-batch", type=int, default=server_settings['max_batch'])
+    parser.add_argument("--max-wait", type=float, default=server_settings['max_wait'], help="Ожидание батча, с")
+    parser.add_argument("--inbound-chunks", type=int, default=server_settings['inbound_chunks'],
+                        help="Емкость входной очереди сессии в блоках")
+    parser.add_argument("--pool-workers", type=int, default=0,
+                        help="Процессов пула инференса (0 - по секции worker_pool настроек)")
+    parser.add_argument("--streaming-encoder", action="store_true",
+                        default=server_settings['streaming_encoder'],
+                        help="Не пересчитывать сверточный энкодер для перекрывающихся окон")
+    parser.add_argument("--prosody-chunk", type=float,
+                        default=settings['prosody']['chunk_seconds'] if settings['prosody']['enabled'] else 0,
+                        help="Блок предварительной оценки по просодии, с (0 - выключить)")
+    parser.add_argument("--model", default=None,
+                        help="Модель из реестра (по умолчанию - секция models настроек, \"auto\" - сохраненный замер)")
+    parser.add_argument("--select-model", action="store_true",
+                        help="Замерить модели реестра перед запуском, если сохраненного выбора нет")
+    parser.add_argument("--advisor", action="store_true", help="Включить советы ИИ")
+    args = parser.parse_args()
+
+    apply_thread_budget(settings['threads'])
+    model_settings = dict(settings['models'])
+    if args.model:
+        model_settings['realtime'] = args.model
+    registry = load_registry(model_settings['registry_path'])
+    # Замер всех моделей задерживает запуск на минуты, поэтому он только по
+    # --select-model; без сохраненного выбора сервер берет модель файлов
+    if args.select_model:
+        model_name = select_realtime_model(registry, model_settings, settings['model_cache'],
+                                           rtf_budget=settings['realtime']['target_rtf'])
+    else:
+        model_name = configured_realtime_model(registry, model_settings)
+        if model_name is None:
+            model_name = model_settings['file']
+            print(f"Выбора модели по замеру нет, используется {model_name} "
+                  f"(замер: python tools/select_model.py или --select-model)")
+    entry = registry[model_name]
+    model, feature_extractor, num2emotion = load_registered_model(entry, settings['model_cache'])
+    streaming_encoder = args.streaming_encoder
+    if streaming_encoder and entry['form'] != 'torch':
+        # Кеш кадров энкодера обращается к слоям модели transformers напрямую
+        print(f"Потоковый энкодер недоступен для формы {entry['form']}, окна считаются целиком")
+        streaming_encoder = False
+    print(f"Модель эмоций: {model_name}")
+    pool_settings = dict(settings['worker_pool'])
+    if args.pool_workers:
+        pool_settings.update(enabled=True, workers=args.pool_workers)
+    model = create_model_pool(model, pool_settings)
+    inference_workers = args.inference_workers
+    if isinstance(model, PooledModel):
+        # Каждый поток батчера занимает один процесс пула
+        inference_workers = max(inference_workers, model.pool.workers)
+
+    advisor_client = None
+    if args.advisor:
+        from core.llm_client import OllamaAdvisorClient
+        advisor_client = OllamaAdvisorClient.from_settings(settings['ollama'])
+
+    server = StreamingAnalysisServer(
+        model,
+        feature_extractor,
+        num2emotion=num2emotion,
+        vosk_model=load_vosk_model(args.vosk_model),
+        advisor_client=advisor_client,
+        host=args.host,
+        port=args.port,
+        window_seconds=args.window,
+        hop_seconds=args.hop,
+        inference_workers=inference_workers,
+        max_batch=args.max_batch,
+        max_wait=args.max_wait,
+        inbound_chunks=args.inbound_chunks,
+        streaming_encoder=streaming_encoder,
+        prosody_chunk_seconds=args.prosody_chunk,
+        prosody_learning_rate=settings['prosody']['learning_rate'],
+        recent_seconds=settings['timeline']['recent_seconds']
+    )
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Поиск по архиву сессий
+
+Примеры:
+    python tools/archive_search.py "возврат*" --emotion гнев
+    python tools/archive_search.py "возврат* AND деньги" --sessions --since 2024-01-01
+    python tools/archive_search.py --files --emotion грусть --min-confidence 70
+"""
+import argparse
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from core.session_archive import SessionArchive
+from core.settings import load_settings
+
+
+def parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d").timestamp() if value else None
+
+
+def format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Поиск по архиву сессий")
+    parser.add_argument("query", nargs="?", help="Запрос FTS5, например 'возврат*' или 'деньги AND возврат*'")
+    parser.add_argument("--db", default=load_settings()['archive']['path'])
+    parser.add_argument("--emotion")
+    parser.add_argument("--min-confidence", type=float)
+    parser.add_argument("--since", help="ГГГГ-ММ-ДД")
+    parser.add_argument("--until", help="ГГГГ-ММ-ДД")
+    parser.add_argument("--sessions", action="store_true", help="Группировать совпадения по сессиям")
+    parser.add_argument("--files", action="store_true", help="Искать в результатах анализа файлов")
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    archive = SessionArchive(args.db)
+    start = time.perf_counter()
+    if args.files:
+        rows = archive.search_file_results(args.emotion, args.min_confidence, limit=args.limit)
+        lines = [f"{format_time(r['analyzed_at'])}  {r['emotion']} ({r['confidence']:.1f}%)  {r['path']}"
+                 for r in rows]
+    elif args.sessions:
+        rows = archive.search_sessions(args.query, args.emotion, args.min_confidence,
+                                       parse_date(args.since), parse_date(args.until), limit=args.limit)
+        lines = [f"#{r['session_id']} {format_time(r['started_at'])}  {r['title'] or r['kind']}  "
+                 f"совпадений: {r['matches']}  «{r['example']}»" for r in rows]
+    else:
+        rows = archive.search_phrases(args.query, args.emotion, args.min_confidence,
+                                      parse_date(args.since), parse_date(args.until), limit=args.limit)
+        lines = [f"#{r['session_id']} {format_time(r['timestamp'])}  [{r['emotion']}]  {r['text']}" for r in rows]
+    elapsed = time.perf_counter() - start
+
+    print("\n".join(lines) if lines else "Ничего не найдено")
+    print(f"\nНайдено: {len(rows)} за {elapsed * 1000:.1f} мс")
+    archive.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Поиск окон, похожих по звучанию на выбранное, в хранилище эмбеддингов
+
+Примеры:
+    python tools/embedding_search.py --build-index
+    python tools/embedding_search.py --row 1234 -k 20
+    python tools/embedding_search.py --session 42 --at "2024-05-01 14:03:10"
+"""
+import argparse
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import numpy as np
+
+from core.embedding_store import EmbeddingStore
+from core.emotion_pipeline import NUM2EMOTION
+from core.session_archive import SessionArchive
+from core.settings import load_settings
+
+
+def format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def find_row(store, session_id, at):
+    """Окно сессии, ближайшее по времени к at"""
+    items = store.items()
+    rows = np.flatnonzero(items['session_id'] == session_id)
+    if len(rows) == 0:
+        return None
+    return int(rows[np.argmin(np.abs(items['timestamp'][rows] - at))])
+
+
+def main():
+    settings = load_settings()
+    parser = argparse.ArgumentParser(description="Поиск похожих окон по эмбеддингам HuBERT")
+    parser.add_argument("--store", default=settings['embeddings']['path'])
+    parser.add_argument("--db", default=settings['archive']['path'], help="Архив сессий для названий")
+    parser.add_argument("--build-index", action="store_true", help="Построить индекс IVF по всем векторам")
+    parser.add_argument("--nlist", type=int, help="Списков IVF (по умолчанию sqrt(N))")
+    parser.add_argument("--row", type=int, help="Номер окна-образца")
+    parser.add_argument("--session", type=int, help="Сессия окна-образца")
+    parser.add_argument("--at", help="Время окна-образца в сессии, ГГГГ-ММ-ДД ЧЧ:ММ:СС")
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, default=settings['embeddings']['nprobe'])
+    args = parser.parse_args()
+
+    store = EmbeddingStore(args.store)
+    if args.build_index:
+        start = time.perf_counter()
+        index = store.build_index(args.nlist, args.nprobe)
+        print(f"Индекс: {store.count} векторов, {len(index.centroids)} списков, "
+              f"{time.perf_counter() - start:.1f} с")
+
+    row = args.row
+    if row is None and args.session is not None:
+        at = datetime.strptime(args.at, "%Y-%m-%d %H:%M:%S").timestamp() if args.at else time.time()
+        row = find_row(store, args.session, at)
+        if row is None:
+            print(f"В сессии {args.session} нет сохраненных окон")
+            return
+    if row is None:
+        if not args.build_index:
+            parser.error("укажите --row, --session или --build-index")
+        return
+
+    titles = {}
+    if Path(args.db).exists():
+        archive = SessionArchive(args.db)
+        titles = dict(archive.conn.execute("SELECT id, title FROM sessions").fetchall())
+        archive.close()
+
+    items = store.items()
+
+    def describe(i):
+        item = items[i]
+        emotion = NUM2EMOTION.get(int(item['emotion']), "--")
+        session = int(item['session_id'])
+        title = titles.get(session) or ("вне сессии" if session < 0 else f"сессия {session}")
+        return f"#{i:<9d} {format_time(item['timestamp'])}  {emotion:12s} {item['confidence']:5.1f}%  {title}"
+
+    print("Образец:")
+    print("  " + describe(row))
+    start = time.perf_counter()
+    found = store.similar_to(row, args.k, args.nprobe)
+    print(f"Похожие ({(time.perf_counter() - start) * 1000:.1f} мс):")
+    for i, score in found:
+        print(f"  {score:.3f}  {describe(i)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+Локальная замена сервера Ollama для бенчмарков и офлайн-отладки
+Реализует /api/chat, /api/generate, /api/tags и /api/version с настраиваемыми
+задержкой загрузки модели, временем до первого токена и скоростью генерации
+
+Запуск:
+    python tools/fake_ollama_server.py --port 11500 --first-token-latency 0.3 --token-rate 40
+"""
+import argparse
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+FAKE_WORDS = (
+    "Задайте собеседнику открытый вопрос о его целях. "
+    "Подтвердите, что понимаете его опасения, и предложите конкретный следующий шаг. "
+    "Избегайте давления и длинных монологов, говорите коротко. "
+    "Следите за эмоциональной реакцией и делайте паузы."
+).split(" ")
+
+
+class FakeOllamaConfig:
+    """Параметры поведения поддельного сервера"""
+
+    def __init__(self, load_latency=0.0, first_token_latency=0.2, token_rate=30.0,
+                 tokens=60, keep_alive=300.0):
+        self.load_latency = load_latency
+        self.first_token_latency = first_token_latency
+        self.token_rate = token_rate
+        self.tokens = tokens
+        self.keep_alive = keep_alive
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def config(self):
+        return self.server.config
+
+    def do_GET(self):
+        if self.path == "/api/version":
+            self._send_json({"version": "0.0.0-fake"})
+        elif self.path == "/api/tags":
+            self._send_json({"models": [{"name": name, "model": name} for name in sorted(self.server.loaded)]})
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        self.server.requests += 1
+
+        if self.path == "/api/chat":
+            self._generate(request, chat=True)
+        elif self.path == "/api/generate":
+            self._generate(request, chat=False)
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def _load_model(self, model):
+        """Имитация загрузки модели при первом обращении или после простоя"""
+        with self.server.lock:
+            last_used = self.server.loaded.get(model)
+            needs_load = last_used is None or time.monotonic() - last_used > self.config.keep_alive
+            self.server.loaded[model] = time.monotonic()
+        if needs_load and self.config.load_latency > 0:
+            time.sleep(self.config.load_latency)
+            return self.config.load_latency
+        return 0.0
+
+    def _generate(self, request, chat):
+        start = time.perf_counter()
+        model = request.get("model", "fake")
+        stream = request.get("stream", True)
+        options = request.get("options") or {}
+        load_duration = self._load_model(model)
+
+        # Пустой промпт в /api/generate - только загрузка модели
+        if not chat and not request.get("prompt"):
+            self._send_json(self._final(model, chat, start, load_duration, 0, 0.0, ""))
+            return
+
+        n_tokens = min(options.get("num_predict") or self.config.tokens, self.config.tokens)
+        if n_tokens < 0:
+            n_tokens = self.config.tokens
+        time.sleep(self.config.first_token_latency)
+        eval_start = time.perf_counter()
+        interval = 1.0 / self.config.token_rate if self.config.token_rate > 0 else 0.0
+        tokens = [FAKE_WORDS[i % len(FAKE_WORDS)] + " " for i in range(n_tokens)]
+
+        if not stream:
+            time.sleep(interval * max(n_tokens - 1, 0))
+            text = "".join(tokens)
+            self._send_json(self._final(model, chat, start, load_duration, n_tokens,
+                                        time.perf_counter() - eval_start, text))
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for i, token in enumerate(tokens):
+                if i > 0:
+                    time.sleep(interval)
+                self._write_chunk(self._partial(model, chat, token))
+            self._write_chunk(self._final(model, chat, start, load_duration, n_tokens,
+                                          time.perf_counter() - eval_start, ""))
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # Клиент отменил запрос
+            self.close_connection = True
+
+    def _partial(self, model, chat, token):
+        chunk = {"model": model, "created_at": _now(), "done": False}
+        if chat:
+            chunk["message"] = {"role": "assistant", "content": token}
+        else:
+            chunk["response"] = token
+        return chunk
+
+    def _final(self, model, chat, start, load_duration, eval_count, eval_duration, text):
+        chunk = self._partial(model, chat, text)
+        chunk.update({
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": int((time.perf_counter() - start) * 1e9),
+            "load_duration": int(load_duration * 1e9),
+            "prompt_eval_count": 0,
+            "prompt_eval_duration": 0,
+            "eval_count": eval_count,
+            "eval_duration": int(eval_duration * 1e9),
+        })
+        return chunk
+
+    def _write_chunk(self, obj):
+        data = (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, obj, status=200):
+        data = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def make_server(config, host, port):
+    """Создание HTTP-сервера с состоянием поддельной Ollama"""
+    server = ThreadingHTTPServer((host, port), FakeOllamaHandler)
+    server.daemon_threads = True
+    server.config = config
+    server.lock = threading.Lock()
+    server.loaded = {}
+    server.requests = 0
+    return server
+
+
+def start_fake_ollama(config=None, host="127.0.0.1", port=0):
+    """
+    Запуск поддельного сервера в фоновом потоке
+    Возвращает (server, url); остановка - server.shutdown()
+    """
+    server = make_server(config or FakeOllamaConfig(), host, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Поддельный сервер Ollama")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--load-latency", type=float, default=2.0, help="Время загрузки модели, с")
+    parser.add_argument("--first-token-latency", type=float, default=0.2, help="Время до первого токена, с")
+    parser.add_argument("--token-rate", type=float, default=30.0, help="Скорость генерации, токенов/с")
+    parser.add_argument("--tokens", type=int, default=60, help="Длина ответа в токенах")
+    parser.add_argument("--keep-alive", type=float, default=300.0, help="Время жизни загруженной модели, с")
+    args = parser.parse_args()
+
+    config = FakeOllamaConfig(
+        load_latency=args.load_latency,
+        first_token_latency=args.first_token_latency,
+        token_rate=args.token_rate,
+        tokens=args.tokens,
+        keep_alive=args.keep_alive
+    )
+    server = make_server(config, args.host, args.port)
+    print(f"Поддельный Ollama слушает http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
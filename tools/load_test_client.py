@@ -0,0 +1,146 @@
+"""
+Нагрузочный клиент для server.py
+Каждая сессия передает синтетическую речь в реальном времени; число сессий
+наращивается, пока p95 задержки событий эмоций не превысит целевое значение
+
+Запуск:
+    python tools/load_test_client.py --url ws://127.0.0.1:8765 --target-p95 1.0 --duration 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.synthetic_audio import synth_speech_like
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    return float(np.percentile(values, q))
+
+
+async def run_session(url, index, duration, chunk_seconds=0.1, sample_rate=16000):
+    """Одна сессия: поток PCM в реальном времени, сбор задержек эмоций"""
+    import websockets
+
+    audio = synth_speech_like(duration, sample_rate, seed=index)
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+    chunk = int(chunk_seconds * sample_rate)
+    latencies = []
+    stats = {}
+
+    async with websockets.connect(url, max_size=2 ** 20) as websocket:
+        await websocket.send(json.dumps({'type': 'start', 'sample_rate': sample_rate}))
+
+        async def receive():
+            async for message in websocket:
+                event = json.loads(message)
+                if event['type'] == 'emotion':
+                    latencies.append(event['latency'])
+                elif event['type'] == 'stats':
+                    stats.update(event)
+
+        receiver = asyncio.ensure_future(receive())
+        start = time.monotonic()
+        for i, offset in enumerate(range(0, len(pcm), chunk)):
+            # Темп реального времени: блок i отправляется не раньше i * chunk_seconds
+            delay = start + i * chunk_seconds - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await websocket.send(pcm[offset:offset + chunk].tobytes())
+        await websocket.send(json.dumps({'type': 'stop'}))
+        try:
+            await asyncio.wait_for(receiver, timeout=30)
+        except asyncio.TimeoutError:
+            receiver.cancel()
+
+    return latencies, stats
+
+
+async def run_level(url, sessions, duration):
+    """Одновременный запуск sessions сессий, сводка задержек"""
+    results = await asyncio.gather(*[run_session(url, i, duration) for i in range(sessions)],
+                                   return_exceptions=True)
+    latencies = []
+    skipped = 0
+    inbound_max = 0
+    errors = 0
+    for result in results:
+        if isinstance(result, Exception):
+            errors += 1
+            continue
+        session_latencies, stats = result
+        latencies.extend(session_latencies)
+        skipped += stats.get('windows_skipped', 0)
+        inbound_max = max(inbound_max, stats.get('inbound_max', 0))
+    return {
+        'sessions': sessions,
+        'windows': len(latencies),
+        'windows_skipped': skipped,
+        'inbound_max': inbound_max,
+        'errors': errors,
+        'latency_p50': percentile(latencies, 50),
+        'latency_p95': percentile(latencies, 95),
+    }
+
+
+async def ramp(url, target_p95, duration, start, step, max_sessions):
+    levels = []
+    sessions = start
+    while sessions <= max_sessions:
+        level = await run_level(url, sessions, duration)
+        levels.append(level)
+        print(f"{sessions} сессий: p95 {level['latency_p95']}, пропущено окон {level['windows_skipped']}, "
+              f"входящая очередь до {level['inbound_max']}, "
+              f"ошибок {level['errors']}")
+        if level['errors'] or level['latency_p95'] is None or level['latency_p95'] > target_p95:
+            break
+        sessions += step
+    return levels
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест сервера анализа")
+    parser.add_argument("--url", default="ws://127.0.0.1:8765")
+    parser.add_argument("--target-p95", type=float, default=1.0, help="Допустимая p95 задержки эмоций, с")
+    parser.add_argument("--duration", type=float, default=20.0, help="Длительность аудио сессии, с")
+    parser.add_argument("--start", type=int, default=1)
+    parser.add_argument("--step", type=int, default=1)
+    parser.add_argument("--max-sessions", type=int, default=64)
+    parser.add_argument("--server-cores", type=int, default=os.cpu_count(),
+                        help="Ядер у сервера (для сессий на ядро)")
+    parser.add_argument("--output", help="Файл JSON-отчета")
+    args = parser.parse_args()
+
+    levels = asyncio.run(ramp(args.url, args.target_p95, args.duration,
+                              args.start, args.step, args.max_sessions))
+    passed = [level for level in levels
+              if not level['errors'] and level['latency_p95'] is not None
+              and level['latency_p95'] <= args.target_p95]
+    max_sessions = max((level['sessions'] for level in passed), default=0)
+    report = {
+        'url': args.url,
+        'target_p95': args.target_p95,
+        'server_cores': args.server_cores,
+        'max_sessions': max_sessions,
+        'sessions_per_core': max_sessions / args.server_cores if args.server_cores else None,
+        'levels': levels,
+    }
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
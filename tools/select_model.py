@@ -0,0 +1,76 @@
+"""
+Реестр моделей эмоций: список кандидатов, замер на этом компьютере и выбор
+модели для реального времени (тот же выбор, что при первом запуске приложения)
+
+Запуск:
+    python tools/select_model.py --list
+    python tools/select_model.py --rebenchmark
+    python tools/select_model.py --rebenchmark --budget 0.3 --models hubert-base,hubert-base-int8
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from core.settings import load_settings
+from core.thread_budget import apply_thread_environment, apply_thread_budget
+
+settings = load_settings()
+apply_thread_environment(settings['threads'])
+
+from core.model_registry import availability, load_registry, select_realtime_model
+
+
+def main():
+    model_settings = dict(settings['models'])
+    parser = argparse.ArgumentParser(description="Выбор модели эмоций для реального времени")
+    parser.add_argument("--list", action="store_true", help="Показать реестр и сохраненный выбор")
+    parser.add_argument("--rebenchmark", action="store_true", help="Замерить кандидатов заново")
+    parser.add_argument("--budget", type=float, default=settings['realtime']['target_rtf'],
+                        help="Допустимый фактор реального времени (время окна / шаг)")
+    parser.add_argument("--window", type=float, default=model_settings['benchmark_window'])
+    parser.add_argument("--repeats", type=int, default=model_settings['benchmark_repeats'])
+    parser.add_argument("--models", help="Только эти записи реестра через запятую")
+    parser.add_argument("--registry", default=model_settings['registry_path'], help="JSON с дополнительными моделями")
+    args = parser.parse_args()
+
+    # Реестр передается целиком: по его версии приложение проверяет сохраненный выбор
+    registry = load_registry(args.registry)
+    names = args.models.split(",") if args.models else None
+    unknown = [name for name in names or () if name not in registry]
+    if unknown:
+        parser.error(f"Нет в реестре: {', '.join(unknown)}")
+    selection_path = Path(model_settings['selection_path'])
+
+    if args.list:
+        listed = {name: registry[name] for name in names or registry}
+        for name, entry in sorted(listed.items(), key=lambda item: -item[1]['quality']):
+            ok, reason = availability(entry)
+            print(f"{name:20s} {entry['form']:9s} точность {entry['quality']}  {entry['classifier']}"
+                  f"{'' if ok else f'  (недоступна: {reason})'}")
+        if selection_path.exists():
+            saved = json.loads(selection_path.read_text(encoding="utf-8"))
+            print(f"\nВыбрано для реального времени: {saved['selected']} (бюджет RTF {saved['rtf_budget']})")
+        return
+
+    apply_thread_budget(settings['threads'])
+    model_settings.update(realtime="auto", benchmark_window=args.window, benchmark_repeats=args.repeats)
+    # Свой список кандидатов или бюджет - новый замер; его выбор приложение примет при запуске
+    force = args.rebenchmark or names is not None or args.budget != settings['realtime']['target_rtf']
+    selected = select_realtime_model(registry, model_settings, settings['model_cache'],
+                                     rtf_budget=args.budget, force=force, names=names)
+    saved = json.loads(selection_path.read_text(encoding="utf-8"))
+    for name, result in saved['results'].items():
+        if 'rtf' in result:
+            print(f"{name:20s} окно {result['seconds'] * 1000:8.1f} мс, RTF {result['rtf']:.2f}, "
+                  f"загрузка {result['load_seconds']:.1f} с{'  <-' if name == selected else ''}")
+        else:
+            print(f"{name:20s} пропущена: {result['error']}")
+    print(f"\nМодель реального времени: {selected}")
+
+
+if __name__ == "__main__":
+    main()
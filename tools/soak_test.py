@@ -0,0 +1,258 @@
+"""
+Длительный прогон (soak) конвейера реального времени с телеметрией памяти и задержек
+
+Источник - синтетическая речь или WAV, который проигрывается по кругу; сессия
+на несколько часов проходит ускоренно (--speed 0 - без пауз). Каждые
+--sample-minutes минут сессии снимаются RSS, куча Python (tracemalloc),
+размеры растущих структур и задержки стадий. Если наклон какого-либо ряда
+за час сессии больше предела, прогон завершается с кодом 1
+
+Цели:
+    pipeline  - без Qt: модель, просодия, история разговора и запрос советника
+    gui       - окно приложения (offscreen): график, текст, история, счетчики эмоций
+
+Запуск:
+    python tools/soak_test.py --hours 4 --model tiny --output soak.json
+    python tools/soak_test.py --target gui --hours 2 --source meeting.wav --max-rss-slope 10
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.common import NUM2EMOTION, environment_info, load_bench_model
+from benchmarks.synthetic_audio import synth_speech_like
+from core import emotion_pipeline
+from core.conversation_context import build_advice_messages
+from core.prosody import ProsodicEstimator
+from core.soak_telemetry import DEFAULT_LIMITS, SoakMonitor
+
+WORDS = ("да", "нет", "давайте", "обсудим", "сроки", "бюджет", "проект", "команда", "клиент",
+         "договор", "сегодня", "завтра", "хорошо", "сложно", "согласен", "вопрос", "предлагаю")
+
+
+def load_source(source, seconds=60, sample_rate=16000):
+    """Аудио для проигрывания по кругу"""
+    if source == "synthetic":
+        return synth_speech_like(seconds, sample_rate, seed=3)
+    audio, _ = emotion_pipeline.load_and_preprocess_audio(source)
+    return np.asarray(audio, dtype=np.float32)
+
+
+def looped_windows(audio, window, hop):
+    """Бесконечный поток окон (window, hop в семплах) по кольцу источника"""
+    position = 0
+    buffer = np.empty(window, dtype=np.float32)
+    while True:
+        start = position % len(audio)
+        end = start + window
+        if end <= len(audio):
+            buffer[:] = audio[start:end]
+        else:
+            # Окно на стыке конца и начала источника
+            head = len(audio) - start
+            buffer[:head] = audio[start:]
+            rest = window - head
+            buffer[head:] = np.resize(audio, rest)
+        yield buffer
+        position += hop
+
+
+class PipelineTarget:
+    """Конвейер без Qt: те же модули, что у окна приложения и сервера"""
+
+    def __init__(self, model, feature_extractor, monitor, words_for_ai=50):
+        self.model = model
+        self.feature_extractor = feature_extractor
+        self.monitor = monitor
+        self.words_for_ai = words_for_ai
+        self.prosody = ProsodicEstimator(NUM2EMOTION)
+        self.conversation_history = []
+        self.emotion_counter = {}
+        monitor.track('conversation_history', lambda: len(self.conversation_history))
+        monitor.track('prosody_recent', lambda: len(self.prosody.recent))
+
+    def step(self, window, hop_samples, text):
+        with self.monitor.stage('prosody'):
+            self.prosody.push(window[-hop_samples:])
+        with self.monitor.stage('hubert'):
+            emotion, confidence, probs = emotion_pipeline.analyze_audio(
+                self.model, self.feature_extractor, window, NUM2EMOTION)
+        with self.monitor.stage('display'):
+            self.prosody.learn(probs)
+            self.emotion_counter[emotion] = self.emotion_counter.get(emotion, 0) + 1
+            self.conversation_history.append({'text': text, 'emotion': emotion, 'timestamp': time.time()})
+        with self.monitor.stage('advice_prompt'):
+            dominant = max(self.emotion_counter.items(), key=lambda x: x[1])[0]
+            build_advice_messages("Договориться о сроках", self.conversation_history, "", 0,
+                                  self.words_for_ai, 120, dominant)
+
+    def close(self):
+        pass
+
+
+class GuiTarget:
+    """
+    Окно приложения без микрофона: результаты окон передаются в те же слоты,
+    что подключены к сигналам аудио процессора
+    """
+
+    def __init__(self, model, feature_extractor, monitor):
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        from PyQt5.QtWidgets import QApplication
+
+        import main
+
+        class SoakApp(main.EmotionRecognitionApp):
+            def load_model_async(self):
+                self.model, self.feature_extractor = model, feature_extractor
+
+        self.qt = QApplication.instance() or QApplication(sys.argv[:1])
+        self.window = SoakApp()
+        self.model = model
+        self.feature_extractor = feature_extractor
+        self.monitor = monitor
+        self.counter = 0
+        window = self.window
+        monitor.track('conversation_history', lambda: len(window.conversation_history))
+        monitor.track('emotion_counter', lambda: sum(window.emotion_counter.values()))
+        monitor.track('text_display_chars', lambda: window.text_display.document().characterCount())
+        monitor.track('plot_points', lambda: _container_items(window.canvas))
+
+    def step(self, window, hop_samples, text):
+        with self.monitor.stage('hubert'):
+            emotion, confidence, probs = emotion_pipeline.analyze_audio(
+                self.model, self.feature_extractor, window, NUM2EMOTION)
+        self.counter += 1
+        with self.monitor.stage('display'):
+            self.window.update_realtime_display(probs, self.counter)
+            self.window.on_text_recognized(text, {'emotion': emotion, 'confidence': confidence})
+            self.qt.processEvents()
+
+    def close(self):
+        self.window.close()
+        self.qt.processEvents()
+
+
+def _container_items(obj):
+    """Суммарная длина списков и очередей среди атрибутов объекта (данные графика)"""
+    total = 0
+    for value in vars(obj).values():
+        if isinstance(value, (list, tuple)) or type(value).__name__ == 'deque':
+            total += len(value)
+        elif isinstance(value, dict):
+            total += sum(len(v) for v in value.values() if isinstance(v, (list, tuple)))
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Длительный прогон конвейера с телеметрией")
+    parser.add_argument("--target", default="pipeline", choices=["pipeline", "gui"])
+    parser.add_argument("--hours", type=float, default=4.0, help="Длительность сессии")
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="Ускорение относительно реального времени (0 - без пауз)")
+    parser.add_argument("--source", default="synthetic", help="synthetic или путь к аудиофайлу")
+    parser.add_argument("--model", default="tiny", choices=["tiny", "real"])
+    parser.add_argument("--window", type=float, default=3.0, help="Окно HuBERT, с")
+    parser.add_argument("--hop", type=float, default=3.0, help="Шаг окон, с")
+    parser.add_argument("--sample-minutes", type=float, default=5.0, help="Период телеметрии в минутах сессии")
+    parser.add_argument("--warmup", type=float, default=0.1, help="Доля начальных точек вне регрессии")
+    parser.add_argument("--trace-frames", type=int, default=5, help="Глубина стека tracemalloc (0 - выкл.)")
+    parser.add_argument("--max-rss-slope", type=float, default=DEFAULT_LIMITS['rss_mb'], help="МБ/ч")
+    parser.add_argument("--max-heap-slope", type=float, default=DEFAULT_LIMITS['heap_mb'], help="МБ/ч")
+    parser.add_argument("--max-latency-slope", type=float, default=DEFAULT_LIMITS['latency_ms'],
+                        help="мс/ч для медианы каждой стадии")
+    parser.add_argument("--limit", action="append", default=[], metavar="РЯД=НАКЛОН",
+                        help="Предел для любого ряда, например size.conversation_history=500")
+    parser.add_argument("--output", help="Файл для отчета в JSON")
+    args = parser.parse_args()
+
+    sample_rate = 16000
+    model, feature_extractor = load_bench_model(args.model)
+    audio = load_source(args.source, sample_rate=sample_rate)
+    window = int(args.window * sample_rate)
+    hop = int(args.hop * sample_rate)
+
+    monitor = SoakMonitor(trace_frames=args.trace_frames)
+    target = (GuiTarget if args.target == "gui" else PipelineTarget)(model, feature_extractor, monitor)
+    rng = np.random.default_rng(0)
+    total_windows = int(args.hours * 3600 / args.hop)
+    sample_every = max(1, int(args.sample_minutes * 60 / args.hop))
+    warm_at = max(1, int(total_windows * args.warmup))
+
+    monitor.start()
+    started = time.perf_counter()
+    try:
+        for index, chunk in enumerate(looped_windows(audio, window, hop), start=1):
+            if index > total_windows:
+                break
+            session_seconds = index * args.hop
+            if args.speed:
+                delay = started + session_seconds / args.speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            # Фраза на окно: ~2.5 слова в секунду, как в живой речи
+            text = " ".join(rng.choice(WORDS, size=max(1, int(args.hop * 2.5))))
+            target.step(chunk, hop, text)
+
+            if index == warm_at:
+                monitor.mark_warm()
+            if index % sample_every == 0:
+                point = monitor.sample(session_seconds)
+                stages = ", ".join(f"{name} {s['p50_ms']:.1f}" for name, s in point['stages'].items())
+                heap = f"{point['heap_mb']:.1f}" if point['heap_mb'] is not None else "--"
+                print(f"{point['session_hours']:5.2f} ч сессии ({point['wall_seconds']:6.0f} с): "
+                      f"RSS {point['rss_mb']:.0f} МБ, куча {heap} МБ, мс: {stages}", flush=True)
+    finally:
+        target.close()
+
+    slopes = monitor.slopes(args.warmup)
+    limits = {'rss_mb': args.max_rss_slope, 'heap_mb': args.max_heap_slope, 'latency_ms': args.max_latency_slope}
+    for item in args.limit:
+        name, _, value = item.partition("=")
+        limits[name] = float(value)
+    violations = monitor.check(slopes, limits)
+    top = monitor.top_allocators()
+    monitor.stop()
+
+    print("\nНаклоны на час сессии:")
+    for name, slope in slopes.items():
+        print(f"  {name:35s} {'--' if slope is None else f'{slope:+.3f}'}")
+    if top:
+        print("\nНаибольший рост кучи после прогрева:")
+        for entry in top:
+            print(f"  {entry['size_diff_kb']:+10.1f} КБ {entry['count_diff']:+8d}  {entry['location']}  {entry['line']}")
+            if entry['project_location'] != entry['location']:
+                print(f"  {'':22s}из {entry['project_location']}")
+
+    report = {
+        'environment': environment_info(),
+        'parameters': vars(args),
+        'wall_seconds': time.perf_counter() - started,
+        'slopes_per_hour': slopes,
+        'limits': limits,
+        'violations': [{'series': name, 'slope': slope, 'limit': limit} for name, slope, limit in violations],
+        'top_allocators': top,
+        'timeline': monitor.timeline,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    if violations:
+        print("\nПРОВАЛ: наклон выше предела")
+        for name, slope, limit in violations:
+            print(f"  {name}: {slope:+.3f} > {limit}")
+        return 1
+    print("\nОК: рост в пределах")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+from pathlib import Path
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QColor
+from PyQt5.QtWidgets import QAbstractItemView, QHeaderView, QTableWidget, QTableWidgetItem
+
+from ui.styles import Styles
+
+
+class _SortItem(QTableWidgetItem):
+    """Ячейка с отдельным ключом сортировки (числа сортируются как числа)"""
+
+    def __init__(self, text, key=None):
+        super().__init__(text)
+        self.key = text if key is None else key
+
+    def __lt__(self, other):
+        key = getattr(other, 'key', other.text())
+        try:
+            return self.key < key
+        except TypeError:
+            return str(self.key) < str(key)
+
+
+class IngestResultsTable(QTableWidget):
+    """
+    Таблица результатов очереди анализа файлов
+    Строка создается при постановке файла в очередь и обновляется по сигналам;
+    сортировка по любому столбцу, строки находятся по идентификатору задания
+    """
+
+    BASE_COLUMNS = ("Файл", "Статус", "Эмоция", "Уверенность, %", "Длительность, с")
+
+    def __init__(self, emotions, parent=None):
+        super().__init__(0, 0, parent)
+        self.set_emotions(emotions)
+        self.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.verticalHeader().setVisible(False)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.setSortingEnabled(True)
+        self._rows = {}
+
+    def set_emotions(self, emotions):
+        """Столбцы вероятностей по карте меток модели (после загрузки модели)"""
+        self.emotions = list(emotions)
+        self.setColumnCount(len(self.BASE_COLUMNS) + len(self.emotions))
+        self.setHorizontalHeaderLabels(list(self.BASE_COLUMNS) + [f"{e}, %" for e in self.emotions])
+
+    def add_jobs(self, jobs):
+        """Строки для новых заданий [(идентификатор, путь)]"""
+        self.setSortingEnabled(False)
+        for job_id, path in jobs:
+            row = self.rowCount()
+            self.insertRow(row)
+            name = _SortItem(Path(path).name)
+            name.setToolTip(path)
+            self.setItem(row, 0, name)
+            self.setItem(row, 1, _SortItem("В очереди"))
+            self._rows[job_id] = name
+        self.setSortingEnabled(True)
+
+    def set_status(self, job_id, status, color=None):
+        row = self._row(job_id)
+        if row is None:
+            return
+        item = _SortItem(status)
+        if color:
+            item.setForeground(QColor(color))
+        self._set(row, 1, item)
+
+    def set_result(self, job_id, result):
+        row = self._row(job_id)
+        if row is None:
+            return
+        self.setSortingEnabled(False)
+        color = QColor(Styles.EMOTION_COLORS.get(result['emotion'], '#808080'))
+        emotion = _SortItem(result['emotion'])
+        emotion.setForeground(color)
+        self.setItem(row, 1, _SortItem("Готово"))
+        self.setItem(row, 2, emotion)
+        self.setItem(row, 3, _number(result['confidence']))
+        self.setItem(row, 4, _number(result['duration']))
+        for i, name in enumerate(self.emotions):
+            self.setItem(row, len(self.BASE_COLUMNS) + i, _number(result['probs'].get(name, 0.0)))
+        self.setSortingEnabled(True)
+
+    def clear_jobs(self):
+        self.setRowCount(0)
+        self._rows = {}
+
+    def _row(self, job_id):
+        item = self._rows.get(job_id)
+        return item.row() if item is not None else None
+
+    def _set(self, row, column, item):
+        # Изменение ячейки при включенной сортировке переставляет строки на лету
+        self.setSortingEnabled(False)
+        self.setItem(row, column, item)
+        self.setSortingEnabled(True)
+
+
+def _number(value):
+    item = _SortItem(f"{value:.1f}", float(value))
+    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+    return item
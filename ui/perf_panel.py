@@ -0,0 +1,103 @@
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QGridLayout, QGroupBox, QLabel
+
+from ui.styles import Styles
+from core.perf_counters import counters
+
+
+class PerfPanel(QGroupBox):
+    """
+    Компактная панель производительности для вкладки реального времени
+    Обновляется по таймеру с фиксированной низкой частотой из снимка счетчиков
+    core.perf_counters; сами счетчики пишутся рабочими потоками без блокировок
+    """
+
+    REFRESH_MS = 500
+
+    # Очереди: число заданий (ИИ, файлы) или отставание от захвата в секундах аудио
+    QUEUE_NAMES = {
+        'windows': "окна",
+        'asr': "речь",
+        'ai': "ИИ",
+        'ingest': "файлы",
+    }
+
+    FIELDS = (
+        ('latency', "Захват → экран"),
+        ('rtf', "RTF"),
+        ('hubert', "HuBERT"),
+        ('vosk', "Vosk"),
+        ('queues', "Очереди"),
+        ('dropped', "Потеряно блоков"),
+        ('rss', "Память (RSS)"),
+    )
+
+    def __init__(self, hop_seconds=None, parent=None):
+        super().__init__("📈 Производительность", parent)
+        self.setStyleSheet(Styles.get_groupbox_style())
+        # Функция, возвращающая текущий шаг окна в секундах (для RTF)
+        self.hop_seconds = hop_seconds
+
+        layout = QGridLayout()
+        layout.setHorizontalSpacing(12)
+        self.values = {}
+        for i, (key, title) in enumerate(self.FIELDS):
+            title_label = QLabel(f"{title}:")
+            title_label.setStyleSheet(f"color: {Styles.MUTED_TEXT_COLOR};")
+            value_label = QLabel("--")
+            row, column = divmod(i, 2)
+            layout.addWidget(title_label, row, column * 2)
+            layout.addWidget(value_label, row, column * 2 + 1)
+            self.values[key] = value_label
+        self.setLayout(layout)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(self.REFRESH_MS)
+        self.timer.timeout.connect(self.refresh)
+
+    def start(self):
+        counters.reset()
+        self.refresh()
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+        self.refresh()
+
+    def refresh(self):
+        hop = self.hop_seconds() if self.hop_seconds else None
+        snapshot = counters.snapshot(hop)
+
+        self.values['latency'].setText(self._format_timing(snapshot['latency']))
+        self.values['hubert'].setText(self._format_timing(snapshot['hubert']))
+        self.values['vosk'].setText(self._format_timing(snapshot['vosk']))
+
+        rtf = snapshot['rtf']
+        if rtf is None:
+            self.values['rtf'].setText("--")
+            self.values['rtf'].setStyleSheet("")
+        else:
+            # Больше 1 - анализ не успевает за реальным временем
+            color = Styles.ERROR_COLOR if rtf > 1.0 else Styles.SUCCESS_COLOR
+            self.values['rtf'].setText(f"{rtf:.2f}")
+            self.values['rtf'].setStyleSheet(f"color: {color}; font-weight: bold;")
+
+        queues = snapshot['queues']
+        self.values['queues'].setText(
+            ", ".join(self._format_queue(name, depth) for name, depth in sorted(queues.items())) if queues else "--"
+        )
+        self.values['dropped'].setText(str(snapshot['dropped_chunks']))
+        self.values['rss'].setText(f"{snapshot['rss_mb']:.0f} МБ")
+
+    @classmethod
+    def _format_queue(cls, name, depth):
+        name = cls.QUEUE_NAMES.get(name, name)
+        if isinstance(depth, float):
+            return f"{name} {depth:.1f} с"
+        return f"{name} {depth}"
+
+    @staticmethod
+    def _format_timing(stats):
+        if not stats:
+            return "--"
+        return f"p50 {stats['p50'] * 1000:.0f} мс, p95 {stats['p95'] * 1000:.0f} мс"